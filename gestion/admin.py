@@ -1,15 +1,19 @@
 ﻿from django.contrib import admin
-from .models import Laboratorio, Software, PC, Estudiante, ReservaClase, Visita, SerieReserva, DiaSemana, Mantenimiento, SesionActiva, CalendarioSemanal, Carrera
+from .models import Laboratorio, Software, PC, Estudiante, ReservaClase, Visita, SerieReserva, DiaSemana, Mantenimiento, SesionActiva, CalendarioSemanal, Carrera, ConsultaLenta
 from django.shortcuts import render, redirect
 from django.http import HttpResponseRedirect, JsonResponse, FileResponse
 from .forms import RecurrenciaForm, MantenimientoForm, EstudianteAdminForm, SerieReservaAdminForm, ReservaClaseAdminForm
 from .widgets import ColorPickerWidget
 from datetime import timedelta, datetime
+import logging
 from django.urls import path
 from django.utils.html import format_html
 from django.urls import reverse
 from django.contrib import messages
 from django.utils.safestring import mark_safe
+from .mantenimientos import abrir_mantenimientos, cerrar_mantenimientos, estadisticas_mantenimiento
+
+logger = logging.getLogger(__name__)
 
 # --- Clases de Administración existentes ---
 
@@ -33,6 +37,11 @@ class SoftwareAdmin(admin.ModelAdmin):
     search_fields = ('nombre',)
 
     # Esta función crea el texto para la columna "Laboratorios"
+    def get_queryset(self, request):
+        """Precargar los laboratorios de la columna "Instalado en" para evitar N+1 queries"""
+        qs = super().get_queryset(request)
+        return qs.prefetch_related('laboratorios')
+
     def get_laboratorios(self, obj):
         # Une los nombres de todos los laboratorios asociados con una coma
         return ", ".join([lab.nombre for lab in obj.laboratorios.all()])
@@ -48,12 +57,31 @@ class PCInline(admin.TabularInline):
             kwargs["queryset"] = Laboratorio.objects.all().order_by('nombre')
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
+class DisponibilidadPCFilter(admin.SimpleListFilter):
+    """Filtra PCs según la disponibilidad para uso individual anotada en PCAdmin"""
+    title = 'disponibilidad'
+    parameter_name = 'disponible'
+
+    def lookups(self, request, model_admin):
+        return (
+            ('si', 'Disponible para uso individual'),
+            ('no', 'No disponible para uso individual'),
+        )
+
+    def queryset(self, request, queryset):
+        if self.value() == 'si':
+            return queryset.filter(disponible_uso=True)
+        if self.value() == 'no':
+            return queryset.filter(disponible_uso=False)
+        return queryset
+
+
 class PCAdmin(admin.ModelAdmin):
     # Columnas a mostrar en la lista
     list_display = ('__str__', 'laboratorio', 'estado', 'get_disponibilidad')
 
     # Panel de filtro a la derecha
-    list_filter = ('laboratorio', 'estado')
+    list_filter = ('laboratorio', 'estado', DisponibilidadPCFilter)
 
     # Orden por defecto: primero por laboratorio, luego por número de PC
     ordering = ('laboratorio', 'numero_pc')
@@ -62,7 +90,7 @@ class PCAdmin(admin.ModelAdmin):
     search_fields = ('laboratorio__nombre', 'numero_pc')
     
     # Acciones personalizadas
-    actions = ['actualizar_estados_segun_reservas']
+    actions = ['actualizar_estados_segun_reservas', 'abrir_mantenimiento', 'cerrar_mantenimiento']
     
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """Ordenar laboratorios alfabéticamente"""
@@ -70,13 +98,38 @@ class PCAdmin(admin.ModelAdmin):
             kwargs["queryset"] = Laboratorio.objects.all().order_by('nombre')
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
     
+    def get_queryset(self, request):
+        """
+        Anotar la disponibilidad para uso individual (misma regla que
+        PC.esta_disponible_para_uso) en la consulta del changelist, en lugar
+        de una consulta de reservas por PC. __str__ usa el laboratorio.
+        """
+        from django.db.models import BooleanField, Case, Exists, OuterRef, Q, Value, When
+        from django.utils import timezone
+
+        now = timezone.now()
+        reserva_activa = ReservaClase.objects.filter(
+            laboratorio=OuterRef('laboratorio'),
+            fecha_hora_inicio__lte=now,
+            fecha_hora_fin__gte=now
+        )
+        qs = super().get_queryset(request).select_related('laboratorio')
+        return qs.annotate(
+            disponible_uso=Case(
+                When(Q(estado__in=['Mantenimiento', 'En Uso']) | Exists(reserva_activa), then=Value(False)),
+                default=Value(True),
+                output_field=BooleanField(),
+            )
+        )
+    
     def get_disponibilidad(self, obj):
         """Muestra si la PC está disponible para uso individual"""
-        if obj.esta_disponible_para_uso():
+        if obj.disponible_uso:
             return "✅ Disponible para uso individual"
         else:
             return "❌ No disponible para uso individual"
     get_disponibilidad.short_description = 'Disponibilidad'
+    get_disponibilidad.admin_order_field = 'disponible_uso'
     
     def actualizar_estados_segun_reservas(self, request, queryset):
         """Acción para actualizar estados de PCs según reservas activas"""
@@ -85,6 +138,21 @@ class PCAdmin(admin.ModelAdmin):
         self.message_user(request, "✅ Estados de PCs actualizados según reservas activas")
     actualizar_estados_segun_reservas.short_description = "Actualizar estados según reservas activas"
     
+    def abrir_mantenimiento(self, request, queryset):
+        """Acción para poner en mantenimiento todas las PCs seleccionadas"""
+        creados, omitidas = abrir_mantenimientos(queryset)
+        mensaje = f"✅ {len(creados)} mantenimientos registrados"
+        if omitidas:
+            mensaje += f" ({omitidas} PCs ya tenían uno activo)"
+        self.message_user(request, mensaje)
+    abrir_mantenimiento.short_description = "Poner en mantenimiento las PCs seleccionadas"
+    
+    def cerrar_mantenimiento(self, request, queryset):
+        """Acción para finalizar el mantenimiento de las PCs seleccionadas"""
+        finalizados = cerrar_mantenimientos(queryset)
+        self.message_user(request, f"✅ {finalizados} mantenimientos finalizados")
+    cerrar_mantenimiento.short_description = "Finalizar mantenimiento de las PCs seleccionadas"
+    
     def save_model(self, request, obj, form, change):
         """Sobrescribe el método save para crear mantenimiento automáticamente"""
         from django.utils import timezone
@@ -128,15 +196,44 @@ class LaboratorioAdmin(admin.ModelAdmin):
     # 4. Añade un filtro por descripción (si no está vacía)
     list_filter = ('descripcion',)
 
+    # 5. Acciones de mantenimiento para todas las PCs del laboratorio
+    actions = ['abrir_mantenimiento', 'cerrar_mantenimiento']
+
+    def get_queryset(self, request):
+        """Contar PCs y software en la misma consulta (distinct: son dos relaciones)"""
+        from django.db.models import Count
+        qs = super().get_queryset(request)
+        return qs.annotate(
+            num_pcs=Count('pc', distinct=True),
+            num_software=Count('software_instalado', distinct=True),
+        )
+
     # Esta función cuenta las PCs en cada laboratorio
     def get_pc_count(self, obj):
-        return obj.pc_set.count()
+        return obj.num_pcs
     get_pc_count.short_description = 'Número de PCs'
+    get_pc_count.admin_order_field = 'num_pcs'
 
     # Esta función cuenta el software instalado en cada laboratorio
     def get_software_count(self, obj):
-        return obj.software_instalado.count()
+        return obj.num_software
     get_software_count.short_description = 'Software Instalado'
+    get_software_count.admin_order_field = 'num_software'
+
+    def abrir_mantenimiento(self, request, queryset):
+        """Acción para poner en mantenimiento todas las PCs de los laboratorios seleccionados"""
+        creados, omitidas = abrir_mantenimientos(PC.objects.filter(laboratorio__in=queryset.values('id')))
+        mensaje = f"✅ {len(creados)} mantenimientos registrados"
+        if omitidas:
+            mensaje += f" ({omitidas} PCs ya tenían uno activo)"
+        self.message_user(request, mensaje)
+    abrir_mantenimiento.short_description = "Poner en mantenimiento todas las PCs"
+
+    def cerrar_mantenimiento(self, request, queryset):
+        """Acción para finalizar el mantenimiento de todas las PCs de los laboratorios seleccionados"""
+        finalizados = cerrar_mantenimientos(PC.objects.filter(laboratorio__in=queryset.values('id')))
+        self.message_user(request, f"✅ {finalizados} mantenimientos finalizados")
+    cerrar_mantenimiento.short_description = "Finalizar mantenimiento de todas las PCs"
 
 class VisitaAdmin(admin.ModelAdmin):
     list_display = ('estudiante', 'pc', 'software_utilizado', 'fecha_hora_inicio', 'fecha_hora_fin', 'get_duracion')
@@ -144,6 +241,8 @@ class VisitaAdmin(admin.ModelAdmin):
     search_fields = ('estudiante__nombre_completo', 'pc__laboratorio__nombre')
     date_hierarchy = 'fecha_hora_inicio'
     ordering = ('-fecha_hora_inicio',)
+    # str(pc) usa el nombre del laboratorio
+    list_select_related = ('estudiante', 'pc__laboratorio', 'software_utilizado')
     
     def get_duracion(self, obj):
         if obj.fecha_hora_fin:
@@ -174,50 +273,61 @@ class EstudianteAdmin(admin.ModelAdmin):
     ordering = ('nombre_completo',)
     
     def get_queryset(self, request):
-        """Optimizar consultas para evitar N+1 queries"""
+        """
+        Anotar las estadísticas de visitas para evitar N+1 queries:
+        primera/última visita, total y software más usado en la misma consulta.
+        """
+        from django.db.models import Count, Max, Min, OuterRef, Subquery
+
+        software_por_uso = Visita.objects.filter(
+            estudiante=OuterRef('pk'),
+            software_utilizado__isnull=False,
+        ).values('software_utilizado__nombre').annotate(
+            usos=Count('id')
+        ).order_by('-usos', 'software_utilizado__nombre')
+
         qs = super().get_queryset(request)
-        return qs.prefetch_related('visita_set', 'visita_set__software_utilizado')
+        return qs.annotate(
+            primer_registro=Min('visita__fecha_hora_inicio'),
+            ultima_visita=Max('visita__fecha_hora_inicio'),
+            # distinct porque los filtros del changelist pueden volver a unir visita
+            total_visitas=Count('visita', distinct=True),
+            software_mas_usado=Subquery(software_por_uso.values('software_utilizado__nombre')[:1]),
+            software_mas_usado_usos=Subquery(software_por_uso.values('usos')[:1]),
+        )
     
     def get_fecha_primer_registro(self, obj):
         """Retorna la fecha de la primera visita del estudiante"""
-        primera_visita = obj.visita_set.order_by('fecha_hora_inicio').first()
-        if primera_visita:
-            return primera_visita.fecha_hora_inicio.strftime('%d/%m/%Y %H:%M')
+        if obj.primer_registro:
+            return obj.primer_registro.strftime('%d/%m/%Y %H:%M')
         return "Sin visitas"
     get_fecha_primer_registro.short_description = 'Primer Registro'
-    get_fecha_primer_registro.admin_order_field = 'visita__fecha_hora_inicio'
+    get_fecha_primer_registro.admin_order_field = 'primer_registro'
     
     def get_total_visitas(self, obj):
         """Retorna el total de visitas del estudiante"""
-        total = obj.visita_set.count()
+        total = obj.total_visitas
         if total > 0:
             return format_html('<span style="font-weight: bold; color: #0066cc;">{}</span>', total)
         return 0
     get_total_visitas.short_description = 'Total Visitas'
+    get_total_visitas.admin_order_field = 'total_visitas'
     
     def get_software_mas_usado(self, obj):
         """Retorna el software más utilizado por el estudiante"""
-        from django.db.models import Count
-        
-        software_stats = obj.visita_set.values('software_utilizado__nombre').annotate(
-            count=Count('software_utilizado')
-        ).order_by('-count').first()
-        
-        if software_stats and software_stats['software_utilizado__nombre']:
-            nombre = software_stats['software_utilizado__nombre']
-            count = software_stats['count']
+        if obj.software_mas_usado:
             return format_html(
                 '<span style="color: #28a745;">{}</span> <span style="color: #6c757d; font-size: 0.9em;">({}x)</span>',
-                nombre, count
+                obj.software_mas_usado, obj.software_mas_usado_usos
             )
         return format_html('<span style="color: #999;">N/A</span>')
     get_software_mas_usado.short_description = 'Software Más Usado'
+    get_software_mas_usado.admin_order_field = 'software_mas_usado'
     
     def get_ultima_visita(self, obj):
         """Retorna la fecha de la última visita del estudiante"""
-        ultima_visita = obj.visita_set.order_by('-fecha_hora_inicio').first()
-        if ultima_visita:
-            fecha = ultima_visita.fecha_hora_inicio
+        fecha = obj.ultima_visita
+        if fecha:
             # Calcular hace cuánto tiempo
             from django.utils import timezone
             ahora = timezone.now()
@@ -242,8 +352,8 @@ class EstudianteAdmin(admin.ModelAdmin):
                 tiempo_texto
             )
         return format_html('<span style="color: #999;">Sin visitas</span>')
-    get_ultima_visita.short_description = 'Ãšltima Visita'
-    get_ultima_visita.admin_order_field = '-visita__fecha_hora_inicio'
+    get_ultima_visita.short_description = 'Última Visita'
+    get_ultima_visita.admin_order_field = 'ultima_visita'
 
 class MantenimientoAdmin(admin.ModelAdmin):
     """Administración de mantenimientos de PCs"""
@@ -253,6 +363,7 @@ class MantenimientoAdmin(admin.ModelAdmin):
     search_fields = ('pc__laboratorio__nombre', 'pc__numero_pc', 'descripcion')
     date_hierarchy = 'fecha_inicio'
     ordering = ('-fecha_inicio',)  # usado solo por el system check; get_ordering() aplica el orden real
+    actions = ['finalizar_seleccionados']
 
     def get_ordering(self, request):
         """Activos (fecha_fin=NULL) primero usando NULLS FIRST de PostgreSQL, luego más recientes."""
@@ -302,14 +413,55 @@ class MantenimientoAdmin(admin.ModelAdmin):
         return format_html('<span style="color: #6c757d;">Finalizado</span>')
     acciones.short_description = 'Acciones'
     
+    def finalizar_seleccionados(self, request, queryset):
+        """Acción para finalizar todos los mantenimientos activos seleccionados"""
+        pcs = PC.objects.filter(id__in=queryset.filter(fecha_fin__isnull=True).values('pc_id'))
+        finalizados = cerrar_mantenimientos(pcs)
+        self.message_user(request, f"✅ {finalizados} mantenimientos finalizados")
+    finalizar_seleccionados.short_description = "Finalizar mantenimientos seleccionados"
+    
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
             path('finalizar-mantenimiento/<int:mantenimiento_id>/', self.admin_site.admin_view(self.finalizar_mantenimiento_view), name='finalizar_mantenimiento'),
             path('get-pcs/', self.admin_site.admin_view(self.get_pcs_view), name='get_pcs'),
+            path('reporte/', self.admin_site.admin_view(self.reporte_view), name='gestion_mantenimiento_reporte'),
         ]
         return custom_urls + urls
     
+    def reporte_view(self, request):
+        """Reporte de confiabilidad: MTTR, frecuencia y tiempo fuera de servicio"""
+        from datetime import date
+        
+        fecha_desde = request.GET.get('fecha_desde', '')
+        fecha_hasta = request.GET.get('fecha_hasta', '')
+        selected_lab = request.GET.get('laboratorio', '')
+        
+        try:
+            estadisticas = estadisticas_mantenimiento(
+                date.fromisoformat(fecha_desde) if fecha_desde else None,
+                date.fromisoformat(fecha_hasta) if fecha_hasta else None,
+                int(selected_lab) if selected_lab else None,
+            )
+        except ValueError:
+            messages.error(request, 'Filtros inválidos: use fechas AAAA-MM-DD')
+            return redirect('admin:gestion_mantenimiento_reporte')
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Reporte de Mantenimientos',
+            'opts': self.model._meta,
+            'resumen': estadisticas['resumen'],
+            'por_laboratorio': estadisticas['por_laboratorio'],
+            'por_pc': estadisticas['por_pc'][:50],
+            'total_pcs': len(estadisticas['por_pc']),
+            'laboratorios': Laboratorio.objects.order_by('nombre'),
+            'fecha_desde': fecha_desde,
+            'fecha_hasta': fecha_hasta,
+            'selected_lab': selected_lab,
+        }
+        return render(request, 'admin/gestion/mantenimiento/reporte.html', context)
+    
     def get_pcs_view(self, request):
         """Vista AJAX para obtener las PCs de un laboratorio"""
         from django.http import JsonResponse
@@ -632,25 +784,40 @@ class SerieReservaAdmin(admin.ModelAdmin):
             kwargs['widget'] = ColorPickerWidget()
         return super().formfield_for_dbfield(db_field, request, **kwargs)
     
+    @staticmethod
+    def _dias_semana_ordenados():
+        """Días de la semana ordenados: Domingo, Lunes, Martes, etc."""
+        from django.db.models import Case, When, IntegerField
+        
+        # Mapeo de orden: Domingo=0, Lunes=1, Martes=2, Miércoles=3, Jueves=4, Viernes=5, Sábado=6
+        orden_dias = {'D': 0, 'L': 1, 'M': 2, 'X': 3, 'J': 4, 'V': 5, 'S': 6}
+        
+        # Crear un queryset ordenado usando Case/When
+        when_conditions = [When(codigo=codigo, then=orden) for codigo, orden in orden_dias.items()]
+        return DiaSemana.objects.annotate(
+            orden_dia=Case(*when_conditions, default=99, output_field=IntegerField())
+        ).order_by('orden_dia')
+    
+    def get_queryset(self, request):
+        """Contar ocurrencias y precargar los días ya ordenados para evitar N+1 queries"""
+        from django.db.models import Count, Prefetch
+        qs = super().get_queryset(request)
+        return qs.annotate(
+            num_ocurrencias=Count('ocurrencias', distinct=True)
+        ).prefetch_related(
+            Prefetch('dias_semana', queryset=self._dias_semana_ordenados())
+        )
+    
     def formfield_for_manytomany(self, db_field, request, **kwargs):
         """Personaliza el queryset para ordenar los días de la semana correctamente"""
         if db_field.name == 'dias_semana':
-            # Mapeo de orden: Domingo=0, Lunes=1, Martes=2, Miércoles=3, Jueves=4, Viernes=5, Sábado=6
-            from .models import DiaSemana
-            from django.db.models import Case, When, IntegerField
-            
-            orden_dias = {'D': 0, 'L': 1, 'M': 2, 'X': 3, 'J': 4, 'V': 5, 'S': 6}
-            
-            # Crear un queryset ordenado usando Case/When
-            when_conditions = [When(codigo=codigo, then=orden) for codigo, orden in orden_dias.items()]
-            kwargs['queryset'] = DiaSemana.objects.annotate(
-                orden_dia=Case(*when_conditions, default=99, output_field=IntegerField())
-            ).order_by('orden_dia')
+            kwargs['queryset'] = self._dias_semana_ordenados()
         
         return super().formfield_for_manytomany(db_field, request, **kwargs)
     
     def get_dias_display(self, obj):
-        return obj.get_dias_display()
+        # Los días vienen precargados y ordenados desde get_queryset
+        return ', '.join(dia.nombre for dia in obj.dias_semana.all())
     get_dias_display.short_description = 'Días'
     
     def get_horario(self, obj):
@@ -658,8 +825,9 @@ class SerieReservaAdmin(admin.ModelAdmin):
     get_horario.short_description = 'Horario'
     
     def get_ocurrencias_count(self, obj):
-        return obj.ocurrencias.count()
+        return obj.num_ocurrencias
     get_ocurrencias_count.short_description = 'Reservas Programadas'
+    get_ocurrencias_count.admin_order_field = 'num_ocurrencias'
     
     def regenerar_reservas(self, request, queryset):
         """Acción para regenerar las reservas de las series seleccionadas"""
@@ -687,10 +855,12 @@ class SerieReservaAdmin(admin.ModelAdmin):
     
     def actualizar_colores_reservas(self, request, queryset):
         """Acción para actualizar los colores de las reservas existentes con el color de su serie"""
+        from django.utils import timezone
         total_actualizadas = 0
         for serie in queryset:
             # Actualizar todas las reservas de esta serie con el color de la serie
-            actualizadas = serie.ocurrencias.update(color=serie.color)
+            # (update() no aplica auto_now: actualizada_el cambia el ETag del calendario)
+            actualizadas = serie.ocurrencias.update(color=serie.color, actualizada_el=timezone.now())
             total_actualizadas += actualizadas
         
         self.message_user(request, f"✅ Se actualizaron {total_actualizadas} reservas con los colores de {queryset.count()} serie(s).")
@@ -803,9 +973,9 @@ class SerieReservaAdmin(admin.ModelAdmin):
             fecha_actual += timedelta(days=1)
         
         if reservas_creadas > 0:
-            print(f"✅ Se crearon {reservas_creadas} nuevas reservas para la serie '{serie.nombre}'")
+            logger.info("Se crearon %d nuevas reservas para la serie '%s'", reservas_creadas, serie.nombre)
         if conflictos:
-            print(f"⚠️ {len(conflictos)} conflictos encontrados al generar serie '{serie.nombre}'")
+            logger.warning("%d conflictos encontrados al generar la serie '%s'", len(conflictos), serie.nombre)
         
         return conflictos
 
@@ -834,6 +1004,62 @@ admin.site.register(DiaSemana, DiaSemanaAdmin)
 admin.site.register(Mantenimiento, MantenimientoAdmin)
 
 
+# --- Admin de consultas lentas (solo lectura) ---
+class ConsultaLentaAdmin(admin.ModelAdmin):
+    """
+    Consultas lentas muestreadas por MedicionRendimientoMiddleware, agrupadas
+    por huella y ordenadas por tiempo total. Solo lectura; borrar una huella
+    reinicia su conteo.
+    """
+    list_display = ('get_sql', 'muestras', 'get_tiempo_total', 'get_tiempo_promedio', 'get_tiempo_max', 'ruta', 'ultima_vez')
+    search_fields = ('sql', 'ruta')
+    ordering = ('-tiempo_total_ms',)
+    fields = ('huella', 'get_sql_completo', 'ruta', 'muestras', 'get_tiempo_total', 'get_tiempo_promedio',
+              'get_tiempo_max', 'get_ejemplo', 'get_plan', 'primera_vez', 'ultima_vez')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_sql(self, obj):
+        return obj.sql if len(obj.sql) <= 120 else f'{obj.sql[:117]}...'
+    get_sql.short_description = 'Consulta'
+
+    def get_sql_completo(self, obj):
+        return format_html('<pre style="white-space: pre-wrap;">{}</pre>', obj.sql)
+    get_sql_completo.short_description = 'Consulta'
+
+    def get_ejemplo(self, obj):
+        return format_html('<pre style="white-space: pre-wrap;">{}</pre>', obj.ejemplo)
+    get_ejemplo.short_description = 'Muestra más lenta'
+
+    def get_plan(self, obj):
+        if not obj.plan:
+            return 'Sin plan (solo se explican SELECT en PostgreSQL y SQLite)'
+        return format_html('<pre>{}</pre>', obj.plan)
+    get_plan.short_description = 'Plan de ejecución'
+
+    def get_tiempo_total(self, obj):
+        return f'{obj.tiempo_total_ms:,.0f} ms'
+    get_tiempo_total.short_description = 'Tiempo total'
+    get_tiempo_total.admin_order_field = 'tiempo_total_ms'
+
+    def get_tiempo_promedio(self, obj):
+        return f'{obj.tiempo_promedio_ms:,.1f} ms'
+    get_tiempo_promedio.short_description = 'Promedio'
+
+    def get_tiempo_max(self, obj):
+        return f'{obj.tiempo_max_ms:,.1f} ms'
+    get_tiempo_max.short_description = 'Máximo'
+    get_tiempo_max.admin_order_field = 'tiempo_max_ms'
+
+
+admin.site.register(ConsultaLenta, ConsultaLentaAdmin)
+
+
 # --- Admin para Sesiones Activas (Turno Vespertino) ---
 class SesionActivaAdmin(admin.ModelAdmin):
     """
@@ -869,7 +1095,9 @@ class SesionActivaAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """Mostrar solo sesiones activas (sin fecha_hora_fin)"""
         qs = super().get_queryset(request)
-        return qs.filter(fecha_hora_fin__isnull=True)
+        return qs.filter(fecha_hora_fin__isnull=True).select_related(
+            'estudiante', 'pc__laboratorio', 'software_utilizado'
+        )
     
     def get_estudiante(self, obj):
         return obj.estudiante.nombre_completo
@@ -0,0 +1,211 @@
+"""
+Medición del rendimiento de las vistas de gestion.
+
+escenarios() arma el catálogo de peticiones a medir a partir de los datos
+existentes: todas las APIs de gestion/urls.py con parámetros representativos,
+las páginas de lista del admin, el calendario semanal y las dos
+exportaciones. Medidor ejecuta cada escenario con el cliente de pruebas de
+Django y registra tiempos, número de consultas, estado y tamaño de la
+respuesta. Las peticiones que modifican datos se ejecutan dentro de una
+transacción que se revierte, así que el conjunto de datos no cambia entre
+repeticiones.
+
+Lo usan el comando benchmark_endpoints y las pruebas de regresión.
+"""
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib import admin
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+
+from .models import Estudiante, Laboratorio, PC, SerieReserva, Software, Visita
+from .tokens import crear_token
+
+# La página del calendario redirige al calendario semanal, que se mide aparte
+CHANGELISTS_OMITIDOS = {'calendariosemanal'}
+
+
+class _Reversion(Exception):
+    """Se lanza para revertir la transacción de un escenario que modifica datos."""
+
+
+class Escenario:
+    """
+    Una petición a medir. `autenticacion` es 'token' (APIs con
+    admin_required_api), 'sesion' (admin y panel vespertino) o None.
+    """
+
+    def __init__(self, nombre, url, metodo='get', datos=None, autenticacion=None, modifica=False):
+        self.nombre = nombre
+        self.url = url
+        self.metodo = metodo
+        self.datos = datos or {}
+        self.autenticacion = autenticacion
+        self.modifica = modifica
+
+    def __repr__(self):
+        return f'<Escenario {self.nombre}>'
+
+
+def _rango(dias):
+    hoy = timezone.localdate()
+    return {'date_from': (hoy - timedelta(days=dias)).isoformat(), 'date_to': hoy.isoformat()}
+
+
+def escenarios_api():
+    """Escenarios para las APIs de gestion/urls.py (solo los que tienen datos para construirse)."""
+    hoy = timezone.localdate()
+    mes, semestre = _rango(30), _rango(180)
+    laboratorio = Laboratorio.objects.order_by('id').first()
+    software = Software.objects.order_by('id').first()
+    serie = SerieReserva.objects.order_by('id').first()
+    estudiante = Estudiante.objects.order_by('id').first()
+    activa = Visita.objects.filter(fecha_hora_fin__isnull=True).order_by('id').first()
+    pc_libre = PC.objects.filter(estado='Disponible').order_by('id').first()
+
+    lista = [
+        Escenario('registro', reverse('registro')),
+        Escenario('dashboard', reverse('dashboard')),
+        Escenario('api_carreras', reverse('api_carreras')),
+        Escenario('api_dashboard_stats', reverse('api_dashboard_stats')),
+        Escenario('api_lab_usage', reverse('api_lab_usage'), autenticacion='token'),
+        Escenario('api_software_usage', reverse('api_software_usage'), autenticacion='token'),
+        Escenario('api_visits_timeline', reverse('api_visits_timeline'), autenticacion='token'),
+        Escenario('api_recent_visits', reverse('api_recent_visits'), autenticacion='token'),
+        Escenario('api_dashboard_all', reverse('api_dashboard_all')),
+        Escenario('api_admin_verify', reverse('api_admin_verify'), autenticacion='token'),
+        Escenario('api_reports_laboratories_list', reverse('api_reports_laboratories_list'), autenticacion='token'),
+        Escenario('api_reports_software_list', reverse('api_reports_software_list'), autenticacion='token'),
+        Escenario('api_reservations_list_carreras', reverse('api_reservations_list_carreras'), autenticacion='token'),
+        Escenario('api_reservations_list_semestres', reverse('api_reservations_list_semestres'), autenticacion='token'),
+        Escenario('api_reservations_list_laboratorios', reverse('api_reservations_list_laboratorios'), autenticacion='token'),
+        Escenario('api_buscar_huecos', reverse('api_buscar_huecos'), datos={
+            'duracion': 120, 'date_from': hoy.isoformat(), 'date_to': (hoy + timedelta(days=14)).isoformat(),
+        }, autenticacion='token'),
+        Escenario('api_sesiones_activas', reverse('api_sesiones_activas'), autenticacion='sesion'),
+    ]
+    # Reportes: el último mes y el semestre completo
+    for nombre in ('api_reports_filtered_stats', 'api_reports_lab_usage', 'api_reports_software_usage',
+                   'api_reports_daily_trend', 'api_reports_top_users', 'api_reports_heatmap', 'api_reports_occupancy',
+                   'api_reports_utilization', 'api_reports_maintenance',
+                   'api_reservations_stats', 'api_reservations_by_carrera', 'api_reservations_by_semester',
+                   'api_reservations_lab_usage', 'api_reservations_timeline'):
+        lista.append(Escenario(f'{nombre}[30d]', reverse(nombre), datos=mes, autenticacion='token'))
+        lista.append(Escenario(f'{nombre}[180d]', reverse(nombre), datos=semestre, autenticacion='token'))
+
+    if laboratorio:
+        lista += [
+            Escenario('api_reports_lab_usage[laboratorio]', reverse('api_reports_lab_usage'),
+                      datos={**semestre, 'laboratory': laboratorio.id}, autenticacion='token'),
+            Escenario('api_calendario_laboratorio', reverse('api_calendario_laboratorio', args=[laboratorio.id])),
+            Escenario('api_pcs_laboratorio', reverse('api_pcs_laboratorio'),
+                      datos={'laboratorio': laboratorio.id}, autenticacion='sesion'),
+        ]
+    if software and laboratorio:
+        lista.append(Escenario('api_opciones', reverse('api_opciones'),
+                               datos={'software_id': software.id, 'laboratorio_id': laboratorio.id}))
+    if serie:
+        lista.append(Escenario('api_calendario_serie', reverse('api_calendario_serie', args=[serie.id])))
+    if estudiante:
+        lista.append(Escenario('api_buscar_estudiante', reverse('api_buscar_estudiante'),
+                               datos={'id_estudiante': estudiante.id}))
+    if estudiante and pc_libre and software:
+        lista.append(Escenario('api_registrar_visita', reverse('api_registrar_visita'), metodo='post', datos={
+            'id_estudiante': estudiante.id, 'nombre_completo': estudiante.nombre_completo,
+            'correo': estudiante.correo, 'celular': estudiante.celular, 'carrera': estudiante.carrera,
+            'pc': pc_libre.id, 'software': software.id,
+        }, modifica=True))
+    if activa:
+        lista.append(Escenario('api_finalizar_visita', reverse('api_finalizar_visita'), metodo='post',
+                               datos={'id_estudiante': activa.estudiante_id}, modifica=True))
+    return lista
+
+
+def escenarios_admin():
+    """Páginas de lista de todos los modelos de gestion registrados en el admin y el calendario semanal."""
+    lista = []
+    for modelo in sorted(admin.site._registry, key=lambda m: m._meta.model_name):
+        opciones = modelo._meta
+        if opciones.app_label != 'gestion' or opciones.model_name in CHANGELISTS_OMITIDOS:
+            continue
+        try:
+            url = reverse(f'admin:{opciones.app_label}_{opciones.model_name}_changelist')
+        except NoReverseMatch:
+            continue
+        lista.append(Escenario(f'admin:{opciones.model_name}', url, autenticacion='sesion'))
+    lista.append(Escenario('admin:calendario_semanal', reverse('admin:gestion_reservaclase_calendario'),
+                           autenticacion='sesion'))
+    return lista
+
+
+def escenarios_exportacion():
+    semestre = _rango(180)
+    return [
+        Escenario('api_export_pdf', reverse('api_export_pdf'), datos=semestre, autenticacion='token'),
+        Escenario('api_export_excel', reverse('api_export_excel'), datos=semestre, autenticacion='token'),
+    ]
+
+
+def escenarios():
+    return escenarios_api() + escenarios_admin() + escenarios_exportacion()
+
+
+class Medidor:
+    """Ejecuta escenarios con un cliente autenticado como `usuario` (staff, superusuario para el panel)."""
+
+    def __init__(self, usuario):
+        self.cliente = Client()
+        self.cliente.force_login(usuario)
+        self.token = crear_token(usuario)
+
+    def peticion(self, escenario):
+        """Ejecuta el escenario una vez; retorna (estado, bytes, segundos, consultas)."""
+        encabezados = {}
+        if escenario.autenticacion == 'token':
+            encabezados['HTTP_AUTHORIZATION'] = f'Token {self.token}'
+        if escenario.metodo == 'post':
+            argumentos = {'data': json.dumps(escenario.datos), 'content_type': 'application/json'}
+        else:
+            argumentos = {'data': escenario.datos}
+
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    respuesta = getattr(self.cliente, escenario.metodo)(escenario.url, **argumentos, **encabezados)
+                    # Consumir la respuesta completa (las exportaciones pueden ser streaming)
+                    contenido = b''.join(respuesta) if respuesta.streaming else respuesta.content
+                    if escenario.modifica:
+                        raise _Reversion
+            except _Reversion:
+                pass
+            duracion = time.perf_counter() - inicio
+        return respuesta.status_code, len(contenido), duracion, len(consultas.captured_queries)
+
+    def medir(self, escenario, repeticiones=5, calentamiento=1):
+        """Estadísticas de `repeticiones` ejecuciones tras `calentamiento` ejecuciones descartadas."""
+        for _ in range(calentamiento):
+            self.peticion(escenario)
+        tiempos = []
+        for _ in range(repeticiones):
+            estado, tamano, duracion, consultas = self.peticion(escenario)
+            tiempos.append(duracion * 1000)
+        tiempos.sort()
+        return {
+            'nombre': escenario.nombre,
+            'url': escenario.url,
+            'metodo': escenario.metodo.upper(),
+            'estado': estado,
+            'consultas': consultas,
+            'bytes': tamano,
+            'min_ms': round(tiempos[0], 2),
+            'mediana_ms': round(statistics.median(tiempos), 2),
+            'p95_ms': round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 2),
+            'max_ms': round(tiempos[-1], 2),
+        }
@@ -0,0 +1,205 @@
+"""
+Caché de respuestas de las APIs de reportes y reservas.
+
+El panel de reportes vuelve a pedir las mismas APIs con los mismos filtros
+cada vez que se cambia de pestaña. @cache_respuesta guarda el cuerpo JSON en
+la caché 'respuestas' (settings.CACHES) con una clave formada por la vista,
+los filtros normalizados (gestion/filtros.py, así dateFrom y date_from
+coinciden), los demás parámetros y la versión de los datos de los que
+depende la vista.
+
+Cada modelo tiene dos versiones, 'actual' e 'historico'. Una escritura que
+solo toca hoy o días futuros (registrar una visita, reservar la semana
+próxima) cambia 'actual'; una que toca días pasados cambia las dos. Las
+respuestas de rangos que terminan antes de hoy solo dependen de 'historico':
+no se recalculan aunque se registren visitas todo el día y se conservan
+CACHE_RESPUESTAS_TTL_CERRADO segundos. Las de rangos abiertos dependen de
+ambas y viven CACHE_RESPUESTAS_TTL_ABIERTO, porque las visitas en curso
+cambian con la hora aunque nadie escriba.
+
+Las versiones cambian al confirmar la transacción: con save()/delete() desde
+gestion/signals.py y con registrar_cambio() en las escrituras masivas
+(update(), bulk_create). El valor es time.time_ns() en lugar de un
+incremento: no hay leer-modificar-escribir entre procesos y una versión que
+la caché desaloje nunca vuelve a coincidir con claves anteriores.
+
+Aciertos y fallos se cuentan en gestion_cache_respuestas_total (/metrics) y
+cada respuesta lleva la cabecera X-Cache: HIT o MISS.
+
+Las mismas versiones sirven de validadores HTTP (@condicional): ETag y
+Last-Modified salen de la caché sin tocar la base, y un cliente que manda
+If-None-Match o If-Modified-Since con la respuesta vigente recibe 304 sin
+que la vista se ejecute. Es lo que usan los kioscos y el dashboard, que
+consultan cada pocos segundos aunque nada haya cambiado.
+"""
+import hashlib
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .filtros import PARAMETROS, fechas, normalizar
+from .metricas import almacen
+
+ALIAS = 'respuestas'
+ALCANCES = ('actual', 'historico')
+# 'estado_pc' cambia con el estado de las PCs; 'pc' solo con altas, bajas y cambios de laboratorio o número
+MODELOS = ('visita', 'reservaclase', 'pc', 'estado_pc', 'laboratorio', 'software', 'mantenimiento',
+           'estudiante', 'carrera')
+
+# Dependencias de las vistas
+VISITAS = ('visita', 'pc', 'laboratorio', 'software')
+RESERVAS = ('reservaclase', 'laboratorio')
+DASHBOARD = VISITAS + ('estado_pc', 'mantenimiento', 'estudiante')
+
+
+def _clave_version(modelo, alcance):
+    return f'version:{modelo}:{alcance}'
+
+
+def versiones(modelos, alcances=ALCANCES):
+    """Versiones actuales de los modelos; las que no existen (o se desalojaron) se crean."""
+    cache = caches[ALIAS]
+    claves = [_clave_version(modelo, alcance) for modelo in modelos for alcance in alcances]
+    valores = cache.get_many(claves)
+    faltantes = [clave for clave in claves if clave not in valores]
+    if faltantes:
+        for clave in faltantes:
+            cache.add(clave, time.time_ns(), None)
+        valores.update(cache.get_many(faltantes))
+    return [valores.get(clave, 0) for clave in claves]
+
+
+def registrar_cambio(modelo, inicio=None):
+    """
+    Cambia la versión de `modelo` al confirmar la transacción. `inicio` es el
+    primer instante que toca la escritura: si es de hoy o posterior solo
+    cambia 'actual'; sin inicio cambian las dos.
+    """
+    if inicio is not None and timezone.localdate(inicio) >= timezone.localdate():
+        alcances = ('actual',)
+    else:
+        alcances = ALCANCES
+
+    def cambiar():
+        caches[ALIAS].set_many({_clave_version(modelo, alcance): time.time_ns() for alcance in alcances}, None)
+
+    transaction.on_commit(cambiar)
+
+
+def invalidar_todo():
+    """Cambia todas las versiones (después de cargas masivas de datos)."""
+    for modelo in MODELOS:
+        registrar_cambio(modelo)
+
+
+def _rango_cerrado(filtros):
+    hasta = fechas(filtros)[1]
+    return hasta is not None and hasta < timezone.localdate()
+
+
+def _clave(vista, request, filtros, args, kwargs, version):
+    otros = {nombre: valor for nombre, valor in request.GET.items() if nombre not in PARAMETROS}
+    datos = json.dumps([vista, filtros, otros, args, kwargs, version], sort_keys=True, default=str)
+    return 'respuesta:' + hashlib.sha1(datos.encode('utf-8')).hexdigest()
+
+
+def cache_respuesta(*modelos):
+    """
+    Guarda las respuestas 200 de una vista GET que depende de `modelos`
+    (nombres de modelo en minúsculas). Va debajo de admin_required_api para
+    que la autenticación se revise siempre.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method != 'GET':
+                return vista(request, *args, **kwargs)
+            try:
+                filtros = normalizar(request.GET)
+                cerrado = _rango_cerrado(filtros)
+            except ValueError:
+                return vista(request, *args, **kwargs)  # filtros inválidos: la vista responde el error
+
+            cache = caches[ALIAS]
+            version = versiones(modelos, ('historico',) if cerrado else ALCANCES)
+            clave = _clave(vista.__name__, request, filtros, args, kwargs, version)
+            cuerpo = cache.get(clave)
+            if cuerpo is not None:
+                almacen.incrementar('gestion_cache_respuestas_total', ruta=vista.__name__, resultado='hit')
+                response = HttpResponse(cuerpo, content_type='application/json')
+                response['X-Cache'] = 'HIT'
+                return response
+
+            response = vista(request, *args, **kwargs)
+            # Varias APIs responden sus errores con status 200 y {"error": ...} como primera clave
+            if response.status_code == 200 and not response.streaming and not response.content.startswith(b'{"error"'):
+                ttl = settings.CACHE_RESPUESTAS_TTL_CERRADO if cerrado else settings.CACHE_RESPUESTAS_TTL_ABIERTO
+                cache.set(clave, response.content, ttl)
+            almacen.incrementar('gestion_cache_respuestas_total', ruta=vista.__name__, resultado='miss')
+            response['X-Cache'] = 'MISS'
+            return response
+        return envoltura
+    return decorador
+
+
+def _validadores(request, modelos, deslizante):
+    """(etag, last_modified) de la petición; (None, None) si la caché no conserva las versiones."""
+    numeros = versiones(modelos)
+    if 0 in numeros:
+        return None, None  # DummyCache: sin versiones no hay forma de saber si algo cambió
+    ultima = max(numeros)
+    periodo = None
+    if deslizante:
+        duracion = settings.CACHE_RESPUESTAS_TTL_ABIERTO * 10**9
+        periodo = time.time_ns() // duracion
+        ultima = max(ultima, periodo * duracion)
+    datos = json.dumps([request.path, sorted(request.GET.lists()), numeros, periodo])
+    etag = hashlib.sha1(datos.encode('utf-8')).hexdigest()
+    # Last-Modified tiene resolución de segundos: si el último cambio es de este
+    # mismo segundo, otro cambio en él no movería la fecha y solo se envía el ETag
+    segundos = ultima // 10**9
+    if segundos >= time.time_ns() // 10**9:
+        return etag, None
+    return etag, datetime.fromtimestamp(segundos, tz=dt_timezone.utc)
+
+
+def condicional(*modelos, deslizante=False):
+    """
+    GET condicional con las versiones de `modelos` como validadores
+    (django.views.decorators.http.condition). `deslizante` es para vistas que
+    cambian con la hora aunque nadie escriba, como las ventanas de "últimos 30
+    días": sus validadores cambian cada CACHE_RESPUESTAS_TTL_ABIERTO segundos,
+    lo mismo que vive en caché la respuesta de un rango abierto.
+    Cache-Control: private, no-cache hace que el navegador siempre revalide.
+    Va debajo de admin_required_api y encima de cache_respuesta.
+    """
+    def calcular(request):
+        # condition() pide el ETag y la fecha por separado; las versiones se leen una vez
+        if not hasattr(request, '_validadores'):
+            request._validadores = _validadores(request, modelos, deslizante)
+        return request._validadores
+
+    def decorador(vista):
+        condicionada = condition(
+            etag_func=lambda request, *args, **kwargs: calcular(request)[0],
+            last_modified_func=lambda request, *args, **kwargs: calcular(request)[1],
+        )(vista)
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return vista(request, *args, **kwargs)
+            response = condicionada(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return envoltura
+    return decorador
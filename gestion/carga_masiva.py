@@ -0,0 +1,269 @@
+"""
+Carga masiva de datos, compartida por los comandos transfer_data y
+cargar_fixture.
+
+loaddata guarda los objetos uno por uno; para datos_lab.json eso significa
+miles de INSERT y, por cada ReservaClase, el recálculo de los estados de
+las PCs de su laboratorio. cargar_fixture lee el JSON de forma incremental,
+agrupa los objetos por modelo en archivos temporales y los inserta con
+bulk_create en orden de dependencias (bulk_create no llama a save() ni
+envía post_save), recalculando los estados de las PCs una sola vez al final.
+"""
+import gzip
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.python import Deserializer
+from django.db import connections, transaction
+
+from .cache_respuestas import invalidar_todo
+from .signals import actualizar_estados_pcs
+
+TAMANO_LECTURA = 1 << 16
+
+
+def valor_json(valor):
+    """default= de json.dumps para filas de .values(); a diferencia de DjangoJSONEncoder conserva los microsegundos."""
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f'Tipo no serializable: {type(valor).__name__}')
+
+
+def niveles_de_dependencia(modelos):
+    """
+    {modelo: nivel} donde cada modelo tiene un nivel mayor que el de los
+    modelos (de la misma lista) a los que apunta con llaves foráneas; los de
+    un mismo nivel no dependen entre sí.
+    """
+    modelos = set(modelos)
+    niveles = {}
+
+    def nivel(modelo, visitados):
+        if modelo not in niveles:
+            dependencias = [
+                campo.related_model for campo in modelo._meta.concrete_fields
+                if campo.many_to_one and campo.related_model in modelos
+                and campo.related_model is not modelo and campo.related_model not in visitados
+            ]
+            niveles[modelo] = 1 + max(
+                (nivel(dep, visitados | {modelo}) for dep in dependencias), default=-1
+            )
+        return niveles[modelo]
+
+    for modelo in modelos:
+        nivel(modelo, frozenset())
+    return niveles
+
+
+@contextmanager
+def conservar_fechas_automaticas(modelos):
+    """bulk_create aplica auto_now/auto_now_add; al cargar datos se conservan las fechas originales."""
+    campos = [
+        campo for modelo in modelos for campo in modelo._meta.concrete_fields
+        if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False)
+    ]
+    originales = [(campo, campo.auto_now, campo.auto_now_add) for campo in campos]
+    for campo in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originales:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def leer_objetos_json(archivo, tamano_lectura=TAMANO_LECTURA):
+    """
+    Genera uno a uno los elementos de un arreglo JSON ([{...}, {...}]) leyendo
+    el archivo por partes, sin cargarlo completo en memoria.
+    """
+    decodificador = json.JSONDecoder()
+    buffer, posicion = '', 0
+    fin_archivo = False
+    estado = 'inicio'  # inicio -> primero -> (elemento -> separador)* -> ]
+
+    def leer_mas():
+        nonlocal buffer, posicion, fin_archivo
+        parte = archivo.read(tamano_lectura)
+        fin_archivo = not parte
+        buffer, posicion = buffer[posicion:] + parte, 0
+
+    while True:
+        while True:
+            while posicion < len(buffer) and buffer[posicion] in ' \t\r\n':
+                posicion += 1
+            if posicion < len(buffer) or fin_archivo:
+                break
+            leer_mas()
+        if posicion >= len(buffer):
+            raise DeserializationError('El archivo terminó antes de cerrar el arreglo JSON')
+
+        caracter = buffer[posicion]
+        if estado == 'inicio':
+            if caracter != '[':
+                raise DeserializationError('El fixture debe ser un arreglo JSON')
+            estado = 'primero'
+            posicion += 1
+            continue
+        if caracter == ']' and estado in ('primero', 'separador'):
+            return
+        if estado == 'separador':
+            if caracter != ',':
+                raise DeserializationError(f'Se esperaba "," en la posición {posicion} del bloque leído')
+            estado = 'elemento'
+            posicion += 1
+            continue
+
+        try:
+            objeto, fin = decodificador.raw_decode(buffer, posicion)
+        except json.JSONDecodeError as e:
+            if fin_archivo:
+                raise DeserializationError(f'JSON inválido: {e}')
+            leer_mas()  # elemento incompleto: reintentar con más texto
+            continue
+        if fin == len(buffer) and not fin_archivo:
+            leer_mas()  # un número o literal pudo quedar cortado al final del bloque
+            continue
+
+        yield objeto
+        estado = 'separador'
+        posicion = fin
+        if posicion > tamano_lectura:
+            buffer, posicion = buffer[posicion:], 0
+
+
+def _abrir(ruta):
+    if ruta.endswith('.gz'):
+        return gzip.open(ruta, 'rt', encoding='utf-8-sig')
+    return open(ruta, encoding='utf-8-sig')
+
+
+def _opciones_upsert(modelo, using):
+    """
+    Opciones de bulk_create para que una pk existente actualice la fila, como
+    hace loaddata. El conflicto se detecta sobre la llave primaria real de la
+    tabla, que en tablas particionadas incluye la columna de partición
+    (gestion_visita en PostgreSQL: id + fecha_hora_inicio).
+    """
+    conexion = connections[using]
+    if not conexion.features.supports_update_conflicts:
+        return {}
+    columnas = [modelo._meta.pk.column]
+    if conexion.vendor == 'postgresql':
+        with conexion.cursor() as cursor:
+            restricciones = conexion.introspection.get_constraints(cursor, modelo._meta.db_table)
+        columnas = next((r['columns'] for r in restricciones.values() if r['primary_key']), columnas)
+    por_columna = {campo.column: campo.name for campo in modelo._meta.concrete_fields}
+    unicos = [por_columna[columna] for columna in columnas]
+    campos = [campo.name for campo in modelo._meta.concrete_fields if campo.name not in unicos]
+    if not campos:
+        return {'ignore_conflicts': True}
+    opciones = {'update_conflicts': True, 'update_fields': campos}
+    if conexion.features.supports_update_conflicts_with_target:
+        opciones['unique_fields'] = unicos
+    return opciones
+
+
+def _cargar_lote(modelo, objetos, using, lote, opciones, ignorar_inexistentes, m2m_pendientes):
+    deserializados = list(Deserializer(objetos, using=using, ignorenonexistent=ignorar_inexistentes))
+    modelo._base_manager.using(using).bulk_create(
+        [deserializado.object for deserializado in deserializados], batch_size=lote, **opciones
+    )
+    for deserializado in deserializados:
+        for nombre, pks in (deserializado.m2m_data or {}).items():
+            m2m_pendientes.setdefault((modelo, nombre), {})[deserializado.object.pk] = pks
+    return len(deserializados)
+
+
+def _insertar_m2m(modelo, nombre, relaciones, using, lote):
+    """Reemplaza las relaciones M2M de los objetos cargados (equivalente a .set())."""
+    campo = modelo._meta.get_field(nombre)
+    intermedia = campo.remote_field.through
+    if not intermedia._meta.auto_created:
+        return  # las tablas intermedias explícitas vienen como modelos en el fixture
+    origen = f'{campo.m2m_field_name()}_id'
+    destino = f'{campo.m2m_reverse_field_name()}_id'
+    manager = intermedia._base_manager.using(using)
+    ids = list(relaciones)
+    for inicio in range(0, len(ids), lote):
+        manager.filter(**{f'{origen}__in': ids[inicio:inicio + lote]}).delete()
+    filas = [
+        intermedia(**{origen: pk, destino: relacionado})
+        for pk, relacionados in relaciones.items() for relacionado in relacionados
+    ]
+    manager.bulk_create(filas, batch_size=lote, ignore_conflicts=True)
+
+
+def cargar_fixture(ruta, using='default', lote=1000, ignorar_inexistentes=False):
+    """
+    Carga un fixture JSON de dumpdata (opcionalmente .gz) con bulk_create.
+    Retorna {etiqueta_modelo: objetos_cargados}.
+    """
+    conteo = {}
+    with tempfile.TemporaryDirectory() as temporal:
+        # 1. Separar los objetos por modelo en archivos NDJSON temporales
+        archivos = {}
+        try:
+            with _abrir(ruta) as entrada:
+                for objeto in leer_objetos_json(entrada):
+                    etiqueta = objeto.get('model', '') if isinstance(objeto, dict) else ''
+                    try:
+                        modelo = apps.get_model(etiqueta)
+                    except (LookupError, ValueError):
+                        if ignorar_inexistentes:
+                            continue
+                        raise DeserializationError(f'Modelo inválido en el fixture: {etiqueta!r}')
+                    if modelo not in archivos:
+                        archivos[modelo] = open(
+                            os.path.join(temporal, f'{len(archivos)}.ndjson'), 'w+', encoding='utf-8'
+                        )
+                    archivos[modelo].write(json.dumps(objeto, ensure_ascii=False))
+                    archivos[modelo].write('\n')
+
+            # 2. Insertar por modelo en orden de dependencias
+            niveles = niveles_de_dependencia(archivos)
+            m2m_pendientes = {}
+            with transaction.atomic(using=using), conservar_fechas_automaticas(archivos):
+                for modelo in sorted(archivos, key=lambda m: (niveles[m], m._meta.label)):
+                    archivo = archivos[modelo]
+                    archivo.seek(0)
+                    opciones = _opciones_upsert(modelo, using)
+                    lote_actual = []
+                    total = 0
+                    for linea in archivo:
+                        lote_actual.append(json.loads(linea))
+                        if len(lote_actual) >= lote:
+                            total += _cargar_lote(modelo, lote_actual, using, lote, opciones, ignorar_inexistentes, m2m_pendientes)
+                            lote_actual = []
+                    if lote_actual:
+                        total += _cargar_lote(modelo, lote_actual, using, lote, opciones, ignorar_inexistentes, m2m_pendientes)
+                    conteo[modelo._meta.label] = total
+
+                for (modelo, nombre), relaciones in m2m_pendientes.items():
+                    _insertar_m2m(modelo, nombre, relaciones, using, lote)
+
+                # Las pks vienen del fixture: ajustar las secuencias (PostgreSQL)
+                conexion = connections[using]
+                sentencias = conexion.ops.sequence_reset_sql(no_style(), list(archivos))
+                if sentencias:
+                    with conexion.cursor() as cursor:
+                        for sentencia in sentencias:
+                            cursor.execute(sentencia)
+
+                # Un solo recálculo en lugar de uno por cada ReservaClase guardada
+                actualizar_estados_pcs(using=using)
+                invalidar_todo()
+        finally:
+            for archivo in archivos.values():
+                archivo.close()
+    return conteo
+
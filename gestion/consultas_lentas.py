@@ -0,0 +1,122 @@
+"""
+Registro muestreado de consultas lentas.
+
+MedicionRendimientoMiddleware revisa cada consulta de la petición: las que
+tardan al menos CONSULTAS_LENTAS_UMBRAL_MS se toman como muestra con
+probabilidad CONSULTAS_LENTAS_MUESTREO y programar() las deja pendientes.
+Cuando el servidor termina de enviar la respuesta (señal request_finished,
+fuera del execute_wrapper) guardar() las acumula en ConsultaLenta por
+huella: el SQL sin valores literales, así que todas las ejecuciones de una
+misma forma de consulta (p. ej. cada rango de fechas de un reporte) suman en
+una sola fila.
+
+Para la muestra más lenta de cada huella se guarda el plan de ejecución:
+EXPLAIN (ANALYZE, BUFFERS) en PostgreSQL y EXPLAIN QUERY PLAN en SQLite.
+ANALYZE vuelve a ejecutar la consulta, por eso se hace después de responder
+y solo con SELECT sin FOR UPDATE/FOR SHARE (que volverían a tomar bloqueos).
+"""
+import hashlib
+import logging
+import re
+import threading
+
+from django.core.signals import request_finished
+from django.db import DatabaseError, connections, transaction
+from django.dispatch import receiver
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LONGITUD_RUTA = 200
+
+_CADENA = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTA = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ESPACIOS = re.compile(r'\s+')
+_BLOQUEO = re.compile(r'\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b', re.IGNORECASE)
+
+EXPLAIN = {
+    'postgresql': 'EXPLAIN (ANALYZE, BUFFERS) ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+
+def normalizar(sql):
+    """SQL sin valores: literales y parámetros como ?, listas IN/VALUES como (...)."""
+    sql = _CADENA.sub('?', sql).replace('%s', '?')
+    sql = _NUMERO.sub('?', sql)
+    sql = _LISTA.sub('(...)', sql)
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+def huella(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode('utf-8')).hexdigest()
+
+
+def capturar_plan(sql, params, alias='default'):
+    """Plan de ejecución de un SELECT, o '' si el motor o la sentencia no lo permiten."""
+    conexion = connections[alias]
+    prefijo = EXPLAIN.get(conexion.vendor)
+    if prefijo is None or not sql.lstrip().upper().startswith('SELECT') or _BLOQUEO.search(sql):
+        return ''
+    try:
+        with transaction.atomic(using=alias), conexion.cursor() as cursor:
+            cursor.execute(prefijo + sql, params)
+            filas = cursor.fetchall()
+    except DatabaseError as e:
+        return f'No se pudo obtener el plan: {e}'
+    # PostgreSQL: una columna por línea; SQLite: (id, padre, no_usado, detalle)
+    return '\n'.join(str(fila[-1]) for fila in filas)
+
+
+# Muestras de las peticiones del hilo que aún no terminan de enviarse
+_pendientes = threading.local()
+
+
+def programar(muestras, ruta=''):
+    """Deja las muestras para guardarlas cuando la respuesta ya se envió."""
+    if not hasattr(_pendientes, 'lotes'):
+        _pendientes.lotes = []
+    _pendientes.lotes.append((muestras, ruta))
+
+
+@receiver(request_finished)
+def guardar_pendientes(sender, **kwargs):
+    lotes = getattr(_pendientes, 'lotes', None)
+    if not lotes:
+        return
+    _pendientes.lotes = []
+    for muestras, ruta in lotes:
+        guardar(muestras, ruta)
+
+
+def guardar(muestras, ruta=''):
+    """Acumula las muestras [(sql, params, segundos, alias)] de una petición en ConsultaLenta."""
+    for sql, params, duracion, alias in muestras:
+        try:
+            _guardar_muestra(sql, params, duracion * 1000, alias, ruta[:LONGITUD_RUTA])
+        except DatabaseError:
+            logger.exception('No se pudo registrar la consulta lenta')
+
+
+def _guardar_muestra(sql, params, ms, alias, ruta):
+    from .models import ConsultaLenta
+
+    normalizado = normalizar(sql)
+    consulta, creada = ConsultaLenta.objects.get_or_create(
+        huella=huella(normalizado), defaults={'sql': normalizado}
+    )
+    cambios = {
+        'muestras': F('muestras') + 1,
+        'tiempo_total_ms': F('tiempo_total_ms') + ms,
+        'ultima_vez': timezone.now(),
+    }
+    if creada or ms > consulta.tiempo_max_ms:
+        cambios.update(
+            tiempo_max_ms=ms,
+            ejemplo=f'{sql}\n-- parámetros: {params!r}',
+            ruta=ruta,
+            plan=capturar_plan(sql, params, alias),
+        )
+    ConsultaLenta.objects.filter(pk=consulta.pk).update(**cambios)
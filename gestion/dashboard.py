@@ -0,0 +1,166 @@
+"""
+Datos del dashboard React en una sola petición (/api/dashboard/all/).
+
+El dashboard pedía por separado stats, lab-usage, software-usage,
+visits-timeline y recent-visits, y cada API volvía a recorrer las visitas de
+los últimos 30 días. Aquí esa ventana se lee una sola vez agrupada por
+(laboratorio, software, día): de esas pocas filas salen las visitas por
+laboratorio, el uso de software, la línea de tiempo y las visitas del último
+mes. Las PCs se agrupan una vez por laboratorio (capacidad, total y en uso).
+
+La ventana se agrupa por bloques de 15 minutos desde 1970 (Epoch de
+gestion/ocupacion.py, aritmética entera en la base) en lugar de TruncDate,
+que en SQLite convierte la zona horaria con una función de Python por fila;
+el día local de cada bloque se calcula aquí (todas las zonas horarias tienen
+desfases múltiplos de 15 minutos). El tiempo promedio también usa Epoch en
+lugar de restar DateTimeField.
+
+Cada sección tiene la misma forma que la respuesta de su API individual y
+'duracion_ms' trae lo que tardó cada una (la ventana compartida aparte).
+"""
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.db.models import Avg, Count, FloatField, Q
+from django.utils import timezone
+
+from .models import Estudiante, Laboratorio, PC, Software, Visita
+from .ocupacion import Epoch
+
+DIAS_VENTANA = 30
+BLOQUE = 900  # segundos
+
+
+def _tiempo_promedio(segundos):
+    if not segundos:
+        return "0h 0m"
+    return f"{int(segundos // 3600)}h {int((segundos % 3600) // 60)}m"
+
+
+def ventana_visitas(desde):
+    """Visitas desde `desde` agrupadas por laboratorio, software y día local: [(lab, software, dia, visitas)]."""
+    filas = Visita.objects.filter(fecha_hora_inicio__gte=desde).values_list(
+        'pc__laboratorio_id', 'software_utilizado_id', Epoch('fecha_hora_inicio') / BLOQUE,
+    ).annotate(visitas=Count('id')).order_by()
+
+    zona = timezone.get_current_timezone()
+    dias = {}
+    ventana = []
+    for laboratorio_id, software_id, bloque, visitas in filas:
+        if bloque not in dias:
+            dias[bloque] = datetime.fromtimestamp(bloque * BLOQUE, zona).date()
+        ventana.append((laboratorio_id, software_id, dias[bloque], visitas))
+    return ventana
+
+
+def visitas_recientes(limite=10):
+    """Las últimas `limite` visitas como las muestra el dashboard."""
+    recientes = Visita.objects.select_related(
+        'estudiante', 'pc__laboratorio', 'software_utilizado'
+    ).order_by('-fecha_hora_inicio')[:limite]
+
+    data = []
+    for visita in recientes:
+        # Convertir a zona horaria local de México
+        fecha_inicio_local = timezone.localtime(visita.fecha_hora_inicio)
+        fecha_fin_local = timezone.localtime(visita.fecha_hora_fin) if visita.fecha_hora_fin else None
+        data.append({
+            'id': visita.id,
+            'estudiante': visita.estudiante.nombre_completo,
+            'laboratorio': visita.pc.laboratorio.nombre,
+            'pc': str(visita.pc),
+            'software': visita.software_utilizado.nombre if visita.software_utilizado else 'N/A',
+            'fecha_inicio': fecha_inicio_local.strftime('%Y-%m-%d %H:%M'),
+            'fecha_fin': fecha_fin_local.strftime('%Y-%m-%d %H:%M') if fecha_fin_local else 'En curso',
+            'estado': 'En uso' if visita.fecha_hora_fin is None else 'Terminado'
+        })
+    return data
+
+
+def datos_dashboard():
+    """Las cinco secciones del dashboard y 'duracion_ms' por sección."""
+    duraciones = {}
+    inicio = time.perf_counter()
+
+    def medir(nombre):
+        nonlocal inicio
+        ahora = time.perf_counter()
+        duraciones[nombre] = round((ahora - inicio) * 1000, 1)
+        inicio = ahora
+
+    ventana = ventana_visitas(timezone.now() - timedelta(days=DIAS_VENTANA))
+    por_laboratorio, por_software, por_dia = Counter(), Counter(), Counter()
+    for laboratorio_id, software_id, dia, visitas in ventana:
+        por_laboratorio[laboratorio_id] += visitas
+        por_dia[dia] += visitas
+        if software_id is not None:
+            por_software[software_id] += visitas
+    medir('ventana')
+
+    pcs = {
+        fila['laboratorio_id']: fila
+        for fila in PC.objects.values('laboratorio_id').annotate(
+            total=Count('id'), en_uso=Count('id', filter=Q(estado='En Uso'))
+        ).order_by()
+    }
+    laboratorios = list(Laboratorio.objects.values_list('id', 'nombre'))
+    # Avg ignora las visitas en curso (fin NULL)
+    visitas = Visita.objects.aggregate(
+        total=Count('id'),
+        promedio=Avg(Epoch('fecha_hora_fin') - Epoch('fecha_hora_inicio'), output_field=FloatField()),
+    )
+    total_pcs = sum(fila['total'] for fila in pcs.values())
+    pcs_en_uso = sum(fila['en_uso'] for fila in pcs.values())
+    stats = {
+        'total_visitas': visitas['total'],
+        'total_estudiantes': Estudiante.objects.count(),
+        'total_laboratorios': len(laboratorios),
+        'total_pcs': total_pcs,
+        'pcs_en_uso': pcs_en_uso,
+        'visitas_ultimo_mes': sum(por_dia.values()),
+        'tiempo_promedio': _tiempo_promedio(visitas['promedio']),
+        'porcentaje_ocupacion': round(pcs_en_uso / total_pcs * 100, 1) if total_pcs > 0 else 0,
+    }
+    medir('stats')
+
+    uso_laboratorios = sorted(
+        (
+            {
+                'laboratorio': nombre,
+                'visitas': por_laboratorio[laboratorio_id],
+                'capacidad': pcs.get(laboratorio_id, {}).get('total', 0),
+            }
+            for laboratorio_id, nombre in laboratorios
+        ),
+        key=lambda fila: -fila['visitas'],
+    )
+    medir('lab_usage')
+
+    mas_usados = por_software.most_common(10)
+    software = Software.objects.in_bulk([software_id for software_id, _ in mas_usados])
+    uso_software = [
+        {
+            'software': software[software_id].nombre,
+            'usos': usos,
+            'categoria': getattr(software[software_id], 'categoria', 'Sin categoría'),
+        }
+        for software_id, usos in mas_usados if software_id in software
+    ]
+    medir('software_usage')
+
+    linea_tiempo = [{'fecha': dia.strftime('%Y-%m-%d'), 'visitas': total} for dia, total in sorted(por_dia.items())]
+    medir('visits_timeline')
+
+    recientes = visitas_recientes()
+    medir('recent_visits')
+
+    duraciones['total'] = round(sum(duraciones.values()), 1)
+    return {
+        'stats': stats,
+        'lab_usage': {'data': uso_laboratorios},
+        'software_usage': {'data': uso_software},
+        'visits_timeline': {'data': linea_tiempo},
+        'recent_visits': {'data': recientes},
+        'duracion_ms': duraciones,
+    }
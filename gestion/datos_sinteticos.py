@@ -0,0 +1,326 @@
+"""
+Generación de datos sintéticos con volúmenes realistas para medir el
+rendimiento (comando generar_datos_sinteticos y pruebas de regresión).
+
+Con la misma semilla y los mismos parámetros se obtiene siempre el mismo
+conjunto de datos. Las visitas siguen patrones de uso reales: más entre
+semana que en sábado, picos a media mañana y al inicio de la tarde,
+duraciones log-normales y una PC no tiene dos visitas a la vez. Todo se
+inserta con bulk_create por lotes.
+"""
+import heapq
+import math
+import random
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .carga_masiva import conservar_fechas_automaticas
+from .forms import CARRERAS_CHOICES
+from .models import (
+    Carrera, DiaSemana, Estudiante, Laboratorio, Mantenimiento, PC, ReservaClase, SerieReserva,
+    Software, UtilizacionHora, Visita,
+)
+from .planificacion import DIAS_MAP
+from .cache_respuestas import invalidar_todo
+from .signals import actualizar_estados_pcs
+
+SOFTWARE = [
+    'Office', 'AutoCAD', 'SolidWorks', 'MATLAB', 'Python', 'Visual Studio Code', 'NetBeans',
+    'Android Studio', 'Packet Tracer', 'Wireshark', 'SPSS', 'R Studio', 'Adobe Photoshop',
+    'Adobe Illustrator', 'Adobe Acrobat', 'Blender', 'Unity', 'Arduino IDE', 'LabVIEW', 'Proteus',
+    'Multisim', 'MySQL Workbench', 'PostgreSQL', 'Revit', 'SketchUp',
+]
+MATERIAS = [
+    'Programación', 'Bases de Datos', 'Redes', 'Estadística', 'Dibujo Asistido', 'Circuitos',
+    'Métodos Numéricos', 'Diseño Gráfico', 'Sistemas Operativos', 'Simulación',
+]
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Sofía', 'Diego', 'Valeria', 'Carlos', 'Fernanda', 'Jorge']
+APELLIDOS = ['García', 'Hernández', 'López', 'Martínez', 'González', 'Pérez', 'Rodríguez', 'Sánchez']
+DIAS = [('D', 'Domingo'), ('L', 'Lunes'), ('M', 'Martes'), ('X', 'Miércoles'),
+        ('J', 'Jueves'), ('V', 'Viernes'), ('S', 'Sábado')]
+COLORES = ['#667eea', '#f56565', '#48bb78', '#ed8936', '#38b2ac', '#9f7aea']
+
+HORA_APERTURA = 7
+HORA_CIERRE = 21
+# Afluencia relativa por hora (7:00 a 20:00) y por día de la semana (lunes=0)
+AFLUENCIA_HORA = [0.3, 0.8, 1.0, 1.0, 0.9, 0.6, 0.5, 0.7, 0.9, 0.9, 0.7, 0.5, 0.3, 0.1]
+AFLUENCIA_DIA = [1.0, 1.0, 1.0, 1.0, 0.8, 0.3, 0.0]
+COMBINACIONES_DIAS = [('L', 'X'), ('M', 'J'), ('L', 'X', 'V'), ('V',), ('S',), ('M',), ('J',)]
+BLOQUES_CLASE = [(7, 9), (9, 11), (11, 13), (13, 15), (15, 17), (17, 19), (19, 21)]
+
+
+def _nombres_laboratorio(existentes):
+    """Laboratorio A..Z, AA..; la última letra identifica a las PCs (A1, B12...)."""
+    letras = [chr(ord('A') + i) for i in range(26)]
+    candidatos = letras + [a + b for a in letras for b in letras]
+    for letra in candidatos:
+        nombre = f'Laboratorio {letra}'
+        if nombre not in existentes:
+            yield nombre
+
+
+def limpiar_datos():
+    """Borra los datos operativos (no usuarios, días ni carreras) sin disparar señales por fila."""
+    # Todo o nada: si un DELETE falla no queda la base a medio vaciar
+    with transaction.atomic():
+        for modelo in (SerieReserva.dias_semana.through, Software.laboratorios.through, Visita,
+                       Mantenimiento, ReservaClase, SerieReserva, UtilizacionHora, PC, Laboratorio,
+                       Software, Estudiante):
+            # _raw_delete: un DELETE directo; el orden respeta las llaves foráneas
+            modelo.objects.all()._raw_delete(modelo.objects.db)
+        # Sin señales por fila: las respuestas en caché no se enteran del borrado
+        invalidar_todo()
+
+
+def _asegurar_catalogos():
+    existentes = set(DiaSemana.objects.values_list('codigo', flat=True))
+    DiaSemana.objects.bulk_create(
+        [DiaSemana(codigo=codigo, nombre=nombre) for codigo, nombre in DIAS if codigo not in existentes]
+    )
+    carreras = [valor for valor, _ in CARRERAS_CHOICES if valor]
+    existentes = set(Carrera.objects.values_list('nombre', flat=True))
+    Carrera.objects.bulk_create([Carrera(nombre=nombre) for nombre in carreras if nombre not in existentes])
+    existentes = set(Software.objects.values_list('nombre', flat=True))
+    Software.objects.bulk_create([Software(nombre=nombre) for nombre in SOFTWARE if nombre not in existentes])
+    return carreras, {dia.codigo: dia for dia in DiaSemana.objects.all()}
+
+
+def _crear_laboratorios(rng, cantidad, pcs_por_laboratorio):
+    existentes = set(Laboratorio.objects.values_list('nombre', flat=True))
+    nombres = _nombres_laboratorio(existentes)
+    laboratorios = Laboratorio.objects.bulk_create([
+        Laboratorio(nombre=next(nombres), descripcion='Generado para pruebas de rendimiento')
+        for _ in range(cantidad)
+    ])
+    software = list(Software.objects.filter(nombre__in=SOFTWARE))
+    basico = [s for s in software if s.nombre in ('Office', 'Adobe Acrobat', 'Python')]
+    enlaces = []
+    instalado = {}
+    for laboratorio in laboratorios:
+        elegido = set(basico) | set(rng.sample(software, rng.randint(6, 12)))
+        instalado[laboratorio.id] = sorted(s.id for s in elegido)
+        enlaces += [
+            Software.laboratorios.through(software_id=s.id, laboratorio_id=laboratorio.id) for s in elegido
+        ]
+    Software.laboratorios.through.objects.bulk_create(enlaces)
+    PC.objects.bulk_create([
+        PC(numero_pc=numero, laboratorio=laboratorio)
+        for laboratorio in laboratorios for numero in range(1, pcs_por_laboratorio + 1)
+    ])
+    return laboratorios, instalado
+
+
+def _crear_estudiantes(rng, cantidad, carreras, lote):
+    inicio = Estudiante.objects.filter(id__startswith='S').count()
+    ids = []
+    objetos = []
+    for i in range(inicio, inicio + cantidad):
+        ids.append(f'S{i:07d}')
+        objetos.append(Estudiante(
+            id=ids[-1],
+            nombre_completo=f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}',
+            correo=f's{i:07d}@alumnos.example.edu',
+            celular=f'449{rng.randrange(10**7):07d}',
+            carrera=rng.choice(carreras),
+        ))
+    Estudiante.objects.bulk_create(objetos, batch_size=lote)
+    return ids
+
+
+def _horarios_visita(rng, inicio, fin, cantidad):
+    """Inicios de visita ordenados, distribuidos según la afluencia por día y hora."""
+    franjas, pesos = [], []
+    dia = inicio.date()
+    while dia <= fin.date():
+        for indice, peso_hora in enumerate(AFLUENCIA_HORA):
+            peso = AFLUENCIA_DIA[dia.weekday()] * peso_hora
+            if peso:
+                franjas.append(timezone.make_aware(datetime.combine(dia, time(HORA_APERTURA + indice))))
+                pesos.append(peso)
+        dia += timedelta(days=1)
+    horarios = [
+        franja + timedelta(seconds=rng.randrange(3600))
+        for franja in rng.choices(franjas, weights=pesos, k=cantidad)
+    ]
+    return sorted(h for h in horarios if inicio <= h < fin)
+
+
+def _crear_visitas(rng, laboratorios, instalado, estudiantes, cantidad, inicio, fin, lote):
+    """
+    Asigna cada inicio a un laboratorio (unos más concurridos que otros) y a
+    la PC que se liberó antes; si el laboratorio está lleno el estudiante va
+    al que tenga una PC libre y si todos lo están la visita se descarta.
+    Las visitas que siguen en curso en `fin` quedan activas.
+    """
+    libres = {laboratorio.id: [] for laboratorio in laboratorios}
+    for pc_id, laboratorio_id in PC.objects.filter(laboratorio__in=laboratorios).values_list('id', 'laboratorio_id'):
+        libres[laboratorio_id].append((inicio, pc_id))
+    ids_laboratorio = list(libres)
+    pesos = [rng.uniform(0.5, 1.5) for _ in ids_laboratorio]
+
+    horarios = _horarios_visita(rng, inicio, fin, cantidad)
+    destinos = rng.choices(ids_laboratorio, weights=pesos, k=len(horarios))
+    creadas = 0
+    en_uso = set()
+    pendientes = []
+    for horario, laboratorio_id in zip(horarios, destinos):
+        if libres[laboratorio_id][0][0] > horario:
+            laboratorio_id = min(ids_laboratorio, key=lambda lab: libres[lab][0])
+            if libres[laboratorio_id][0][0] > horario:
+                continue
+        cola = libres[laboratorio_id]
+        pc_id = cola[0][1]
+        minutos = min(max(rng.lognormvariate(math.log(60), 0.5), 10), 240)
+        cierre = horario.replace(hour=HORA_CIERRE, minute=0, second=0)
+        salida = min(horario + timedelta(minutes=minutos), cierre)
+        heapq.heapreplace(cola, (salida, pc_id))
+
+        activa = salida > fin
+        if activa:
+            en_uso.add(pc_id)
+        # Pocos estudiantes concentran muchas visitas
+        estudiante = estudiantes[int(len(estudiantes) * rng.random() ** 1.3)]
+        pendientes.append(Visita(
+            estudiante_id=estudiante, pc_id=pc_id,
+            software_utilizado_id=rng.choice(instalado[laboratorio_id]),
+            fecha_hora_inicio=horario, fecha_hora_fin=None if activa else salida,
+        ))
+        creadas += 1
+        if len(pendientes) >= lote:
+            Visita.objects.bulk_create(pendientes)
+            pendientes = []
+    Visita.objects.bulk_create(pendientes)
+    PC.objects.filter(id__in=en_uso).update(estado='En Uso')
+    return creadas, en_uso
+
+
+def _crear_series(rng, laboratorios, dias_semana, carreras, series_por_laboratorio, inicio, fin, lote):
+    """Series semestrales sin traslapes dentro de cada laboratorio, con todas sus ocurrencias."""
+    fecha_inicio, fecha_fin = inicio.date(), (fin + timedelta(days=30)).date()
+    series, dias_por_serie = [], []
+    for laboratorio in laboratorios:
+        ocupado = set()
+        creadas = 0
+        opciones = [(dias, bloque) for dias in COMBINACIONES_DIAS for bloque in BLOQUES_CLASE]
+        rng.shuffle(opciones)
+        for dias, bloque in opciones:
+            if creadas >= series_por_laboratorio:
+                break
+            if any((dia, bloque) in ocupado for dia in dias):
+                continue
+            creadas += 1
+            ocupado.update((dia, bloque) for dia in dias)
+            materia = rng.choice(MATERIAS)
+            series.append(SerieReserva(
+                nombre=f'{materia} - Grupo {len(series) + 1}', laboratorio=laboratorio,
+                profesor=f'Prof. {rng.choice(APELLIDOS)}', materia=materia,
+                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+                hora_inicio=time(bloque[0]), hora_fin=time(bloque[1]),
+                color=rng.choice(COLORES), carrera=rng.choice(carreras),
+                semestre=rng.randint(1, 9), numero_alumnos=rng.randint(10, 40),
+                creada_el=inicio,
+            ))
+            dias_por_serie.append(dias)
+    SerieReserva.objects.bulk_create(series)
+
+    SerieReserva.dias_semana.through.objects.bulk_create([
+        SerieReserva.dias_semana.through(seriereserva_id=serie.id, diasemana_id=dias_semana[codigo].id)
+        for serie, dias in zip(series, dias_por_serie) for codigo in dias
+    ])
+
+    ocurrencias = []
+    total = 0
+    for serie, dias in zip(series, dias_por_serie):
+        dias_numero = {DIAS_MAP[codigo] for codigo in dias}
+        fecha = fecha_inicio
+        while fecha <= fecha_fin:
+            if fecha.weekday() in dias_numero:
+                ocurrencias.append(ReservaClase(
+                    serie=serie, laboratorio_id=serie.laboratorio_id,
+                    profesor=serie.profesor, materia=serie.materia,
+                    fecha_hora_inicio=timezone.make_aware(datetime.combine(fecha, serie.hora_inicio)),
+                    fecha_hora_fin=timezone.make_aware(datetime.combine(fecha, serie.hora_fin)),
+                    color=serie.color, carrera=serie.carrera, semestre=serie.semestre,
+                    numero_alumnos=serie.numero_alumnos,
+                ))
+            fecha += timedelta(days=1)
+        if len(ocurrencias) >= lote:
+            total += len(ReservaClase.objects.bulk_create(ocurrencias))
+            ocurrencias = []
+    total += len(ReservaClase.objects.bulk_create(ocurrencias))
+    return len(series), total
+
+
+def _crear_mantenimientos(rng, laboratorios, promedio_por_pc, en_uso, inicio, fin, lote):
+    """Mantenimientos sin traslape por PC; ~3% de las PCs libres quedan con uno activo."""
+    mantenimientos = []
+    en_mantenimiento = []
+    segundos = (fin - inicio).total_seconds()
+    for pc_id in PC.objects.filter(laboratorio__in=laboratorios).values_list('id', flat=True).order_by('id'):
+        # Llegadas de Poisson a lo largo del periodo
+        inicios = []
+        instante = rng.expovariate(promedio_por_pc / segundos) if promedio_por_pc else segundos
+        while instante < segundos:
+            inicios.append(inicio + timedelta(seconds=instante))
+            instante += rng.expovariate(promedio_por_pc / segundos)
+        libre = inicio
+        for comienzo in inicios:
+            comienzo = max(comienzo, libre)
+            termino = comienzo + timedelta(hours=min(rng.lognormvariate(math.log(4), 1.0), 24 * 7))
+            if termino >= fin:
+                break
+            mantenimientos.append(Mantenimiento(
+                pc_id=pc_id, fecha_inicio=comienzo, fecha_fin=termino,
+                descripcion=rng.choice(['preventivo: limpieza', 'correctivo: disco', 'correctivo: red',
+                                        'preventivo: actualización']),
+            ))
+            libre = termino
+        if pc_id not in en_uso and rng.random() < 0.03:
+            en_mantenimiento.append(pc_id)
+            mantenimientos.append(Mantenimiento(
+                pc_id=pc_id, fecha_inicio=max(libre, fin - timedelta(hours=rng.randint(1, 48))),
+                descripcion='correctivo: en revisión',
+            ))
+    Mantenimiento.objects.bulk_create(mantenimientos, batch_size=lote)
+    PC.objects.filter(id__in=en_mantenimiento).update(estado='Mantenimiento')
+    return len(mantenimientos)
+
+
+def generar_datos(laboratorios=6, pcs_por_laboratorio=30, estudiantes=5000, visitas=200000, dias=180,
+                  series_por_laboratorio=8, mantenimientos_por_pc=2.0, semilla=42, fin=None, lote=5000):
+    """
+    Genera un conjunto de datos completo terminando en `fin` (por defecto la
+    hora actual) y retorna los conteos creados.
+    """
+    rng = random.Random(semilla)
+    fin = fin or timezone.localtime().replace(minute=0, second=0, microsecond=0)
+    inicio = fin - timedelta(days=dias)
+    modelos = [Visita, SerieReserva, ReservaClase, Mantenimiento]
+
+    with transaction.atomic(), conservar_fechas_automaticas(modelos):
+        carreras, dias_semana = _asegurar_catalogos()
+        labs, instalado = _crear_laboratorios(rng, laboratorios, pcs_por_laboratorio)
+        ids_estudiantes = _crear_estudiantes(rng, estudiantes, carreras, lote)
+        num_visitas, en_uso = _crear_visitas(rng, labs, instalado, ids_estudiantes, visitas, inicio, fin, lote)
+        num_series, num_ocurrencias = _crear_series(
+            rng, labs, dias_semana, carreras, series_por_laboratorio, inicio, fin, lote
+        )
+        num_mantenimientos = _crear_mantenimientos(
+            rng, labs, mantenimientos_por_pc, en_uso, inicio, fin, lote
+        )
+        actualizar_estados_pcs()
+        # bulk_create no dispara señales: las respuestas guardadas ya no valen
+        invalidar_todo()
+
+    return {
+        'laboratorios': len(labs),
+        'pcs': len(labs) * pcs_por_laboratorio,
+        'estudiantes': len(ids_estudiantes),
+        'visitas': num_visitas,
+        'sesiones_activas': len(en_uso),
+        'series': num_series,
+        'ocurrencias': num_ocurrencias,
+        'mantenimientos': num_mantenimientos,
+    }
@@ -0,0 +1,222 @@
+"""
+Estadísticas de visitas calculadas en la base de datos, compartidas por las
+APIs de reportes y por ReportGenerator.
+
+Cada función recibe un Q sobre Visita (los filtros del reporte) y usa un
+número fijo de consultas sin importar cuántos laboratorios, software o
+estudiantes haya: las visitas se agrupan con values().annotate() en lugar de
+recorrer cada laboratorio/software/usuario y sumar duraciones en Python.
+"""
+from django.db.models import BooleanField, Case, Count, DurationField, ExpressionWrapper, F, Max, Min, Sum, Value, When
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, ExtractMinute, ExtractWeekDay, TruncDate
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .models import Laboratorio, Software, Visita
+
+# Duración de la visita; NULL mientras siga en curso, así que Sum solo toma las terminadas
+DURACION = ExpressionWrapper(F('fecha_hora_fin') - F('fecha_hora_inicio'), output_field=DurationField())
+
+DIAS_SEMANA = ['Dom', 'Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb']
+# ExtractIsoWeekDay: 1 = lunes ... 7 = domingo
+DIAS_ISO = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+
+
+def horas(duracion):
+    return duracion.total_seconds() / 3600 if duracion else 0
+
+
+def resumen_visitas(filtros):
+    """{'total_visitas', 'horas', 'sesiones_unicas'} de las visitas filtradas en una consulta."""
+    resumen = Visita.objects.filter(filtros).aggregate(
+        total_visitas=Count('id'),
+        duracion=Sum(DURACION),
+        sesiones_unicas=Count('estudiante', distinct=True),
+    )
+    return {
+        'total_visitas': resumen['total_visitas'],
+        'horas': horas(resumen['duracion']),
+        'sesiones_unicas': resumen['sesiones_unicas'],
+    }
+
+
+def uso_por_laboratorio(filtros, laboratorio='all'):
+    """[{'name', 'visitas', 'horas'}] para cada laboratorio, incluidos los que no tienen visitas."""
+    laboratorios = Laboratorio.objects.all()
+    visitas = Visita.objects.filter(filtros)
+    if laboratorio != 'all':
+        laboratorios = laboratorios.filter(id=laboratorio)
+        visitas = visitas.filter(pc__laboratorio_id=laboratorio)
+    uso = {
+        fila['pc__laboratorio_id']: fila
+        for fila in visitas.values('pc__laboratorio_id').annotate(
+            visitas=Count('id'), duracion=Sum(DURACION)
+        ).order_by()
+    }
+    data = []
+    for lab in laboratorios:
+        fila = uso.get(lab.id, {})
+        data.append({
+            'name': lab.nombre,
+            'visitas': fila.get('visitas', 0),
+            'horas': round(horas(fila.get('duracion')), 1),
+        })
+    return data
+
+
+def uso_por_software(filtros, software='all'):
+    """[{'name', 'value'}] del software usado al menos una vez."""
+    programas = Software.objects.all()
+    visitas = Visita.objects.filter(filtros)
+    if software != 'all':
+        programas = programas.filter(id=software)
+        visitas = visitas.filter(software_utilizado_id=software)
+    usos = dict(visitas.values_list('software_utilizado_id').annotate(usos=Count('id')).order_by())
+    return [
+        {'name': soft.nombre, 'value': usos[soft.id]}
+        for soft in programas if usos.get(soft.id)
+    ]
+
+
+def usuarios_mas_activos(filtros, limite=5):
+    """[{'nombre', 'visitas', 'horas'}] de los estudiantes con más visitas."""
+    usuarios = Visita.objects.filter(filtros).values('estudiante__nombre_completo').annotate(
+        total_visitas=Count('id'), duracion=Sum(DURACION)
+    ).order_by('-total_visitas')[:limite]
+    return [
+        {
+            'nombre': usuario['estudiante__nombre_completo'],
+            'visitas': usuario['total_visitas'],
+            'horas': round(horas(usuario['duracion']), 1),
+        }
+        for usuario in usuarios
+    ]
+
+
+def visitas_por_dia_semana(filtros):
+    """[{'dia', 'visitas'}] de domingo a sábado (solo los días con visitas), en hora local."""
+    filas = Visita.objects.filter(filtros).annotate(
+        dia=ExtractWeekDay('fecha_hora_inicio')
+    ).values('dia').annotate(visitas=Count('id')).order_by('dia')
+    # ExtractWeekDay: 1 = domingo ... 7 = sábado
+    return [{'dia': DIAS_SEMANA[fila['dia'] - 1], 'visitas': fila['visitas']} for fila in filas]
+
+
+def _dias_por_semana(desde, hasta):
+    """Cuántos lunes, martes, ..., domingos hay entre desde y hasta (incluidos)."""
+    total = (hasta - desde).days + 1
+    cuenta = [total // 7] * 7
+    for i in range(total % 7):
+        cuenta[(desde.isoweekday() - 1 + i) % 7] += 1
+    return cuenta
+
+
+def _sumar_minutos(minutos, fila):
+    """
+    Reparte en las horas del día los minutos de uso de un grupo de visitas con
+    la misma hora de inicio y de fin. Lo que una visita ocupa de una hora es
+    lineal en sus minutos de inicio y fin, así que bastan las sumas del grupo.
+    Las visitas que terminan otro día se cortan a medianoche.
+    """
+    hora_inicio, hora_fin = fila['hora_inicio'], fila['hora_fin']
+    if hora_fin is None:  # visitas en curso: cuentan como visita pero no como ocupación
+        return
+    visitas, minutos_fin = fila['visitas'], fila['minutos_fin']
+    if fila['cruza_dia']:
+        hora_fin, minutos_fin = 24, 0
+    if hora_fin < hora_inicio:
+        return
+    if hora_inicio == hora_fin:
+        minutos[hora_inicio] += minutos_fin - fila['minutos_inicio']
+        return
+    minutos[hora_inicio] += 60 * visitas - fila['minutos_inicio']
+    for hora in range(hora_inicio + 1, hora_fin):
+        minutos[hora] += 60 * visitas
+    if hora_fin < 24:
+        minutos[hora_fin] += minutos_fin
+
+
+def mapa_de_calor(filtros, desde=None, hasta=None, laboratorio='all'):
+    """
+    Visitas y ocupación promedio por día de la semana (lunes a domingo) y hora
+    (0 a 23), en hora local, para cada laboratorio y en total.
+
+    'visitas' cuenta las visitas por su hora de inicio; 'ocupacion' es el
+    promedio de PCs en uso al mismo tiempo en esa hora (minutos de uso / 60 /
+    número de esos días en el rango) y 'porcentaje' la relaciona con las PCs
+    del laboratorio. Sin desde/hasta se usa el rango de las visitas filtradas.
+
+    Las visitas se agrupan en la base por (laboratorio, día, hora de inicio,
+    hora de fin) sumando los minutos de inicio y fin: una sola consulta que
+    devuelve a lo más unos miles de filas sin importar cuántas visitas haya.
+    """
+    laboratorios = Laboratorio.objects.annotate(pcs=Count('pc'))
+    visitas = Visita.objects.filter(filtros)
+    if laboratorio != 'all':
+        laboratorios = laboratorios.filter(id=laboratorio)
+        visitas = visitas.filter(pc__laboratorio_id=laboratorio)
+    laboratorios = list(laboratorios)
+
+    if desde is None or hasta is None:
+        extremos = visitas.aggregate(primera=Min('fecha_hora_inicio'), ultima=Max('fecha_hora_inicio'))
+        if extremos['primera'] is not None:
+            desde = desde or timezone.localdate(extremos['primera'])
+            hasta = hasta or timezone.localdate(extremos['ultima'])
+    dias_por_semana = _dias_por_semana(desde, hasta) if desde and hasta and desde <= hasta else [0] * 7
+
+    grupos = visitas.values(
+        'pc__laboratorio_id',
+        dia=ExtractIsoWeekDay('fecha_hora_inicio'),
+        hora_inicio=ExtractHour('fecha_hora_inicio'),
+        hora_fin=ExtractHour('fecha_hora_fin'),
+        cruza_dia=Case(
+            When(GreaterThan(TruncDate('fecha_hora_fin'), TruncDate('fecha_hora_inicio')), then=Value(True)),
+            default=Value(False), output_field=BooleanField(),
+        ),
+    ).annotate(
+        visitas=Count('id'),
+        minutos_inicio=Sum(ExtractMinute('fecha_hora_inicio')),
+        minutos_fin=Sum(ExtractMinute('fecha_hora_fin')),
+    ).order_by()
+
+    def matriz():
+        return [[0] * 24 for _ in range(7)]
+
+    conteos = {lab.id: (matriz(), matriz()) for lab in laboratorios}
+    for fila in grupos:
+        if fila['pc__laboratorio_id'] not in conteos:
+            continue
+        visitas_lab, minutos_lab = conteos[fila['pc__laboratorio_id']]
+        visitas_lab[fila['dia'] - 1][fila['hora_inicio']] += fila['visitas']
+        _sumar_minutos(minutos_lab[fila['dia'] - 1], fila)
+
+    def resultado(visitas_mat, minutos_mat, pcs):
+        ocupacion = [
+            [round(minutos / 60 / dias, 2) if dias else 0 for minutos in fila]
+            for fila, dias in zip(minutos_mat, dias_por_semana)
+        ]
+        return {
+            'pcs': pcs,
+            'visitas': visitas_mat,
+            'ocupacion': ocupacion,
+            'porcentaje': [[round(valor * 100 / pcs, 1) if pcs else 0 for valor in fila] for fila in ocupacion],
+        }
+
+    total_visitas, total_minutos = matriz(), matriz()
+    data = []
+    for lab in laboratorios:
+        visitas_lab, minutos_lab = conteos[lab.id]
+        for dia in range(7):
+            for hora in range(24):
+                total_visitas[dia][hora] += visitas_lab[dia][hora]
+                total_minutos[dia][hora] += minutos_lab[dia][hora]
+        data.append({'id': lab.id, 'nombre': lab.nombre, **resultado(visitas_lab, minutos_lab, lab.pcs)})
+
+    return {
+        'dias': DIAS_ISO,
+        'horas': list(range(24)),
+        'desde': desde.isoformat() if desde else None,
+        'hasta': hasta.isoformat() if hasta else None,
+        'laboratorios': data,
+        'total': resultado(total_visitas, total_minutos, sum(lab.pcs for lab in laboratorios)),
+    }
@@ -0,0 +1,140 @@
+"""
+Filtros de los reportes de visitas y reservas.
+
+normalizar() recibe los parámetros tal como llegan (request.GET o el
+'filters' del POST de exportación, en snake_case o camelCase) y los deja en
+un diccionario único; q_visitas() y q_reservas() lo convierten en un Q.
+
+Las fechas se filtran como rangos semiabiertos [inicio del primer día,
+inicio del día siguiente al último) en la zona horaria local, en lugar de
+fecha_hora_inicio__date__gte/lte: el cast a fecha se aplica a cada fila e
+impide usar los índices de fecha_hora_inicio, mientras que el rango se
+resuelve con un recorrido del índice.
+"""
+from datetime import datetime, time, timedelta, date
+
+from django.db.models import Q
+from django.utils import timezone
+
+# Períodos predefinidos del frontend (días hacia atrás desde hoy)
+PERIODOS = {
+    'monthly': 30,
+    'bimonthly': 60,
+    'quarterly': 90,
+    'semiannual': 180,
+    'annual': 365,
+}
+
+
+# Nombres de parámetro que normalizar() reconoce
+PARAMETROS = ('date_from', 'dateFrom', 'date_to', 'dateTo', 'period', 'laboratory', 'software',
+              'userType', 'user_type', 'carrera', 'semestre')
+
+
+def _valor(datos, *nombres, default='all'):
+    for nombre in nombres:
+        valor = datos.get(nombre)
+        if valor not in (None, ''):
+            return valor
+    return default
+
+
+def normalizar(datos, expandir_periodo=False):
+    """
+    {'date_from', 'date_to', 'period', 'laboratory', 'software', 'userType',
+    'carrera', 'semestre'} a partir de los parámetros de una petición. Las
+    fechas quedan como 'AAAA-MM-DD' (o None) y semestre como entero (o 'all');
+    lanza ValueError si semestre no es un número.
+
+    Con expandir_periodo (exportaciones) un período predefinido sin fechas se
+    convierte en el rango que termina hoy. Las APIs GET de reportes nunca
+    interpretaron 'period' (el frontend manda las fechas) y no lo expanden.
+    """
+    filtros = {
+        'date_from': _valor(datos, 'date_from', 'dateFrom', default=None),
+        'date_to': _valor(datos, 'date_to', 'dateTo', default=None),
+        'period': _valor(datos, 'period', default='custom'),
+        'laboratory': _valor(datos, 'laboratory'),
+        'software': _valor(datos, 'software'),
+        'userType': _valor(datos, 'userType', 'user_type'),
+        'carrera': _valor(datos, 'carrera'),
+        'semestre': _valor(datos, 'semestre'),
+    }
+    if _indicado(filtros['semestre']):
+        try:
+            filtros['semestre'] = int(filtros['semestre'])
+        except (TypeError, ValueError):
+            raise ValueError(f'semestre debe ser un número: {filtros["semestre"]!r}') from None
+    if expandir_periodo and filtros['period'] in PERIODOS and not filtros['date_from']:
+        hoy = timezone.localdate()
+        filtros['date_from'] = (hoy - timedelta(days=PERIODOS[filtros['period']])).isoformat()
+        filtros['date_to'] = hoy.isoformat()
+    return filtros
+
+
+def _indicado(valor):
+    return valor not in (None, '', 'all')
+
+
+def _fecha(valor):
+    return valor if isinstance(valor, date) else date.fromisoformat(valor)
+
+
+def inicio_del_dia(dia):
+    """Primer instante del día en la zona horaria local (aware)."""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def fechas(filtros):
+    """(desde, hasta) como date; None en el extremo que no se indicó."""
+    return tuple(_fecha(filtros[clave]) if filtros.get(clave) else None for clave in ('date_from', 'date_to'))
+
+
+def rango(filtros):
+    """(inicio, fin) aware del rango semiabierto de date_from..date_to; None en el extremo sin fecha."""
+    desde, hasta = fechas(filtros)
+    return (
+        inicio_del_dia(desde) if desde else None,
+        inicio_del_dia(hasta + timedelta(days=1)) if hasta else None,
+    )
+
+
+def q_fechas(filtros, campo='fecha_hora_inicio'):
+    """Q de los días date_from..date_to (ambos incluidos) como rango semiabierto sobre `campo`."""
+    inicio, fin = rango(filtros)
+    q = Q()
+    if inicio:
+        q &= Q(**{f'{campo}__gte': inicio})
+    if fin:
+        q &= Q(**{f'{campo}__lt': fin})
+    return q
+
+
+def dias(filtros):
+    """Número de días del rango (para promedios diarios), o None si no está acotado."""
+    desde, hasta = fechas(filtros)
+    if not (desde and hasta):
+        return None
+    return (hasta - desde).days + 1
+
+
+def q_visitas(filtros, laboratorio=True, software=True, fechas=True):
+    """Q sobre Visita: fechas y, si se indican, laboratorio y software."""
+    q = q_fechas(filtros) if fechas else Q()
+    if laboratorio and _indicado(filtros.get('laboratory')):
+        q &= Q(pc__laboratorio_id=filtros['laboratory'])
+    if software and _indicado(filtros.get('software')):
+        q &= Q(software_utilizado_id=filtros['software'])
+    return q
+
+
+def q_reservas(filtros, laboratorio=True, carrera=True, semestre=True):
+    """Q sobre ReservaClase: fechas y, si se indican, laboratorio, carrera y semestre."""
+    q = q_fechas(filtros)
+    if laboratorio and _indicado(filtros.get('laboratory')):
+        q &= Q(laboratorio_id=filtros['laboratory'])
+    if carrera and _indicado(filtros.get('carrera')):
+        q &= Q(carrera=filtros['carrera'])
+    if semestre and _indicado(filtros.get('semestre')):
+        q &= Q(semestre=filtros['semestre'])
+    return q
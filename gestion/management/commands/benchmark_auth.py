@@ -0,0 +1,62 @@
+"""
+Management command para medir el costo de autenticación por petición de las
+APIs protegidas con admin_required_api, con y sin caché de tokens.
+Uso: python manage.py benchmark_auth [--peticiones 2000] [--usuario admin]
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import JsonResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from gestion.tokens import cache_tokens, crear_token
+from gestion.views import admin_required_api
+
+
+@admin_required_api
+def _vista_vacia(request):
+    return JsonResponse({})
+
+
+class Command(BaseCommand):
+    help = 'Mide el tiempo de autenticación por petición con y sin caché de tokens'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=2000, help='Peticiones por escenario')
+        parser.add_argument('--usuario', help='Usuario staff a usar (por defecto el primero activo)')
+
+    def _medir(self, request, peticiones, con_cache):
+        cache_tokens.limpiar()
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            for _ in range(peticiones):
+                if not con_cache:
+                    cache_tokens.limpiar()
+                respuesta = _vista_vacia(request)
+            duracion = time.perf_counter() - inicio
+        if respuesta.status_code != 200:
+            raise CommandError(f'La autenticación falló con estado {respuesta.status_code}')
+        return duracion / peticiones * 1e6, len(consultas.captured_queries) / peticiones
+
+    def handle(self, *args, **options):
+        usuarios = get_user_model().objects.filter(is_staff=True, is_active=True)
+        if options['usuario']:
+            usuarios = usuarios.filter(username=options['usuario'])
+        usuario = usuarios.order_by('id').first()
+        if usuario is None:
+            raise CommandError('No hay un usuario staff activo para la prueba')
+
+        peticiones = options['peticiones']
+        request = RequestFactory().get('/api/dashboard/stats/', HTTP_AUTHORIZATION=f'Token {crear_token(usuario)}')
+
+        sin_cache, consultas_sin = self._medir(request, peticiones, con_cache=False)
+        con_cache, consultas_con = self._medir(request, peticiones, con_cache=True)
+        cache_tokens.limpiar()
+
+        self.stdout.write(f'Peticiones por escenario: {peticiones} (usuario {usuario.username})')
+        self.stdout.write(f'  Sin caché: {sin_cache:8.1f} µs/petición, {consultas_sin:.2f} consultas/petición')
+        self.stdout.write(f'  Con caché: {con_cache:8.1f} µs/petición, {consultas_con:.2f} consultas/petición')
+        self.stdout.write(self.style.SUCCESS(f'Aceleración: {sin_cache / con_cache:.1f}x'))
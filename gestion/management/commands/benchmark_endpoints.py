@@ -0,0 +1,109 @@
+"""
+Management command para medir las APIs de gestion, las páginas de lista del
+admin, el calendario semanal y las exportaciones sobre los datos actuales
+(p. ej. los de generar_datos_sinteticos) y guardar los resultados en JSON.
+Uso:
+    python manage.py benchmark_endpoints [--repeticiones 5] [--salida benchmark.json]
+    python manage.py benchmark_endpoints --solo api_reports --comparar benchmark_anterior.json
+
+Con --comparar se muestra la variación de la mediana y de las consultas
+respecto a un archivo de resultados anterior (p. ej. de otro commit).
+"""
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from gestion.benchmark import Medidor, escenarios
+from gestion.models import Estudiante, Laboratorio, Mantenimiento, PC, ReservaClase, SerieReserva, Visita
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempos y consultas de las vistas de gestion y guarda los resultados en JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones medidas por escenario')
+        parser.add_argument('--usuario', help='Superusuario a usar (por defecto el primero activo)')
+        parser.add_argument('--solo', help='Mide solo los escenarios cuyo nombre contiene este texto')
+        parser.add_argument('--salida', default='benchmark.json', help='Archivo JSON de resultados')
+        parser.add_argument('--comparar', help='Archivo JSON de una corrida anterior')
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+        usuarios = get_user_model().objects.filter(is_superuser=True, is_active=True)
+        if options['usuario']:
+            usuarios = usuarios.filter(username=options['usuario'])
+        usuario = usuarios.order_by('id').first()
+        if usuario is None:
+            raise CommandError('No hay un superusuario activo para la prueba (createsuperuser)')
+
+        anterior = {}
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as archivo:
+                    anterior = {r['nombre']: r for r in json.load(archivo)['resultados']}
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'No se pudo leer {options["comparar"]}: {e}')
+
+        # El cliente de pruebas usa el host 'testserver'. Sin muestreo de consultas
+        # lentas (sus escrituras se contarían como consultas del escenario) ni
+        # caché de respuestas (las repeticiones medirían solo aciertos)
+        respuestas = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        with override_settings(ALLOWED_HOSTS=['*'], CONSULTAS_LENTAS_UMBRAL_MS=None,
+                               CACHES={**settings.CACHES, 'respuestas': respuestas}):
+            medidor = Medidor(usuario)
+            lista = [e for e in escenarios() if not options['solo'] or options['solo'] in e.nombre]
+            resultados = []
+            for escenario in lista:
+                resultado = medidor.medir(escenario, repeticiones=options['repeticiones'])
+                resultados.append(resultado)
+                self._mostrar(resultado, anterior.get(resultado['nombre']))
+
+        salida = {
+            'fecha': timezone.now().isoformat(),
+            'commit': _commit_actual(),
+            'motor': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'repeticiones': options['repeticiones'],
+            'datos': {
+                modelo._meta.model_name: modelo.objects.count()
+                for modelo in (Laboratorio, PC, Estudiante, Visita, SerieReserva, ReservaClase, Mantenimiento)
+            },
+            'resultados': resultados,
+        }
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(salida, archivo, ensure_ascii=False, indent=2)
+
+        errores = [r['nombre'] for r in resultados if r['estado'] >= 400]
+        if errores:
+            self.stdout.write(self.style.WARNING(f'Escenarios con error: {", ".join(errores)}'))
+        self.stdout.write(self.style.SUCCESS(f'{len(resultados)} escenarios medidos; resultados en {options["salida"]}'))
+
+    def _mostrar(self, resultado, anterior):
+        linea = (
+            f"{resultado['nombre']:<48} {resultado['estado']:>3} {resultado['mediana_ms']:>9.1f} ms "
+            f"(p95 {resultado['p95_ms']:.1f}) {resultado['consultas']:>5} consultas"
+        )
+        if anterior:
+            cambio = (resultado['mediana_ms'] / anterior['mediana_ms'] - 1) * 100 if anterior['mediana_ms'] else 0
+            linea += f"  [{cambio:+.0f}% tiempo, {resultado['consultas'] - anterior['consultas']:+d} consultas]"
+        self.stdout.write(linea)
@@ -0,0 +1,37 @@
+"""
+Management command para calcular el cubo de utilización por laboratorio, fecha y hora.
+Uso:
+    python manage.py calcular_utilizacion [--desde 2025-01-01] [--hasta 2025-06-30] [--recalcular]
+
+Sin fechas calcula los días terminados de los últimos 30 días que falten.
+--recalcular borra primero esos días, necesario después de cambios masivos
+a visitas o reservas (cargar_fixture, generar_datos_sinteticos, update()).
+"""
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestion.utilizacion import asegurar_cubo, invalidar
+
+
+class Command(BaseCommand):
+    help = 'Calcula y guarda la utilización por hora de los días terminados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primer día (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Último día (AAAA-MM-DD), a lo más ayer')
+        parser.add_argument('--recalcular', action='store_true', help='Borrar y volver a calcular los días del rango')
+
+    def handle(self, *args, **options):
+        ayer = timezone.localdate() - timedelta(days=1)
+        hasta = min(options['hasta'] or ayer, ayer)
+        desde = options['desde'] or hasta - timedelta(days=29)
+        if desde > hasta:
+            raise CommandError('El rango no tiene días terminados')
+
+        if options['recalcular']:
+            borradas = invalidar(desde, hasta)
+            self.stdout.write(f'Filas borradas: {borradas}')
+        dias = asegurar_cubo(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(f'Días calculados del {desde} al {hasta}: {dias}'))
@@ -0,0 +1,43 @@
+"""
+Management command para restaurar fixtures de dumpdata (p. ej. datos_lab.json)
+mucho más rápido que loaddata: inserta con bulk_create por modelo, sin
+señales por objeto, y recalcula los estados de las PCs una sola vez.
+Uso: python manage.py cargar_fixture datos_lab.json [--lote 1000] [--ignorenonexistent]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.db import DatabaseError
+
+from gestion.carga_masiva import cargar_fixture
+
+
+class Command(BaseCommand):
+    help = 'Carga fixtures JSON de dumpdata con inserciones masivas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivos', nargs='+', help='Fixtures JSON (se aceptan .json.gz)')
+        parser.add_argument('--database', default='default', help='Alias de la base de datos destino')
+        parser.add_argument('--lote', type=int, default=1000, help='Objetos por INSERT')
+        parser.add_argument('--ignorenonexistent', '-i', action='store_true',
+                            help='Ignora modelos y campos que ya no existen')
+
+    def handle(self, *args, **options):
+        for ruta in options['archivos']:
+            inicio = time.perf_counter()
+            try:
+                conteo = cargar_fixture(
+                    ruta, using=options['database'], lote=options['lote'],
+                    ignorar_inexistentes=options['ignorenonexistent'],
+                )
+            except (OSError, DeserializationError, DatabaseError) as e:
+                raise CommandError(f'No se pudo cargar {ruta}: {e}')
+
+            if options['verbosity'] > 1:
+                for modelo, total in conteo.items():
+                    self.stdout.write(f'  {modelo}: {total}')
+            if options['verbosity']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{ruta}: {sum(conteo.values())} objetos cargados en {time.perf_counter() - inicio:.2f}s'
+                ))
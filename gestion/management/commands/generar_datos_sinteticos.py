@@ -0,0 +1,71 @@
+"""
+Management command para generar un conjunto de datos sintético con volúmenes
+realistas (laboratorios, PCs, estudiantes, visitas, series de clases y
+mantenimientos) sobre el cual medir el rendimiento con benchmark_endpoints.
+Uso:
+    python manage.py generar_datos_sinteticos [--visitas 200000] [--estudiantes 5000] [--semilla 42]
+    python manage.py generar_datos_sinteticos --limpiar --visitas 50000
+
+La misma semilla produce siempre los mismos datos (relativos a --fin).
+"""
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from django.utils import timezone
+
+from gestion.datos_sinteticos import generar_datos, limpiar_datos
+
+# Con --fin se toma el mediodía para que haya sesiones activas y clases en curso
+HORA_FIN = 12
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos realistas para pruebas de rendimiento'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--laboratorios', type=int, default=6)
+        parser.add_argument('--pcs', type=int, default=30, help='PCs por laboratorio')
+        parser.add_argument('--estudiantes', type=int, default=5000)
+        parser.add_argument('--visitas', type=int, default=200000)
+        parser.add_argument('--dias', type=int, default=180, help='Días de historial hasta --fin')
+        parser.add_argument('--series', type=int, default=8, help='Series de clases por laboratorio')
+        parser.add_argument('--mantenimientos', type=float, default=2.0, help='Mantenimientos promedio por PC')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--fin', help='Fecha final AAAA-MM-DD (por defecto ahora)')
+        parser.add_argument('--lote', type=int, default=5000, help='Objetos por INSERT')
+        parser.add_argument('--limpiar', action='store_true',
+                            help='Borra antes laboratorios, PCs, estudiantes, visitas, reservas y mantenimientos')
+
+    def handle(self, *args, **options):
+        fin = None
+        if options['fin']:
+            try:
+                fin = timezone.make_aware(datetime.strptime(options['fin'], '%Y-%m-%d').replace(hour=HORA_FIN))
+            except ValueError:
+                raise CommandError('--fin debe tener el formato AAAA-MM-DD')
+
+        inicio = time.perf_counter()
+        try:
+            if options['limpiar']:
+                limpiar_datos()
+            conteo = generar_datos(
+                laboratorios=options['laboratorios'],
+                pcs_por_laboratorio=options['pcs'],
+                estudiantes=options['estudiantes'],
+                visitas=options['visitas'],
+                dias=options['dias'],
+                series_por_laboratorio=options['series'],
+                mantenimientos_por_pc=options['mantenimientos'],
+                semilla=options['semilla'],
+                fin=fin,
+                lote=options['lote'],
+            )
+        except DatabaseError as e:
+            raise CommandError(f'No se pudieron generar los datos: {e}')
+
+        if options['verbosity']:
+            for nombre, total in conteo.items():
+                self.stdout.write(f'  {nombre}: {total}')
+            self.stdout.write(self.style.SUCCESS(f'Datos generados en {time.perf_counter() - inicio:.1f}s'))
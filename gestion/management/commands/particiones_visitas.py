@@ -0,0 +1,79 @@
+"""
+Management command para mantener las particiones mensuales de las visitas.
+Uso:
+    python manage.py particiones_visitas listar
+    python manage.py particiones_visitas crear [--meses 3]
+    python manage.py particiones_visitas archivar --conservar 24 [--directorio archivo_visitas]
+    python manage.py particiones_visitas archivar --antes-de 2024-01 [--directorio archivo_visitas]
+
+`crear` conviene programarlo mensualmente (cron) para que el mes siguiente
+ya tenga partición y no caiga en la partición DEFAULT. `archivar` exporta
+cada mes anterior al corte a <directorio>/visitas_AAAAMM.ndjson.gz y lo
+elimina de la base.
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from django.utils import timezone
+
+from gestion.particiones import (
+    archivar_visitas, crear_particiones, esta_particionada, listar_particiones, sumar_meses,
+)
+
+
+class Command(BaseCommand):
+    help = 'Crea, lista y archiva las particiones mensuales de las visitas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('accion', choices=['listar', 'crear', 'archivar'])
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--meses', type=int, default=3, help='Meses adelante a crear (crear)')
+        parser.add_argument('--conservar', type=int, help='Meses completos anteriores al actual que se conservan (archivar)')
+        parser.add_argument('--antes-de', help='Archivar los meses anteriores a AAAA-MM (archivar)')
+        parser.add_argument('--directorio', default='archivo_visitas', help='Destino de los archivos (archivar)')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        try:
+            getattr(self, f'_{options["accion"]}')(using, options)
+        except (DatabaseError, RuntimeError, OSError) as e:
+            raise CommandError(str(e))
+
+    def _listar(self, using, options):
+        if not esta_particionada(using):
+            self.stdout.write('La tabla de visitas no está particionada en esta base de datos')
+            return
+        for particion in listar_particiones(using):
+            mes = f"{particion['mes']:%Y-%m}" if particion['mes'] else 'DEFAULT'
+            self.stdout.write(f"  {particion['nombre']:<28} {mes:<8} ~{particion['filas_estimadas']} filas")
+
+    def _crear(self, using, options):
+        if not esta_particionada(using):
+            self.stdout.write('La tabla de visitas no está particionada en esta base de datos; nada que crear')
+            return
+        creadas = crear_particiones(options['meses'], using=using)
+        for nombre in creadas:
+            self.stdout.write(f'  {nombre}')
+        self.stdout.write(self.style.SUCCESS(f'Particiones creadas: {len(creadas)}'))
+
+    def _archivar(self, using, options):
+        if (options['conservar'] is None) == (options['antes_de'] is None):
+            raise CommandError('Indique --conservar o --antes-de (solo uno)')
+        if options['antes_de']:
+            try:
+                corte = datetime.strptime(options['antes_de'], '%Y-%m')
+            except ValueError:
+                raise CommandError('--antes-de debe tener el formato AAAA-MM')
+        else:
+            if options['conservar'] < 0:
+                raise CommandError('--conservar no puede ser negativo')
+            corte = sumar_meses(timezone.localtime(), -options['conservar'])
+
+        archivados = archivar_visitas(corte, options['directorio'], using=using)
+        for mes, filas in archivados:
+            self.stdout.write(f'  {mes:%Y-%m}: {filas} visitas')
+        self.stdout.write(self.style.SUCCESS(
+            f'Meses archivados: {len(archivados)} ({sum(filas for _, filas in archivados)} visitas) '
+            f'en {options["directorio"]}'
+        ))
@@ -0,0 +1,63 @@
+"""
+Management command para asignar laboratorios a las clases de un semestre y
+crear sus series de reservas en bloque.
+Uso: python manage.py planificar_semestre clases.json [--dry-run] [--profundidad 2]
+
+Formato del archivo:
+{
+    "fecha_inicio": "2026-01-12",
+    "fecha_fin": "2026-05-29",
+    "clases": [
+        {"nombre": "Redes - Grupo 1", "materia": "Redes", "profesor": "...",
+         "dias": ["L", "X"], "hora_inicio": "08:00", "hora_fin": "10:00",
+         "numero_alumnos": 30, "software": ["Packet Tracer"],
+         "carrera": "...", "semestre": 5}
+    ]
+}
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion.planificacion import planificar_semestre
+
+
+class Command(BaseCommand):
+    help = 'Asigna laboratorios a un lote de clases semestrales y crea las series de reservas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Archivo JSON con las clases solicitadas')
+        parser.add_argument('--dry-run', action='store_true', help='Solo muestra la asignación, no crea nada')
+        parser.add_argument('--profundidad', type=int, default=2, help='Niveles de reubicación al resolver conflictos')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], encoding='utf-8-sig') as f:
+                datos = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise CommandError(f'No se pudo leer {options["archivo"]}: {e}')
+
+        inicio = time.perf_counter()
+        try:
+            resultado = planificar_semestre(
+                datos, crear=not options['dry_run'], profundidad=options['profundidad']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        duracion = time.perf_counter() - inicio
+
+        for clase in resultado['asignadas']:
+            self.stdout.write(
+                f"  {clase['nombre']}: {clase['laboratorio']} ({clase['pcs']} PCs) "
+                f"{clase['dias']} {clase['hora_inicio']}-{clase['hora_fin']}"
+            )
+        for clase in resultado['sin_asignar']:
+            self.stdout.write(self.style.WARNING(f"  ⚠️ {clase['nombre']}: {clase['motivo']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\nAsignadas: {len(resultado['asignadas'])}, sin asignar: {len(resultado['sin_asignar'])}, "
+            f"ocurrencias creadas: {resultado['ocurrencias_creadas']} ({duracion:.2f}s)"
+        ))
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Modo --dry-run: no se creó ninguna serie'))
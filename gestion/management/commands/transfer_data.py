@@ -0,0 +1,349 @@
+"""
+Management command para mover los datos de la app entre bases de datos (p. ej.
+del servidor local al Postgres hospedado) en dos pasos independientes:
+
+    python manage.py transfer_data export respaldo/      (con la BD origen)
+    python manage.py transfer_data import respaldo/      (con la BD destino)
+
+export recorre cada tabla por bloques de llave primaria con .iterator() y
+escribe cada bloque como NDJSON comprimido (respaldo/<tabla>/00001.ndjson.gz).
+import inserta cada bloque con bulk_create reasignando las llaves foráneas a
+los ids de la base destino. Laboratorios, software, carreras, días y
+estudiantes se empatan por su llave natural, así que importar sobre una base
+que ya los tiene no los duplica.
+
+Ambos pasos registran los bloques terminados (manifest.json e
+importacion.json dentro del directorio) y al volver a ejecutarlos continúan
+desde el último bloque completo. Las tablas cuyas dependencias ya están
+cargadas se procesan en paralelo (--hilos).
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from gestion.carga_masiva import conservar_fechas_automaticas, niveles_de_dependencia, valor_json
+
+MANIFIESTO = 'manifest.json'
+ESTADO_IMPORTACION = 'importacion.json'
+
+# Campo por el que se empatan registros que pueden existir ya en el destino
+LLAVES_NATURALES = {
+    'Laboratorio': 'nombre',
+    'Software': 'nombre',
+    'Carrera': 'nombre',
+    'DiaSemana': 'codigo',
+    'Estudiante': 'id',
+}
+
+
+def _escribir_json(ruta, datos):
+    """Escribe de forma atómica para que una interrupción no deje el archivo a medias."""
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def _leer_json(ruta, por_defecto):
+    if not os.path.exists(ruta):
+        return por_defecto
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Tabla:
+    """Una tabla a transferir: un modelo de la app o una tabla intermedia M2M."""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.nombre = modelo._meta.db_table
+        self.llave_natural = LLAVES_NATURALES.get(modelo.__name__)
+        self.intermedia = modelo._meta.auto_created
+        self.campos = modelo._meta.concrete_fields
+        self.foraneas = [campo for campo in self.campos if campo.many_to_one]
+        # La llave primaria se conserva solo si ella misma es la llave natural
+        self.conserva_pk = self.llave_natural == modelo._meta.pk.attname
+
+
+def _tablas():
+    """Tablas de la app ordenadas por nivel de dependencia."""
+    tablas = [
+        Tabla(modelo)
+        for modelo in apps.get_app_config('gestion').get_models(include_auto_created=True)
+        if not modelo._meta.proxy and modelo._meta.managed
+    ]
+    niveles = niveles_de_dependencia(tabla.modelo for tabla in tablas)
+    for tabla in tablas:
+        tabla.nivel = niveles[tabla.modelo]
+    return sorted(tablas, key=lambda tabla: (tabla.nivel, tabla.nombre))
+
+
+class Command(BaseCommand):
+    help = 'Exporta o importa los datos por bloques reanudables (NDJSON comprimido)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('accion', choices=['export', 'import'])
+        parser.add_argument('directorio', help='Directorio del respaldo')
+        parser.add_argument('--database', default='default', help='Alias de la base de datos origen/destino')
+        parser.add_argument('--bloque', type=int, default=5000, help='Filas por archivo al exportar')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por INSERT al importar')
+        parser.add_argument('--hilos', type=int, default=4, help='Tablas procesadas en paralelo')
+        parser.add_argument('--reiniciar', action='store_true',
+                            help='Ignora el progreso guardado y empieza desde el principio')
+
+    def handle(self, *args, **options):
+        self.db = options['database']
+        self.verbosity = options['verbosity']
+        self.directorio = options['directorio']
+        self.hilos = max(1, options['hilos'])
+        self._lock = threading.Lock()
+        self.tablas = _tablas()
+
+        inicio = time.perf_counter()
+        if options['accion'] == 'export':
+            os.makedirs(self.directorio, exist_ok=True)
+            self.exportar(options['bloque'], options['reiniciar'])
+        else:
+            self.importar(options['lote'], options['reiniciar'])
+        self._escribir(f'Listo en {time.perf_counter() - inicio:.1f}s', self.style.SUCCESS)
+
+    def _escribir(self, mensaje, estilo=None):
+        if not self.verbosity:
+            return
+        with self._lock:
+            self.stdout.write(estilo(mensaje) if estilo else mensaje)
+
+    def _en_paralelo(self, funcion, tablas):
+        """Ejecuta funcion(tabla) para cada tabla; cada hilo usa su propia conexión."""
+        if self.hilos == 1 or len(tablas) == 1:
+            return [funcion(tabla) for tabla in tablas]
+
+        def en_hilo(tabla):
+            try:
+                return funcion(tabla)
+            finally:
+                connections[self.db].close()
+
+        with ThreadPoolExecutor(max_workers=self.hilos) as ejecutor:
+            return list(ejecutor.map(en_hilo, tablas))
+
+    # ---------------------------------------------------------------- export
+
+    def exportar(self, tamano_bloque, reiniciar):
+        ruta_manifiesto = os.path.join(self.directorio, MANIFIESTO)
+        self.manifiesto = {} if reiniciar else _leer_json(ruta_manifiesto, {})
+        self.manifiesto.setdefault('tablas', {})
+        self.manifiesto['origen'] = connections[self.db].vendor
+        self.ruta_manifiesto = ruta_manifiesto
+
+        # Todas las tablas se pueden leer a la vez; el orden solo importa al importar
+        for tabla, filas in zip(self.tablas, self._en_paralelo(
+                lambda tabla: self._exportar_tabla(tabla, tamano_bloque, reiniciar), self.tablas)):
+            total = sum(bloque['filas'] for bloque in self.manifiesto['tablas'][tabla.nombre]['bloques'])
+            self._escribir(f'  {tabla.nombre}: {total} filas ({filas} nuevas en esta ejecución)')
+
+    def _exportar_tabla(self, tabla, tamano_bloque, reiniciar):
+        with self._lock:
+            estado = self.manifiesto['tablas'].setdefault(
+                tabla.nombre, {'nivel': tabla.nivel, 'bloques': [], 'completa': False}
+            )
+        if estado['completa']:
+            return 0
+
+        carpeta = os.path.join(self.directorio, tabla.nombre)
+        os.makedirs(carpeta, exist_ok=True)
+        if reiniciar:
+            for archivo in os.listdir(carpeta):
+                os.remove(os.path.join(carpeta, archivo))
+
+        columnas = [campo.attname for campo in tabla.campos]
+        pk = tabla.modelo._meta.pk.attname
+        consulta = tabla.modelo._base_manager.using(self.db).order_by('pk').values(*columnas)
+        ultimo_pk = estado['bloques'][-1]['ultimo_pk'] if estado['bloques'] else None
+        exportadas = 0
+
+        while True:
+            bloque = consulta if ultimo_pk is None else consulta.filter(pk__gt=ultimo_pk)
+            numero = len(estado['bloques']) + 1
+            archivo = f'{numero:05d}.ndjson.gz'
+            ruta = os.path.join(carpeta, archivo)
+            filas = 0
+            with gzip.open(f'{ruta}.tmp', 'wt', encoding='utf-8') as salida:
+                for fila in bloque[:tamano_bloque].iterator(chunk_size=min(tamano_bloque, 2000)):
+                    salida.write(json.dumps(fila, default=valor_json, ensure_ascii=False))
+                    salida.write('\n')
+                    ultimo_pk = fila[pk]
+                    filas += 1
+
+            if not filas:
+                os.remove(f'{ruta}.tmp')
+                break
+            os.replace(f'{ruta}.tmp', ruta)
+            exportadas += filas
+            with self._lock:
+                estado['bloques'].append({'archivo': archivo, 'filas': filas, 'ultimo_pk': ultimo_pk})
+                _escribir_json(self.ruta_manifiesto, self.manifiesto)
+            if self.verbosity > 1:
+                self._escribir(f'    {tabla.nombre}/{archivo}: {filas} filas')
+            if filas < tamano_bloque:
+                break
+
+        with self._lock:
+            estado['completa'] = True
+            _escribir_json(self.ruta_manifiesto, self.manifiesto)
+        return exportadas
+
+    # ---------------------------------------------------------------- import
+
+    def importar(self, tamano_lote, reiniciar):
+        manifiesto = _leer_json(os.path.join(self.directorio, MANIFIESTO), None)
+        if manifiesto is None:
+            raise CommandError(f'No se encontró {MANIFIESTO} en {self.directorio}')
+        incompletas = [nombre for nombre, estado in manifiesto['tablas'].items() if not estado['completa']]
+        if incompletas:
+            raise CommandError(
+                f'La exportación no terminó ({", ".join(incompletas)}); vuelva a ejecutar export para completarla'
+            )
+
+        conexion = connections[self.db]
+        referenciadas = {campo.related_model for tabla in self.tablas for campo in tabla.foraneas}
+        sin_retorno = [
+            tabla.nombre for tabla in self.tablas
+            if tabla.modelo in referenciadas and not tabla.llave_natural
+        ]
+        if sin_retorno and not conexion.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                f'La base destino no devuelve los ids de bulk_create, necesarios para {", ".join(sin_retorno)}'
+            )
+        if conexion.vendor == 'sqlite' and self.hilos > 1:
+            # SQLite no admite escrituras concurrentes
+            self.hilos = 1
+
+        self.ruta_estado = os.path.join(self.directorio, ESTADO_IMPORTACION)
+        self.estado = {} if reiniciar else _leer_json(self.ruta_estado, {})
+        self.estado.setdefault('bloques', {})
+        # Ids origen -> destino de las tablas referenciadas por otras (llaves como texto)
+        self.estado.setdefault('mapas', {})
+        self.manifiesto = manifiesto
+        self.mapeadas = {
+            tabla.modelo: tabla.nombre for tabla in self.tablas
+            if tabla.modelo in referenciadas and not tabla.conserva_pk
+        }
+
+        tablas = [tabla for tabla in self.tablas if tabla.nombre in manifiesto['tablas']]
+        faltantes = [tabla.nombre for tabla in self.tablas if tabla.nombre not in manifiesto['tablas']]
+        if faltantes:
+            self._escribir(f'El respaldo no incluye: {", ".join(faltantes)}', self.style.WARNING)
+
+        with conservar_fechas_automaticas(tabla.modelo for tabla in tablas):
+            for nivel in sorted({tabla.nivel for tabla in tablas}):
+                del_nivel = [tabla for tabla in tablas if tabla.nivel == nivel]
+                for tabla, conteo in zip(del_nivel, self._en_paralelo(
+                        lambda tabla: self._importar_tabla(tabla, tamano_lote), del_nivel)):
+                    detalle = f'{conteo["insertadas"]} insertadas, {conteo["existentes"]} ya existían'
+                    if conteo['omitidas'] or conteo['fk_nulas']:
+                        detalle += (f', {conteo["omitidas"]} omitidas y {conteo["fk_nulas"]} '
+                                    'con referencia nula por no encontrar su registro relacionado')
+                    estilo = self.style.WARNING if conteo['omitidas'] else None
+                    self._escribir(f'  {tabla.nombre}: {detalle}', estilo)
+
+    def _guardar_estado(self):
+        with self._lock:
+            _escribir_json(self.ruta_estado, self.estado)
+
+    def _importar_tabla(self, tabla, tamano_lote):
+        conteo = {'insertadas': 0, 'existentes': 0, 'omitidas': 0, 'fk_nulas': 0}
+        with self._lock:
+            hechos = set(self.estado['bloques'].setdefault(tabla.nombre, []))
+            mapa = self.estado['mapas'].setdefault(tabla.nombre, {}) if tabla.modelo in self.mapeadas else None
+
+        for bloque in self.manifiesto['tablas'][tabla.nombre]['bloques']:
+            if bloque['archivo'] in hechos:
+                continue
+            ruta = os.path.join(self.directorio, tabla.nombre, bloque['archivo'])
+            with gzip.open(ruta, 'rt', encoding='utf-8') as entrada:
+                filas = [json.loads(linea) for linea in entrada]
+
+            with transaction.atomic(using=self.db):
+                nuevos = self._importar_filas(tabla, filas, tamano_lote, conteo)
+            # El bloque cuenta como hecho solo cuando su transacción ya se confirmó
+            with self._lock:
+                if mapa is not None:
+                    mapa.update(nuevos)
+                self.estado['bloques'][tabla.nombre].append(bloque['archivo'])
+            self._guardar_estado()
+            if self.verbosity > 1:
+                self._escribir(f'    {tabla.nombre}/{bloque["archivo"]}: {len(filas)} filas')
+        return conteo
+
+    def _importar_filas(self, tabla, filas, tamano_lote, conteo):
+        """Inserta un bloque y retorna {pk_origen: pk_destino} de sus filas."""
+        modelo = tabla.modelo
+        pk = modelo._meta.pk.attname
+        campos = {campo.attname: campo for campo in tabla.campos}
+        mapas_fk = {
+            campo.attname: self.estado['mapas'].get(self.mapeadas[campo.related_model], {})
+            for campo in tabla.foraneas if campo.related_model in self.mapeadas
+        }
+
+        objetos, pks_origen = [], []
+        for fila in filas:
+            valores = {}
+            omitir = False
+            for columna, valor in fila.items():
+                campo = campos.get(columna)
+                if campo is None:
+                    continue  # columna que ya no existe en el modelo
+                if valor is not None and columna in mapas_fk:
+                    valor = mapas_fk[columna].get(str(valor))
+                    if valor is None:
+                        if not campo.null:
+                            omitir = True
+                            break
+                        conteo['fk_nulas'] += 1
+                elif valor is not None:
+                    valor = campo.to_python(valor)
+                valores[columna] = valor
+            if omitir:
+                conteo['omitidas'] += 1
+                continue
+            pks_origen.append(str(valores[pk]))
+            if not tabla.conserva_pk:
+                del valores[pk]
+            objetos.append(modelo(**valores))
+
+        base = modelo._base_manager.using(self.db)
+        if tabla.llave_natural:
+            llave = tabla.llave_natural
+            claves = [getattr(objeto, llave) for objeto in objetos]
+            existentes = set(base.filter(**{f'{llave}__in': claves}).values_list(llave, flat=True))
+            base.bulk_create(
+                [objeto for objeto in objetos if getattr(objeto, llave) not in existentes],
+                batch_size=tamano_lote,
+            )
+            conteo['existentes'] += len(existentes)
+            conteo['insertadas'] += len(objetos) - len(existentes)
+            if tabla.conserva_pk:
+                return {}
+            # Se consulta de nuevo para obtener los ids destino también de los existentes
+            destino = dict(base.filter(**{f'{llave}__in': claves}).values_list(llave, 'pk'))
+            return {
+                origen: str(destino[clave])
+                for origen, clave in zip(pks_origen, claves) if clave in destino
+            }
+
+        # Las tablas M2M tienen unique_together: ignorar las relaciones ya presentes
+        creados = base.bulk_create(objetos, batch_size=tamano_lote, ignore_conflicts=tabla.intermedia)
+        conteo['insertadas'] += len(creados)
+        if tabla.intermedia:
+            return {}
+        return {origen: str(objeto.pk) for origen, objeto in zip(pks_origen, creados)}
@@ -0,0 +1,205 @@
+"""
+Operaciones de mantenimiento de PCs.
+
+- abrir_mantenimientos / cerrar_mantenimientos: para muchas PCs a la vez,
+  usados por el panel vespertino y por las acciones del admin. Cada operación
+  usa un número fijo de consultas sin importar cuántas PCs incluya.
+- estadisticas_mantenimiento: MTTR, frecuencia y tiempo fuera de servicio
+  por PC y por laboratorio calculados en la base de datos.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DateTimeField, DurationField, ExpressionWrapper, F, Min, Sum, Value, When, Window,
+)
+from django.db.models.functions import Coalesce, Lag, RowNumber
+from django.utils import timezone
+
+from .cache_respuestas import registrar_cambio
+from .models import Laboratorio, Mantenimiento, PC
+
+
+def abrir_mantenimientos(pcs, descripcion='', fecha_inicio=None):
+    """
+    Abre un mantenimiento para cada PC de `pcs` (queryset de PC) que no tenga
+    ya uno activo y marca todas como 'Mantenimiento'.
+
+    Retorna (mantenimientos_creados, pcs_omitidas_por_tener_uno_activo).
+    """
+    fecha_inicio = fecha_inicio or timezone.now()
+
+    with transaction.atomic():
+        pc_ids = list(pcs.values_list('id', flat=True))
+        # Una sola consulta para evitar mantenimientos activos duplicados
+        con_activo = set(
+            Mantenimiento.objects.filter(
+                pc_id__in=pc_ids, fecha_fin__isnull=True
+            ).values_list('pc_id', flat=True)
+        )
+        creados = Mantenimiento.objects.bulk_create([
+            Mantenimiento(pc_id=pc_id, descripcion=descripcion, fecha_inicio=fecha_inicio)
+            for pc_id in pc_ids
+            if pc_id not in con_activo
+        ], batch_size=500)
+        PC.objects.filter(id__in=pc_ids).exclude(estado='Mantenimiento').update(estado='Mantenimiento')
+        # bulk_create no dispara señales
+        registrar_cambio('mantenimiento', fecha_inicio)
+
+    return creados, len(con_activo)
+
+
+def cerrar_mantenimientos(pcs, fecha_fin=None):
+    """
+    Finaliza los mantenimientos activos de las PCs de `pcs` y devuelve a
+    'Disponible' las que estaban en 'Mantenimiento'.
+
+    Retorna el número de mantenimientos finalizados.
+    """
+    fecha_fin = fecha_fin or timezone.now()
+
+    with transaction.atomic():
+        # Materializar los ids: `pcs` puede depender de los mismos datos que se actualizan
+        pc_ids = list(pcs.values_list('id', flat=True))
+        finalizados = Mantenimiento.objects.filter(
+            pc_id__in=pc_ids, fecha_fin__isnull=True
+        ).update(fecha_fin=fecha_fin)
+        PC.objects.filter(id__in=pc_ids, estado='Mantenimiento').update(estado='Disponible')
+        # Los mantenimientos cerrados pudieron empezar en días pasados
+        registrar_cambio('mantenimiento')
+
+    return finalizados
+
+
+def _horas(duracion):
+    return round(duracion.total_seconds() / 3600, 2) if duracion is not None else None
+
+
+def _dias(duracion):
+    return round(duracion.total_seconds() / 86400, 2) if duracion is not None else None
+
+
+def estadisticas_mantenimiento(fecha_desde=None, fecha_hasta=None, laboratorio_id=None):
+    """
+    Indicadores de confiabilidad de los mantenimientos iniciados en el rango:
+
+    - mttr: tiempo medio de reparación (solo mantenimientos finalizados)
+    - tiempo fuera de servicio: suma de duraciones; los activos cuentan hasta
+      ahora (o hasta el fin del rango si es anterior)
+    - mtbm: tiempo medio entre mantenimientos consecutivos de una misma PC
+    - ultimo_intervalo: días entre los dos mantenimientos más recientes de la
+      PC; si es mucho menor que su mtbm la máquina está fallando más seguido
+
+    Los indicadores salen de una sola consulta con funciones de ventana
+    particionadas por PC que devuelve una fila por PC (la de su mantenimiento
+    más reciente); los totales por laboratorio y globales se acumulan a partir
+    de esas filas. Una segunda consulta cuenta las PCs de cada laboratorio.
+    """
+    ahora = timezone.now()
+    mantenimientos = Mantenimiento.objects.all()
+    corte = ahora
+    if fecha_desde:
+        mantenimientos = mantenimientos.filter(
+            fecha_inicio__gte=timezone.make_aware(datetime.combine(fecha_desde, time.min))
+        )
+    if fecha_hasta:
+        fin_rango = timezone.make_aware(datetime.combine(fecha_hasta + timedelta(days=1), time.min))
+        mantenimientos = mantenimientos.filter(fecha_inicio__lt=fin_rango)
+        corte = min(ahora, fin_rango)
+    if laboratorio_id:
+        mantenimientos = mantenimientos.filter(pc__laboratorio_id=laboratorio_id)
+
+    duracion = ExpressionWrapper(
+        Coalesce('fecha_fin', Value(corte, output_field=DateTimeField())) - F('fecha_inicio'),
+        output_field=DurationField()
+    )
+    por_pc = [F('pc_id')]
+    filas = mantenimientos.annotate(duracion=duracion).annotate(
+        total=Window(Count('id'), partition_by=por_pc),
+        finalizados=Window(Count('fecha_fin'), partition_by=por_pc),
+        tiempo_fuera=Window(Sum('duracion'), partition_by=por_pc),
+        tiempo_reparacion=Window(
+            Sum(Case(When(fecha_fin__isnull=False, then=F('duracion')), output_field=DurationField())),
+            partition_by=por_pc
+        ),
+        primero=Window(Min('fecha_inicio'), partition_by=por_pc),
+        anterior=Window(Lag('fecha_inicio'), partition_by=por_pc, order_by=F('fecha_inicio').asc()),
+        fila=Window(RowNumber(), partition_by=por_pc, order_by=F('fecha_inicio').desc()),
+    ).filter(fila=1).values(
+        'pc_id', 'pc__numero_pc', 'pc__laboratorio_id', 'pc__laboratorio__nombre',
+        'total', 'finalizados', 'tiempo_fuera', 'tiempo_reparacion',
+        'primero', 'fecha_inicio', 'anterior', 'fecha_fin',
+    )
+
+    cero = timedelta(0)
+    pcs = []
+    laboratorios = {}
+    global_ = {'total': 0, 'activos': 0, 'finalizados': 0, 'tiempo_fuera': cero,
+               'tiempo_reparacion': cero, 'intervalos': 0, 'suma_intervalos': cero}
+
+    for fila in filas:
+        total = fila['total']
+        # Los intervalos entre mantenimientos consecutivos suman (último - primero)
+        suma_intervalos = fila['fecha_inicio'] - fila['primero']
+        tiempo_reparacion = fila['tiempo_reparacion'] or cero
+        pcs.append({
+            'pc_id': fila['pc_id'],
+            'pc': f"{fila['pc__laboratorio__nombre'][-1]}{fila['pc__numero_pc']}",
+            'laboratorio': fila['pc__laboratorio__nombre'],
+            'mantenimientos': total,
+            'activo': fila['fecha_fin'] is None,
+            'mttr_horas': _horas(tiempo_reparacion / fila['finalizados']) if fila['finalizados'] else None,
+            'horas_fuera_servicio': _horas(fila['tiempo_fuera']),
+            'mtbm_dias': _dias(suma_intervalos / (total - 1)) if total > 1 else None,
+            'ultimo_intervalo_dias': _dias(fila['fecha_inicio'] - fila['anterior']) if fila['anterior'] else None,
+            'ultimo_mantenimiento': timezone.localtime(fila['fecha_inicio']),
+        })
+
+        lab = laboratorios.setdefault(fila['pc__laboratorio_id'], {
+            'nombre': fila['pc__laboratorio__nombre'], 'total': 0, 'activos': 0, 'finalizados': 0,
+            'tiempo_fuera': cero, 'tiempo_reparacion': cero, 'intervalos': 0, 'suma_intervalos': cero,
+            'pcs_con_mantenimiento': 0,
+        })
+        for acumulado in (lab, global_):
+            acumulado['total'] += total
+            acumulado['activos'] += total - fila['finalizados']
+            acumulado['finalizados'] += fila['finalizados']
+            acumulado['tiempo_fuera'] += fila['tiempo_fuera']
+            acumulado['tiempo_reparacion'] += tiempo_reparacion
+            acumulado['intervalos'] += total - 1
+            acumulado['suma_intervalos'] += suma_intervalos
+        lab['pcs_con_mantenimiento'] += 1
+
+    def _resumen(acumulado):
+        return {
+            'mantenimientos': acumulado['total'],
+            'activos': acumulado['activos'],
+            'mttr_horas': _horas(acumulado['tiempo_reparacion'] / acumulado['finalizados']) if acumulado['finalizados'] else None,
+            'horas_fuera_servicio': _horas(acumulado['tiempo_fuera']),
+            'mtbm_dias': _dias(acumulado['suma_intervalos'] / acumulado['intervalos']) if acumulado['intervalos'] else None,
+        }
+
+    total_pcs = dict(
+        Laboratorio.objects.filter(id__in=laboratorios.keys()).annotate(
+            num_pcs=Count('pc')
+        ).values_list('id', 'num_pcs')
+    )
+    por_laboratorio = []
+    for lab_id, lab in laboratorios.items():
+        resumen = _resumen(lab)
+        resumen.update({
+            'laboratorio_id': lab_id,
+            'laboratorio': lab['nombre'],
+            'pcs': total_pcs.get(lab_id, 0),
+            'pcs_con_mantenimiento': lab['pcs_con_mantenimiento'],
+            'mantenimientos_por_pc': round(lab['total'] / total_pcs[lab_id], 2) if total_pcs.get(lab_id) else None,
+        })
+        por_laboratorio.append(resumen)
+
+    pcs.sort(key=lambda pc: (-pc['mantenimientos'], -(pc['horas_fuera_servicio'] or 0)))
+    por_laboratorio.sort(key=lambda lab: -lab['horas_fuera_servicio'])
+    return {
+        'resumen': _resumen(global_),
+        'por_laboratorio': por_laboratorio,
+        'por_pc': pcs,
+    }
@@ -0,0 +1,400 @@
+"""
+Métricas de operación en formato de texto de Prometheus (/metrics).
+
+Histogramas:
+    gestion_registro_duracion_segundos{operacion}   entrada/salida de estudiantes
+    gestion_reporte_duracion_segundos{ruta}         APIs de reportes y dashboard
+    gestion_exportacion_duracion_segundos{formato}  construcción del PDF/Excel
+    gestion_exportacion_bytes{formato}              tamaño del archivo generado
+    gestion_consultas_por_peticion{ruta}            consultas SQL por petición
+Contadores:
+    gestion_cache_respuestas_total{ruta, resultado} aciertos (hit) y fallos (miss) de la caché de respuestas
+Gauges (calculados de la base al consultar /metrics):
+    gestion_sesiones_activas{laboratorio}
+    gestion_pcs{laboratorio, estado}
+
+Cada proceso (worker) acumula sus histogramas y contadores en memoria y los
+escribe cada METRICAS_INTERVALO_S segundos en
+METRICAS_DIRECTORIO/<pid>_<inicio>.json; /metrics suma los archivos de todos
+los procesos, así que los contadores no dependen de qué worker atienda la
+consulta. Para que los contadores no retrocedan, los archivos de procesos
+que ya terminaron no se descartan: al leer se suman a agregado.json y se
+borran, de modo que el directorio no crece con cada reinicio de workers. El
+directorio debe ser local al servidor: un proceso se da por terminado si su
+pid ya no existe en esta máquina.
+"""
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES = (10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000)
+CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+HISTOGRAMAS = {
+    'gestion_registro_duracion_segundos': ('Duración del registro de entrada y salida', LATENCIA),
+    'gestion_reporte_duracion_segundos': ('Duración de las APIs de reportes por ruta', LATENCIA),
+    'gestion_exportacion_duracion_segundos': ('Tiempo de construcción de las exportaciones', LATENCIA),
+    'gestion_exportacion_bytes': ('Tamaño de las exportaciones', BYTES),
+    'gestion_consultas_por_peticion': ('Consultas SQL por petición y ruta', CONSULTAS),
+}
+
+CONTADORES = {
+    'gestion_cache_respuestas_total': 'Consultas a la caché de respuestas por ruta y resultado',
+}
+
+# Rutas (nombre en gestion/urls.py) de registro de entrada y salida
+RUTAS_REGISTRO = {
+    'registro': 'entrada',
+    'api_registrar_visita': 'entrada',
+    'finalizar': 'salida',
+    'api_finalizar_visita': 'salida',
+    'api_finalizar_sesion': 'salida',
+}
+PREFIJOS_REPORTE = ('api_reports_', 'api_reservations_', 'api_dashboard_', 'api_lab_usage',
+                    'api_software_usage', 'api_visits_timeline', 'api_recent_visits')
+
+
+AGREGADO = 'agregado.json'
+BLOQUEO = 'agregado.lock'
+# Un bloqueo más viejo que esto quedó de un proceso que murió a mitad de la fusión
+BLOQUEO_VENCIDO_S = 30
+
+
+def _directorio():
+    return getattr(settings, 'METRICAS_DIRECTORIO', None) or os.path.join(tempfile.gettempdir(), 'sistema_labs_metricas')
+
+
+class AlmacenMetricas:
+    """
+    Series del proceso actual: {(nombre, etiquetas): [conteos por bucket..., suma]}
+    para los histogramas y {(nombre, etiquetas): [total]} para los contadores.
+    """
+
+    def __init__(self):
+        self.bloqueo = threading.Lock()
+        self.valores = {}
+        self.archivo = None
+        self.ultima_escritura = 0.0
+
+    def observar(self, nombre, valor, **etiquetas):
+        limites = HISTOGRAMAS[nombre][1]
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self.bloqueo:
+            serie = self.valores.get(clave)
+            if serie is None:
+                serie = self.valores[clave] = [0] * (len(limites) + 2)
+            # Último bucket = +Inf; la última posición guarda la suma
+            serie[bisect.bisect_left(limites, valor)] += 1
+            serie[-1] += valor
+        self._escribir_si_toca()
+
+    def incrementar(self, nombre, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self.bloqueo:
+            self.valores.setdefault(clave, [0])[0] += 1
+        self._escribir_si_toca()
+
+    def _escribir_si_toca(self):
+        if time.monotonic() - self.ultima_escritura >= getattr(settings, 'METRICAS_INTERVALO_S', 5):
+            self.escribir()
+
+    def escribir(self):
+        """Guarda las series del proceso en su archivo (reemplazo atómico)."""
+        directorio = _directorio()
+        with self.bloqueo:
+            self.ultima_escritura = time.monotonic()
+            datos = [[nombre, list(etiquetas), serie] for (nombre, etiquetas), serie in self.valores.items()]
+            if self.archivo is None or os.path.dirname(self.archivo) != directorio:
+                self.archivo = os.path.join(directorio, f'{os.getpid()}_{time.time_ns()}.json')
+            archivo = self.archivo
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            temporal = f'{archivo}.tmp'
+            with open(temporal, 'w', encoding='utf-8') as salida:
+                json.dump(datos, salida)
+            os.replace(temporal, archivo)
+        except OSError:
+            pass  # las métricas nunca deben interrumpir una petición
+
+    def limpiar(self):
+        with self.bloqueo:
+            self.valores = {}
+            self.archivo = None
+
+
+almacen = AlmacenMetricas()
+
+
+def _sumar(totales, datos):
+    for nombre, etiquetas, serie in datos:
+        if nombre not in HISTOGRAMAS and nombre not in CONTADORES:
+            continue
+        clave = (nombre, tuple(tuple(par) for par in etiquetas))
+        acumulada = totales.setdefault(clave, [0] * len(serie))
+        for i, valor in enumerate(serie):
+            acumulada[i] += valor
+
+
+def _leer(ruta):
+    with open(ruta, encoding='utf-8') as entrada:
+        return json.load(entrada)
+
+
+def _leer_agregado(directorio):
+    """{'series': [...], 'fusionados': [...]}; 'fusionados' son los archivos ya sumados aún sin borrar."""
+    try:
+        return _leer(os.path.join(directorio, AGREGADO))
+    except (OSError, ValueError):
+        return {'series': [], 'fusionados': []}
+
+
+def _archivos_de_procesos(directorio):
+    """[(pid, inicio, archivo)] de los archivos <pid>_<inicio>.json del directorio."""
+    procesos = []
+    for archivo in os.listdir(directorio):
+        pid, _, inicio = archivo.removesuffix('.json').partition('_')
+        if archivo.endswith('.json') and pid.isdigit() and inicio.isdigit():
+            procesos.append((int(pid), int(inicio), archivo))
+    return procesos
+
+
+# Windows: OpenProcess/GetExitCodeProcess (os.kill(pid, 0) terminaría el proceso)
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+STILL_ACTIVE = 259
+ERROR_ACCESS_DENIED = 5
+
+
+def _proceso_vivo_windows(pid):
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    manejador = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not manejador:
+        # Sin acceso: existe pero es de otro usuario; cualquier otro error: ya no existe
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        codigo = wintypes.DWORD()
+        if not kernel32.GetExitCodeProcess(manejador, ctypes.byref(codigo)):
+            return True
+        return codigo.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(manejador)
+
+
+def _proceso_vivo(pid):
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        return _proceso_vivo_windows(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # existe pero es de otro usuario
+    return True
+
+
+def _terminados(procesos):
+    """Archivos de procesos que ya no existen; con un pid reutilizado solo el archivo más nuevo puede estar vivo."""
+    recientes = {}
+    for pid, inicio, archivo in procesos:
+        recientes[pid] = max(recientes.get(pid, (inicio, archivo)), (inicio, archivo))
+    return [
+        archivo for pid, inicio, archivo in procesos
+        if recientes[pid] != (inicio, archivo) or not _proceso_vivo(pid)
+    ]
+
+
+def _tomar_bloqueo(directorio):
+    ruta = os.path.join(directorio, BLOQUEO)
+    try:
+        if time.time() - os.path.getmtime(ruta) > BLOQUEO_VENCIDO_S:
+            os.remove(ruta)
+    except OSError:
+        pass
+    try:
+        os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except OSError:
+        return None  # otro proceso está fusionando
+    return ruta
+
+
+def _borrar(directorio, archivos):
+    for archivo in archivos:
+        try:
+            os.remove(os.path.join(directorio, archivo))
+        except OSError:
+            pass
+
+
+def fusionar_terminados(directorio=None):
+    """
+    Suma a agregado.json los archivos de procesos terminados y los borra.
+
+    Los archivos fusionados se anotan en el agregado (reemplazo atómico) antes
+    de borrarlos: un lector que vea el agregado nuevo los ignora aunque sigan
+    en el directorio, y si el borrado falla no se vuelven a sumar. Un solo
+    proceso fusiona a la vez (agregado.lock); los demás leen sin esperar.
+    """
+    directorio = directorio or _directorio()
+    bloqueo = _tomar_bloqueo(directorio)
+    if bloqueo is None:
+        return
+    try:
+        agregado = _leer_agregado(directorio)
+        procesos = _archivos_de_procesos(directorio)
+        presentes = {archivo for _, _, archivo in procesos}
+        fusionados = [archivo for archivo in agregado['fusionados'] if archivo in presentes]
+        nuevos = [archivo for archivo in _terminados(procesos) if archivo not in fusionados]
+        # Sumados en una fusión anterior cuyo borrado falló
+        _borrar(directorio, fusionados)
+        if not nuevos and len(fusionados) == len(agregado['fusionados']):
+            return
+
+        totales = {}
+        _sumar(totales, agregado['series'])
+        for archivo in nuevos:
+            try:
+                _sumar(totales, _leer(os.path.join(directorio, archivo)))
+            except (OSError, ValueError):
+                pass  # ilegible: se descarta igual que al leer
+        datos = {
+            'series': [[nombre, list(etiquetas), serie] for (nombre, etiquetas), serie in totales.items()],
+            'fusionados': fusionados + nuevos,
+        }
+        ruta = os.path.join(directorio, AGREGADO)
+        with open(f'{ruta}.tmp', 'w', encoding='utf-8') as salida:
+            json.dump(datos, salida)
+        os.replace(f'{ruta}.tmp', ruta)
+        _borrar(directorio, nuevos)
+    except OSError:
+        pass  # las métricas nunca deben interrumpir una petición
+    finally:
+        try:
+            os.remove(bloqueo)
+        except OSError:
+            pass
+
+
+def _sumar_directorio(directorio):
+    totales = {}
+    try:
+        procesos = _archivos_de_procesos(directorio)
+    except OSError:
+        return totales
+    # El agregado se lee antes que los archivos: si otro proceso lo reemplaza
+    # y borra un archivo mientras tanto, el open falla y se vuelve a leer
+    agregado = _leer_agregado(directorio)
+    _sumar(totales, agregado['series'])
+    fusionados = set(agregado['fusionados'])
+    for _, _, archivo in procesos:
+        if archivo in fusionados:
+            continue
+        try:
+            datos = _leer(os.path.join(directorio, archivo))
+        except FileNotFoundError:
+            raise
+        except (OSError, ValueError):
+            continue
+        _sumar(totales, datos)
+    return totales
+
+
+def leer_histogramas():
+    """Suma los histogramas y contadores de todos los procesos: {(nombre, etiquetas): serie}."""
+    almacen.escribir()
+    directorio = _directorio()
+    fusionar_terminados(directorio)
+    for _ in range(3):
+        try:
+            return _sumar_directorio(directorio)
+        except FileNotFoundError:
+            continue  # otro proceso fusionó un archivo entre listar y leer
+    return {}
+
+
+def observar_peticion(request, duracion, consultas):
+    """Llamado por MedicionRendimientoMiddleware al terminar cada petición de gestion."""
+    coincidencia = getattr(request, 'resolver_match', None)
+    ruta = coincidencia.url_name if coincidencia else None
+    if not ruta or ruta == 'metricas':
+        return
+    almacen.observar('gestion_consultas_por_peticion', consultas, ruta=ruta)
+    if ruta in RUTAS_REGISTRO and request.method == 'POST':
+        almacen.observar('gestion_registro_duracion_segundos', duracion, operacion=RUTAS_REGISTRO[ruta])
+    elif ruta.startswith(PREFIJOS_REPORTE):
+        almacen.observar('gestion_reporte_duracion_segundos', duracion, ruta=ruta)
+
+
+def observar_exportacion(formato, duracion, tamano):
+    almacen.observar('gestion_exportacion_duracion_segundos', duracion, formato=formato)
+    almacen.observar('gestion_exportacion_bytes', tamano, formato=formato)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _gauges():
+    from .models import Laboratorio, PC
+
+    sesiones = Laboratorio.objects.annotate(
+        activas=Count('pc__visita', filter=Q(pc__visita__fecha_hora_fin__isnull=True))
+    ).values_list('nombre', 'activas').order_by('nombre')
+    pcs = PC.objects.values_list('laboratorio__nombre', 'estado').annotate(total=Count('id')).order_by(
+        'laboratorio__nombre', 'estado'
+    )
+    return [
+        ('gestion_sesiones_activas', 'Visitas en curso por laboratorio',
+         [((('laboratorio', nombre),), activas) for nombre, activas in sesiones]),
+        ('gestion_pcs', 'PCs por laboratorio y estado',
+         [((('laboratorio', laboratorio), ('estado', estado)), total) for laboratorio, estado, total in pcs]),
+    ]
+
+
+def exposicion():
+    """Texto de /metrics (formato de exposición de Prometheus 0.0.4)."""
+    lineas = []
+    histogramas = leer_histogramas()
+    for nombre, (ayuda, limites) in HISTOGRAMAS.items():
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} histogram']
+        for (serie_nombre, etiquetas), serie in sorted(histogramas.items()):
+            if serie_nombre != nombre:
+                continue
+            acumulado = 0
+            for limite, conteo in zip(list(limites) + ['+Inf'], serie[:-1]):
+                acumulado += conteo
+                lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas + (("le", limite),))} {acumulado}')
+            lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {_numero(serie[-1])}')
+            lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {acumulado}')
+    for nombre, ayuda in CONTADORES.items():
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} counter']
+        lineas += [
+            f'{nombre}{_etiquetas(etiquetas)} {serie[0]}'
+            for (serie_nombre, etiquetas), serie in sorted(histogramas.items()) if serie_nombre == nombre
+        ]
+    for nombre, ayuda, valores in _gauges():
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} gauge']
+        lineas += [f'{nombre}{_etiquetas(etiquetas)} {valor}' for etiquetas, valor in valores]
+    return '\n'.join(lineas) + '\n'
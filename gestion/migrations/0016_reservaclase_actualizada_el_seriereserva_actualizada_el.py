@@ -0,0 +1,23 @@
+# Generated by Django 4.2.25 on 2026-10-19 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0015_add_carrera_model_and_nota_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservaclase',
+            name='actualizada_el',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='seriereserva',
+            name='actualizada_el',
+            field=models.DateTimeField(auto_now=True, null=True),
+        ),
+    ]
@@ -0,0 +1,137 @@
+"""
+Convierte gestion_visita en una tabla particionada por mes de
+fecha_hora_inicio (solo PostgreSQL; en otros motores no hace nada).
+
+La llave primaria de una tabla particionada debe incluir la columna de
+partición, así que en la base queda como (id, fecha_hora_inicio); para
+Django la pk sigue siendo id y la secuencia garantiza que no se repita.
+Ninguna tabla tiene llaves foráneas hacia gestion_visita.
+"""
+from datetime import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+# Copia de gestion/particiones.py al escribir la migración: una migración
+# histórica no debe cambiar si después cambia el código de la app
+TABLA = 'gestion_visita'
+PARTICION_DEFAULT = f'{TABLA}_pdefault'
+PREFIJO_PARTICION = f'{TABLA}_p'
+TABLA_ANTERIOR = f'{TABLA}_sin_particionar'
+SECUENCIA = f'{TABLA}_id_part_seq'
+MESES_ADELANTE = 3
+
+LLAVES_FORANEAS = [
+    ('estudiante_id', 'gestion_estudiante'),
+    ('pc_id', 'gestion_pc'),
+    ('software_utilizado_id', 'gestion_software'),
+]
+
+
+def sumar_meses(fecha, meses):
+    """Primer día (hora local, aware) del mes que está `meses` después del de `fecha`."""
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return timezone.make_aware(datetime(indice // 12, indice % 12 + 1, 1))
+
+
+def crear_particion(cursor, mes):
+    """Crea y adjunta la partición del mes moviendo antes las filas que DEFAULT tenga de él."""
+    desde, hasta = sumar_meses(mes, 0), sumar_meses(mes, 1)
+    nombre = f'{PREFIJO_PARTICION}{desde:%Y%m}'
+    cursor.execute(f'CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f"""
+        WITH movidas AS (
+            DELETE FROM {PARTICION_DEFAULT}
+            WHERE fecha_hora_inicio >= %s AND fecha_hora_inicio < %s
+            RETURNING *
+        )
+        INSERT INTO {nombre} SELECT * FROM movidas
+        """,
+        [desde, hasta]
+    )
+    cursor.execute(
+        f"ALTER TABLE {TABLA} ATTACH PARTITION {nombre} "
+        f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+    )
+
+
+def _indices_y_llaves(sufijo):
+    sentencias = [
+        f'CREATE INDEX {TABLA}_{columna}_{sufijo}idx ON {TABLA} ({columna})'
+        for columna, _ in LLAVES_FORANEAS
+    ]
+    sentencias += [
+        f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_{columna}_{sufijo}fk FOREIGN KEY ({columna}) '
+        f'REFERENCES {referencia} (id) DEFERRABLE INITIALLY DEFERRED'
+        for columna, referencia in LLAVES_FORANEAS
+    ]
+    return sentencias
+
+
+def particionar(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor != 'postgresql':
+        return
+
+    with conexion.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLA} RENAME TO {TABLA_ANTERIOR}')
+        cursor.execute(
+            f'CREATE TABLE {TABLA} (LIKE {TABLA_ANTERIOR} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (fecha_hora_inicio)'
+        )
+        # La secuencia de id pertenece a la tabla anterior: se crea una propia
+        cursor.execute(f'CREATE SEQUENCE {SECUENCIA} OWNED BY {TABLA}.id')
+        cursor.execute(f"ALTER TABLE {TABLA} ALTER COLUMN id SET DEFAULT nextval('{SECUENCIA}')")
+        cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_part_pkey PRIMARY KEY (id, fecha_hora_inicio)')
+        for sentencia in _indices_y_llaves('part_'):
+            cursor.execute(sentencia)
+        cursor.execute(f'CREATE INDEX {TABLA}_fecha_hora_inicio_part_idx ON {TABLA} (fecha_hora_inicio)')
+        # Sesiones activas: pocas filas, se buscan en cada registro de entrada/salida
+        cursor.execute(
+            f'CREATE INDEX {TABLA}_activas_part_idx ON {TABLA} (pc_id) WHERE fecha_hora_fin IS NULL'
+        )
+        cursor.execute(f'CREATE TABLE {PARTICION_DEFAULT} PARTITION OF {TABLA} DEFAULT')
+
+        # Una partición por mes desde la visita más antigua hasta unos meses adelante
+        cursor.execute(f'SELECT MIN(fecha_hora_inicio) FROM {TABLA_ANTERIOR}')
+        primera = cursor.fetchone()[0]
+        mes = sumar_meses(timezone.localtime(primera) if primera else timezone.localtime(), 0)
+        ultimo = sumar_meses(timezone.localtime(), MESES_ADELANTE)
+        while mes <= ultimo:
+            crear_particion(cursor, mes)
+            mes = sumar_meses(mes, 1)
+
+        cursor.execute(f'INSERT INTO {TABLA} SELECT * FROM {TABLA_ANTERIOR}')
+        cursor.execute(
+            f"SELECT setval('{SECUENCIA}', COALESCE((SELECT MAX(id) FROM {TABLA}), 0) + 1, false)"
+        )
+        cursor.execute(f'DROP TABLE {TABLA_ANTERIOR}')
+
+
+def desparticionar(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor != 'postgresql':
+        return
+
+    with conexion.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {TABLA} RENAME TO {TABLA_ANTERIOR}')
+        cursor.execute(f'CREATE TABLE {TABLA} (LIKE {TABLA_ANTERIOR} INCLUDING DEFAULTS)')
+        cursor.execute(f'ALTER SEQUENCE {SECUENCIA} OWNED BY {TABLA}.id')
+        cursor.execute(f'ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_pkey PRIMARY KEY (id)')
+        for sentencia in _indices_y_llaves(''):
+            cursor.execute(sentencia)
+        cursor.execute(f'INSERT INTO {TABLA} SELECT * FROM {TABLA_ANTERIOR}')
+        # Elimina también las particiones
+        cursor.execute(f'DROP TABLE {TABLA_ANTERIOR}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0016_reservaclase_actualizada_el_seriereserva_actualizada_el'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar, desparticionar),
+    ]
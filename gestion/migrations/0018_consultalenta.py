@@ -0,0 +1,34 @@
+# Generated by Django 4.2.25 on 2026-10-19 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0017_particionar_visita'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaLenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('huella', models.CharField(max_length=40, unique=True)),
+                ('sql', models.TextField(help_text='SQL normalizado (valores reemplazados por ?)')),
+                ('ejemplo', models.TextField(help_text='SQL de la muestra más lenta con sus parámetros')),
+                ('ruta', models.CharField(blank=True, help_text='Petición de la muestra más lenta', max_length=200)),
+                ('muestras', models.PositiveIntegerField(default=0)),
+                ('tiempo_total_ms', models.FloatField(default=0)),
+                ('tiempo_max_ms', models.FloatField(default=0)),
+                ('plan', models.TextField(blank=True, help_text='Plan de ejecución de la muestra más lenta')),
+                ('primera_vez', models.DateTimeField(auto_now_add=True)),
+                ('ultima_vez', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Consulta Lenta',
+                'verbose_name_plural': 'Consultas Lentas',
+                'ordering': ['-tiempo_total_ms'],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.25 on 2026-10-19 20:30
+
+from django.db import migrations, models
+
+# En PostgreSQL 0017_particionar_visita creó su propio índice de
+# fecha_hora_inicio; visita_inicio_idx lo reemplaza.
+INDICE_PARTICION = 'gestion_visita_fecha_hora_inicio_part_idx'
+
+
+def quitar_indice_particion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE_PARTICION}')
+
+
+def restaurar_indice_particion(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {INDICE_PARTICION} ON gestion_visita (fecha_hora_inicio)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0018_consultalenta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservaclase',
+            index=models.Index(fields=['laboratorio', 'fecha_hora_inicio', 'fecha_hora_fin'], name='reserva_lab_horario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visita',
+            index=models.Index(fields=['fecha_hora_inicio'], name='visita_inicio_idx'),
+        ),
+        migrations.RunPython(quitar_indice_particion, restaurar_indice_particion),
+        migrations.AddIndex(
+            model_name='visita',
+            index=models.Index(fields=['pc', 'fecha_hora_fin'], name='visita_pc_fin_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.25 on 2026-10-19 20:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0019_indices_reportes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UtilizacionHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('pcs', models.PositiveIntegerField(help_text='PCs del laboratorio al calcular')),
+                ('horas_visitas', models.FloatField(default=0)),
+                ('horas_reservadas', models.FloatField(default=0)),
+                ('horas_libres', models.FloatField(default=0)),
+                ('calculado_el', models.DateTimeField(auto_now_add=True)),
+                ('laboratorio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utilizacion', to='gestion.laboratorio')),
+            ],
+            options={
+                'verbose_name': 'Utilización por Hora',
+                'verbose_name_plural': 'Utilización por Hora',
+                'indexes': [models.Index(fields=['fecha'], name='utilizacion_fecha_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='utilizacionhora',
+            constraint=models.UniqueConstraint(fields=('laboratorio', 'fecha', 'hora'), name='utilizacion_lab_fecha_hora_unica'),
+        ),
+    ]
@@ -162,6 +162,7 @@ class SerieReserva(models.Model):
     # Campos de control
     activa = models.BooleanField(default=True, help_text="Si la serie está activa")
     creada_el = models.DateTimeField(auto_now_add=True)
+    actualizada_el = models.DateTimeField(auto_now=True, null=True, blank=True)
 
     class Meta:
         verbose_name = "Serie de Reserva"
@@ -228,6 +229,16 @@ class ReservaClase(models.Model):
         help_text="Nota visible en el calendario (ej: Examen, Curso, Evento). Solo para reservas individuales."
     )
 
+    # Se usa como validador (ETag) de los calendarios iCalendar.
+    # Nulo en registros cargados con loaddata (los fixtures no lo incluyen)
+    actualizada_el = models.DateTimeField(auto_now=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Reportes por rango de fechas y búsqueda de traslapes por laboratorio
+            models.Index(fields=['laboratorio', 'fecha_hora_inicio', 'fecha_hora_fin'], name='reserva_lab_horario_idx'),
+        ]
+
     def __str__(self):
         return f'Reserva de {self.laboratorio.nombre} para {self.materia}'
     
@@ -267,6 +278,14 @@ class Visita(models.Model):
     fecha_hora_inicio = models.DateTimeField(auto_now_add=True)
     fecha_hora_fin = models.DateTimeField(null=True, blank=True) # Se llena al hacer check-out
 
+    class Meta:
+        indexes = [
+            # Rangos de fechas de los reportes (gestion/filtros.py)
+            models.Index(fields=['fecha_hora_inicio'], name='visita_inicio_idx'),
+            # Visitas activas de una PC (fecha_hora_fin nula) en el registro de entrada/salida
+            models.Index(fields=['pc', 'fecha_hora_fin'], name='visita_pc_fin_idx'),
+        ]
+
     def __str__(self):
         return f'Visita de {self.estudiante.nombre_completo} en {self.pc}'
 
@@ -343,3 +362,63 @@ class CalendarioSemanal(ReservaClase):
         proxy = True
         verbose_name = "Calendario Semanal"
         verbose_name_plural = "Calendario Semanal"
+
+
+# Registro de consultas lentas muestreadas por MedicionRendimientoMiddleware
+class ConsultaLenta(models.Model):
+    """
+    Consultas SQL lentas agrupadas por huella (el SQL sin valores literales),
+    para saber qué forma de consulta consume más tiempo en la base.
+    """
+    huella = models.CharField(max_length=40, unique=True)
+    sql = models.TextField(help_text="SQL normalizado (valores reemplazados por ?)")
+    ejemplo = models.TextField(help_text="SQL de la muestra más lenta con sus parámetros")
+    ruta = models.CharField(max_length=200, blank=True, help_text="Petición de la muestra más lenta")
+    muestras = models.PositiveIntegerField(default=0)
+    tiempo_total_ms = models.FloatField(default=0)
+    tiempo_max_ms = models.FloatField(default=0)
+    plan = models.TextField(blank=True, help_text="Plan de ejecución de la muestra más lenta")
+    primera_vez = models.DateTimeField(auto_now_add=True)
+    ultima_vez = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Consulta Lenta"
+        verbose_name_plural = "Consultas Lentas"
+        ordering = ['-tiempo_total_ms']
+
+    def __str__(self):
+        return f'{self.huella[:12]} ({self.muestras} muestras, {self.tiempo_total_ms:.0f} ms)'
+
+    @property
+    def tiempo_promedio_ms(self):
+        return self.tiempo_total_ms / self.muestras if self.muestras else 0
+
+
+# Cubo de utilización por laboratorio, fecha y hora (gestion/utilizacion.py)
+class UtilizacionHora(models.Model):
+    """
+    Horas-PC de una hora local de un laboratorio: usadas por visitas,
+    bloqueadas por reservas de clase y libres. Solo se guardan días ya
+    terminados; el día en curso se calcula en cada consulta.
+    """
+    laboratorio = models.ForeignKey(Laboratorio, on_delete=models.CASCADE, related_name='utilizacion')
+    fecha = models.DateField()
+    hora = models.PositiveSmallIntegerField()
+    pcs = models.PositiveIntegerField(help_text="PCs del laboratorio al calcular")
+    horas_visitas = models.FloatField(default=0)
+    horas_reservadas = models.FloatField(default=0)
+    horas_libres = models.FloatField(default=0)
+    calculado_el = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Utilización por Hora"
+        verbose_name_plural = "Utilización por Hora"
+        constraints = [
+            models.UniqueConstraint(fields=['laboratorio', 'fecha', 'hora'], name='utilizacion_lab_fecha_hora_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha'], name='utilizacion_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.laboratorio} {self.fecha} {self.hora:02d}:00'
@@ -0,0 +1,217 @@
+"""
+Ocupación de los laboratorios en el tiempo a partir de las visitas.
+
+Las visitas que se traslapan con el rango se leen una sola vez como arreglos
+de NumPy (inicio y fin en segundos desde 1970, calculados en la base para no
+construir un datetime por fila) y se recortan al rango. Para cada
+laboratorio se hace un barrido: cada visita aporta un evento +1 al empezar y
+-1 al terminar, se ordenan por tiempo (los fines antes que los inicios en el
+mismo segundo, para que una PC que se libera y se vuelve a ocupar no cuente
+doble) y la suma acumulada da el número de PCs en uso entre un evento y el
+siguiente.
+
+Con esa función escalonada se calculan, por intervalos de `resolucion`
+minutos, el promedio de PCs en uso (área bajo la curva / duración) y el
+máximo; además el pico del rango y los minutos en que la ocupación estuvo en
+o por encima del umbral (porcentaje de las PCs del laboratorio). Todo es
+vectorizado: un año de visitas se procesa en milisegundos y el tiempo lo
+domina la consulta.
+"""
+from datetime import datetime, timedelta
+from math import ceil
+
+import numpy as np
+from django.db.models import BigIntegerField, Count, Func, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .filtros import PERIODOS, fechas, inicio_del_dia, q_visitas
+from .models import Laboratorio, Visita
+
+RESOLUCION_DEFAULT = 60   # minutos
+UMBRAL_DEFAULT = 80       # % de las PCs del laboratorio
+MAX_PUNTOS = 10000        # puntos por serie (un año por hora son 8,760)
+
+
+class Epoch(Func):
+    """Segundos enteros desde 1970-01-01 UTC de un DateTimeField."""
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite guarda las fechas como texto en UTC; 2440587.5 es el día juliano de 1970-01-01
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(ROUND((julianday(%(expressions)s) - 2440587.5) * 86400) AS INTEGER)',
+            **extra_context
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(EXTRACT(EPOCH FROM %(expressions)s) AS BIGINT)',
+            **extra_context
+        )
+
+
+def _segundos(momento):
+    return int(momento.timestamp())
+
+
+def _local(segundos, zona=None):
+    return datetime.fromtimestamp(int(segundos), zona or timezone.get_current_timezone()).isoformat()
+
+
+def rango_por_defecto(filtros):
+    """(desde, hasta) como date: las fechas de los filtros o los últimos 30 días hasta hoy."""
+    desde, hasta = fechas(filtros)
+    hasta = hasta or timezone.localdate()
+    desde = desde or hasta - timedelta(days=PERIODOS['monthly'])
+    return desde, hasta
+
+
+def cargar_visitas(filtros, inicio, fin):
+    """
+    (laboratorios, inicios, fines) como arreglos int64 de las visitas que se
+    traslapan con [inicio, fin), recortadas al rango. Las visitas en curso
+    terminan ahora.
+    """
+    limite = min(_segundos(fin), _segundos(timezone.now()))
+    filas = Visita.objects.filter(
+        q_visitas(filtros, laboratorio=False, fechas=False),
+        Q(fecha_hora_fin__gt=inicio) | Q(fecha_hora_fin__isnull=True),
+        fecha_hora_inicio__lt=fin,
+    )
+    if filtros.get('laboratory') not in (None, '', 'all'):
+        filas = filas.filter(pc__laboratorio_id=filtros['laboratory'])
+    filas = filas.values_list(
+        'pc__laboratorio_id',
+        Epoch('fecha_hora_inicio'),
+        Coalesce(Epoch('fecha_hora_fin'), Value(limite), output_field=BigIntegerField()),
+    ).order_by()
+
+    datos = np.array(list(filas), dtype=np.int64).reshape(-1, 3)
+    laboratorios = datos[:, 0]
+    inicios = np.maximum(datos[:, 1], _segundos(inicio))
+    fines = np.minimum(datos[:, 2], limite)
+    validas = inicios < fines
+    return laboratorios[validas], inicios[validas], fines[validas]
+
+
+def barrido(inicios, fines):
+    """
+    (tiempos, nivel): instantes de los eventos ordenados y PCs en uso desde
+    cada uno hasta el siguiente. El último nivel siempre es 0.
+    """
+    tiempos = np.concatenate((inicios, fines))
+    cambios = np.concatenate((np.ones(len(inicios), np.int64), np.full(len(fines), -1, np.int64)))
+    # lexsort ordena por la última clave: tiempo y, en empate, -1 antes que +1
+    orden = np.lexsort((cambios, tiempos))
+    return tiempos[orden], np.cumsum(cambios[orden])
+
+
+def area(tiempos, nivel, momentos):
+    """Integral de la ocupación (PC-segundos) desde el primer evento hasta cada momento."""
+    if not len(tiempos):
+        return np.zeros(len(momentos), np.int64)
+    acumulada = np.concatenate(([0], np.cumsum(np.diff(tiempos) * nivel[:-1])))
+    indice = np.searchsorted(tiempos, momentos, side='right') - 1
+    previo = np.clip(indice, 0, None)
+    hasta_momento = acumulada[previo] + (momentos - tiempos[previo]) * nivel[previo]
+    return np.where(indice >= 0, hasta_momento, 0)
+
+
+def nivel_en(tiempos, nivel, momentos):
+    """PCs en uso en cada momento según el barrido (0 antes del primer evento)."""
+    if not len(tiempos):
+        return np.zeros(len(momentos), np.int64)
+    indice = np.searchsorted(tiempos, momentos, side='right') - 1
+    return np.where(indice >= 0, nivel[np.clip(indice, 0, None)], 0)
+
+
+def serie(tiempos, nivel, inicio, paso, intervalos):
+    """(promedio, maximo) de PCs en uso en cada uno de los `intervalos` de `paso` segundos desde `inicio`."""
+    if not len(tiempos):
+        return np.zeros(intervalos), np.zeros(intervalos, np.int64)
+    bordes = inicio + paso * np.arange(intervalos + 1, dtype=np.int64)
+    promedio = np.diff(area(tiempos, nivel, bordes)) / paso
+
+    # El máximo de un intervalo es el nivel con el que empieza o el de algún evento dentro de él
+    maximo = nivel_en(tiempos, nivel, bordes[:-1])
+    dentro = (tiempos >= bordes[0]) & (tiempos < bordes[-1])
+    np.maximum.at(maximo, (tiempos[dentro] - inicio) // paso, nivel[dentro])
+    return promedio, maximo
+
+
+def resumen(tiempos, nivel, pcs, umbral, duracion):
+    """Pico, momento en que se alcanzó, promedio del rango y minutos en o sobre el umbral."""
+    umbral_pcs = ceil(pcs * umbral / 100) if pcs else None
+    if not len(tiempos):
+        return {'umbral_pcs': umbral_pcs, 'pico': 0, 'pico_en': None, 'promedio': 0, 'minutos_sobre_umbral': 0}
+    tramos = np.diff(tiempos)
+    pico = int(nivel.max())
+    sobre = tramos[nivel[:-1] >= umbral_pcs].sum() if umbral_pcs else 0
+    return {
+        'umbral_pcs': umbral_pcs,
+        'pico': pico,
+        'pico_en': _local(tiempos[int(np.argmax(nivel))]) if pico else None,
+        'promedio': round(float((tramos * nivel[:-1]).sum()) / duracion, 2),
+        'minutos_sobre_umbral': round(float(sobre) / 60, 1),
+    }
+
+
+def ocupacion(filtros, resolucion=RESOLUCION_DEFAULT, umbral=UMBRAL_DEFAULT, incluir_series=True):
+    """
+    Ocupación de cada laboratorio y del total entre date_from y date_to (por
+    defecto los últimos 30 días) con los filtros de laboratorio y software.
+
+    'tiempos' son los inicios de los intervalos de `resolucion` minutos en
+    hora local; cada laboratorio trae 'promedio_serie' y 'maximo_serie' por
+    intervalo (si incluir_series) y el resumen del rango. resolucion debe dividir un
+    día (1440 minutos) y el número de intervalos no pasar de MAX_PUNTOS.
+    """
+    if resolucion <= 0 or 1440 % resolucion:
+        raise ValueError('resolucion debe ser un divisor de 1440 minutos')
+    if not 0 < umbral <= 100:
+        raise ValueError('umbral debe estar entre 1 y 100')
+    desde, hasta = rango_por_defecto(filtros)
+    if hasta < desde:
+        raise ValueError('date_from debe ser anterior a date_to')
+    inicio, fin = inicio_del_dia(desde), inicio_del_dia(hasta + timedelta(days=1))
+    paso = resolucion * 60
+    duracion = _segundos(fin) - _segundos(inicio)
+    intervalos = duracion // paso
+    if intervalos > MAX_PUNTOS:
+        raise ValueError(f'El rango genera {intervalos} intervalos; el máximo es {MAX_PUNTOS}, use una resolución mayor')
+
+    laboratorios = Laboratorio.objects.annotate(pcs=Count('pc')).order_by('nombre')
+    if filtros.get('laboratory') not in (None, '', 'all'):
+        laboratorios = laboratorios.filter(id=filtros['laboratory'])
+    laboratorios = list(laboratorios)
+    labs, inicios, fines = cargar_visitas(filtros, inicio, fin)
+
+    def calcular(inicios, fines, pcs):
+        tiempos, nivel = barrido(inicios, fines)
+        datos = {'pcs': pcs, 'visitas': len(inicios), **resumen(tiempos, nivel, pcs, umbral, duracion)}
+        if incluir_series:
+            promedio, maximo = serie(tiempos, nivel, _segundos(inicio), paso, intervalos)
+            datos['promedio_serie'] = np.round(promedio, 2).tolist()
+            datos['maximo_serie'] = maximo.tolist()
+        return datos
+
+    resultado = {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'resolucion': resolucion,
+        'umbral': umbral,
+        'laboratorios': [
+            {'id': lab.id, 'nombre': lab.nombre, **calcular(inicios[labs == lab.id], fines[labs == lab.id], lab.pcs)}
+            for lab in laboratorios
+        ],
+    }
+    ids = np.array([lab.id for lab in laboratorios], dtype=np.int64)
+    del_total = np.isin(labs, ids)
+    resultado['total'] = calcular(inicios[del_total], fines[del_total], sum(lab.pcs for lab in laboratorios))
+    if incluir_series:
+        zona = timezone.get_current_timezone()
+        resultado['tiempos'] = [_local(_segundos(inicio) + paso * i, zona) for i in range(intervalos)]
+    return resultado
@@ -0,0 +1,221 @@
+"""
+Particionamiento mensual de las visitas.
+
+Visita solo crece y casi todas las consultas filtran por fecha_hora_inicio.
+En PostgreSQL la migración 0017 convierte gestion_visita en una tabla
+particionada por rango de fecha_hora_inicio: cada mes (hora local) vive en
+gestion_visita_pAAAAMM y la partición gestion_visita_pdefault recibe las filas
+de meses sin partición. El ORM sigue consultando gestion_visita y PostgreSQL
+descarta las particiones fuera del rango filtrado, así que el registro de
+entrada, las sesiones activas y los reportes recientes solo tocan el mes
+actual aunque se acumulen años de historial.
+
+- crear_particiones: crea las particiones de los próximos meses (conviene
+  correr `particiones_visitas crear` mensualmente, p. ej. con cron).
+- archivar_visitas: exporta a NDJSON comprimido los meses anteriores al
+  corte y los elimina; en PostgreSQL cada mes se separa con DETACH PARTITION
+  y se borra con DROP TABLE en lugar de un DELETE fila por fila.
+
+En otros motores (SQLite en las pruebas) la tabla no se particiona y
+archivar_visitas exporta y borra las filas con DELETE.
+"""
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cache_respuestas import registrar_cambio
+from .carga_masiva import valor_json
+from .models import Visita
+from .utilizacion import invalidar_intervalo
+
+TABLA = 'gestion_visita'
+PARTICION_DEFAULT = f'{TABLA}_pdefault'
+PREFIJO_PARTICION = f'{TABLA}_p'
+
+
+def sumar_meses(fecha, meses):
+    """Primer día (hora local, aware) del mes que está `meses` después del de `fecha`."""
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return timezone.make_aware(datetime(indice // 12, indice % 12 + 1, 1))
+
+
+def inicio_de_mes(fecha):
+    return sumar_meses(fecha, 0)
+
+
+def nombre_particion(mes):
+    return f'{PREFIJO_PARTICION}{mes:%Y%m}'
+
+
+def esta_particionada(using='default'):
+    conexion = connections[using]
+    if conexion.vendor != 'postgresql':
+        return False
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+            [TABLA]
+        )
+        return cursor.fetchone()[0]
+
+
+def listar_particiones(using='default'):
+    """[{'nombre', 'mes' (None para DEFAULT), 'filas_estimadas'}] ordenadas por mes."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, c.reltuples::bigint
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+            """,
+            [TABLA]
+        )
+        filas = cursor.fetchall()
+
+    particiones = []
+    for nombre, filas_estimadas in filas:
+        mes = None
+        if nombre != PARTICION_DEFAULT:
+            mes = timezone.make_aware(datetime.strptime(nombre[len(PREFIJO_PARTICION):], '%Y%m'))
+        particiones.append({'nombre': nombre, 'mes': mes, 'filas_estimadas': max(filas_estimadas, 0)})
+    return particiones
+
+
+def crear_particion(cursor, mes):
+    """
+    Crea y adjunta la partición del mes. Si la partición DEFAULT ya tiene
+    filas de ese mes se mueven a la nueva antes de adjuntarla (PostgreSQL
+    rechaza el ATTACH si DEFAULT tiene filas del rango).
+    """
+    desde, hasta = inicio_de_mes(mes), sumar_meses(mes, 1)
+    nombre = nombre_particion(desde)
+    cursor.execute(f'CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f"""
+        WITH movidas AS (
+            DELETE FROM {PARTICION_DEFAULT}
+            WHERE fecha_hora_inicio >= %s AND fecha_hora_inicio < %s
+            RETURNING *
+        )
+        INSERT INTO {nombre} SELECT * FROM movidas
+        """,
+        [desde, hasta]
+    )
+    # Los límites de una partición no admiten parámetros; son fechas generadas aquí
+    cursor.execute(
+        f"ALTER TABLE {TABLA} ATTACH PARTITION {nombre} "
+        f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}')"
+    )
+    return nombre
+
+
+def crear_particiones(meses_adelante=3, using='default'):
+    """Crea las particiones faltantes desde el mes actual hasta `meses_adelante` después."""
+    if not esta_particionada(using):
+        return []
+    existentes = {particion['nombre'] for particion in listar_particiones(using)}
+    hoy = timezone.localtime()
+    creadas = []
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        for desplazamiento in range(meses_adelante + 1):
+            mes = sumar_meses(hoy, desplazamiento)
+            if nombre_particion(mes) not in existentes:
+                creadas.append(crear_particion(cursor, mes))
+    return creadas
+
+
+def _exportar_mes(desde, hasta, ruta, using, lote):
+    """Escribe las visitas del rango en `ruta` como NDJSON comprimido."""
+    columnas = [campo.attname for campo in Visita._meta.concrete_fields]
+    visitas = Visita.objects.using(using).filter(
+        fecha_hora_inicio__gte=desde, fecha_hora_inicio__lt=hasta
+    ).order_by('pk').values(*columnas)
+    filas = 0
+    with gzip.open(ruta, 'wt', encoding='utf-8') as salida:
+        for fila in visitas.iterator(chunk_size=lote):
+            salida.write(json.dumps(fila, default=valor_json, ensure_ascii=False))
+            salida.write('\n')
+            filas += 1
+        salida.flush()
+        os.fsync(salida.fileno())
+    return filas
+
+
+def _agregar_archivo(temporal, ruta):
+    """Mueve el export al archivo del mes; si ya existe (DEFAULT o una corrida anterior) lo concatena."""
+    if not os.path.exists(ruta):
+        os.replace(temporal, ruta)
+        return
+    # Un archivo gzip puede tener varios miembros concatenados
+    with open(ruta, 'ab') as destino, open(temporal, 'rb') as origen:
+        shutil.copyfileobj(origen, destino)
+    os.remove(temporal)
+
+
+def archivar_visitas(antes_de, directorio, using='default', lote=5000):
+    """
+    Exporta a directorio/visitas_AAAAMM.ndjson.gz y elimina las visitas de los
+    meses anteriores al mes de `antes_de`. Retorna [(mes, filas)].
+
+    Cada mes se exporta antes de borrarlo. En PostgreSQL el DETACH y el DROP
+    van en una transacción corta que verifica que la partición tenga las
+    mismas filas que se exportaron. Al confirmar cada mes cambia la versión
+    'visita' de la caché de respuestas (gestion/cache_respuestas.py) y se
+    borran sus días del cubo de utilización.
+    """
+    corte = inicio_de_mes(antes_de)
+    os.makedirs(directorio, exist_ok=True)
+    particionada = esta_particionada(using)
+    particiones = {}
+    if particionada:
+        particiones = {
+            particion['mes']: particion['nombre']
+            for particion in listar_particiones(using) if particion['mes'] and particion['mes'] < corte
+        }
+
+    meses = set(particiones)
+    meses.update(
+        inicio_de_mes(timezone.localtime(mes)) for mes in
+        Visita.objects.using(using).filter(fecha_hora_inicio__lt=corte).datetimes('fecha_hora_inicio', 'month')
+    )
+
+    archivados = []
+    for mes in sorted(meses):
+        siguiente = sumar_meses(mes, 1)
+        ruta = os.path.join(directorio, f'visitas_{mes:%Y%m}.ndjson.gz')
+        temporal = f'{ruta}.tmp'
+        filas = _exportar_mes(mes, siguiente, temporal, using, lote)
+
+        try:
+            with transaction.atomic(using=using):
+                if mes in particiones:
+                    nombre = particiones[mes]
+                    with connections[using].cursor() as cursor:
+                        cursor.execute(f'ALTER TABLE {TABLA} DETACH PARTITION {nombre}')
+                        cursor.execute(f'SELECT COUNT(*) FROM {nombre}')
+                        borradas = cursor.fetchone()[0]
+                        cursor.execute(f'DROP TABLE {nombre}')
+                    # DROP TABLE no dispara señales; el DELETE de abajo sí
+                    registrar_cambio('visita', mes)
+                    # Hasta el día 1 del mes siguiente: visitas que cruzan la medianoche
+                    invalidar_intervalo(mes, siguiente)
+                else:
+                    # Sin partición propia (SQLite o filas en DEFAULT) se borran con DELETE
+                    borradas, _ = Visita.objects.using(using).filter(
+                        fecha_hora_inicio__gte=mes, fecha_hora_inicio__lt=siguiente
+                    ).delete()
+                if borradas != filas:
+                    # Llegaron visitas al mes después de exportarlo: se revierte el borrado
+                    raise RuntimeError(f'{mes:%Y-%m}: se exportaron {filas} visitas pero había {borradas}; no se eliminó')
+        except Exception:
+            os.remove(temporal)
+            raise
+        _agregar_archivo(temporal, ruta)
+        archivados.append((mes, filas))
+    return archivados
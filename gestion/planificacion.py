@@ -0,0 +1,562 @@
+"""
+Utilidades de planificación de laboratorios basadas en aritmética de intervalos.
+
+- buscar_huecos: encuentra los primeros huecos libres en todos los laboratorios
+  que cumplan con duración, número de PCs y software requerido.
+- PlanificadorSemestre: asigna laboratorios a un lote de clases semestrales
+  respetando capacidad, software y conflictos de horario, y crea las series.
+"""
+import heapq
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import DiaSemana, Laboratorio, ReservaClase, SerieReserva, Software
+
+
+# Horario de operación de los laboratorios (el mismo que muestra el calendario semanal)
+HORA_APERTURA = time(7, 0)
+HORA_CIERRE = time(21, 0)
+
+# Los huecos que empiezan "ahora" se redondean a este múltiplo de minutos
+GRANULARIDAD_MINUTOS = 15
+
+
+def fusionar_intervalos(intervalos):
+    """
+    Fusiona una lista de intervalos (inicio, fin) ordenada por inicio.
+    Los intervalos que se tocan o se solapan se combinan en uno solo.
+    """
+    fusionados = []
+    for inicio, fin in intervalos:
+        if fusionados and inicio <= fusionados[-1][1]:
+            if fin > fusionados[-1][1]:
+                fusionados[-1][1] = fin
+        else:
+            fusionados.append([inicio, fin])
+    return fusionados
+
+
+def _redondear_arriba(valor, minutos=GRANULARIDAD_MINUTOS):
+    """Redondea un datetime hacia arriba al siguiente múltiplo de `minutos`."""
+    base = valor.replace(second=0, microsecond=0)
+    if base < valor:
+        base += timedelta(minutes=1)
+    resto = base.minute % minutos
+    if resto:
+        base += timedelta(minutes=minutos - resto)
+    return base
+
+
+def _ventanas_operacion(fecha_desde, fecha_hasta, incluir_fin_de_semana):
+    """Genera las ventanas [apertura, cierre) de cada día hábil del rango."""
+    fecha = fecha_desde
+    while fecha <= fecha_hasta:
+        if incluir_fin_de_semana or fecha.weekday() < 5:
+            yield (
+                timezone.make_aware(datetime.combine(fecha, HORA_APERTURA)),
+                timezone.make_aware(datetime.combine(fecha, HORA_CIERRE)),
+            )
+        fecha += timedelta(days=1)
+
+
+def _huecos_laboratorio(ocupados, ventanas, duracion, desde):
+    """
+    Barrido de un laboratorio: recorre las ventanas de operación y los
+    intervalos ocupados (ya fusionados y ordenados) con un solo puntero y
+    genera, en orden cronológico, los huecos de al menos `duracion`.
+    """
+    i = 0
+    for apertura, cierre in ventanas:
+        cursor = max(apertura, desde)
+        if cursor >= cierre:
+            continue
+        # Saltar intervalos que terminan antes de la ventana
+        while i < len(ocupados) and ocupados[i][1] <= cursor:
+            i += 1
+        j = i
+        while cursor < cierre:
+            if j < len(ocupados) and ocupados[j][0] < cierre:
+                ocupado_inicio, ocupado_fin = ocupados[j]
+                if ocupado_inicio > cursor and ocupado_inicio - cursor >= duracion:
+                    yield cursor, ocupado_inicio
+                cursor = max(cursor, ocupado_fin)
+                j += 1
+            else:
+                if cierre - cursor >= duracion:
+                    yield cursor, cierre
+                break
+
+
+def buscar_huecos(duracion, fecha_desde, fecha_hasta, min_pcs=0, software_id=None,
+                  limite=10, incluir_fin_de_semana=False, ahora=None):
+    """
+    Retorna los primeros `limite` huecos libres (ordenados por hora de inicio)
+    en los laboratorios que tienen al menos `min_pcs` PCs fuera de
+    mantenimiento y, si se indica, el software requerido instalado.
+
+    Usa dos consultas (laboratorios candidatos con su número de PCs y
+    reservas del rango); el resto es un barrido de intervalos fusionados
+    por laboratorio combinado con heapq.merge.
+    """
+    ahora = ahora or timezone.now()
+    desde = _redondear_arriba(max(
+        ahora, timezone.make_aware(datetime.combine(fecha_desde, time.min))
+    ))
+    hasta = timezone.make_aware(datetime.combine(fecha_hasta + timedelta(days=1), time.min))
+
+    laboratorios = Laboratorio.objects.all()
+    if software_id:
+        laboratorios = laboratorios.filter(software_instalado__id=software_id)
+    laboratorios = list(
+        laboratorios.annotate(
+            num_pcs=Count('pc', filter=~Q(pc__estado='Mantenimiento'), distinct=True)
+        ).filter(num_pcs__gte=min_pcs).order_by('nombre').values('id', 'nombre', 'num_pcs')
+    )
+    if not laboratorios:
+        return []
+
+    ocupados_por_lab = {lab['id']: [] for lab in laboratorios}
+    reservas = ReservaClase.objects.filter(
+        laboratorio_id__in=ocupados_por_lab.keys(),
+        fecha_hora_inicio__lt=hasta,
+        fecha_hora_fin__gt=desde,
+    ).order_by('laboratorio_id', 'fecha_hora_inicio').values_list(
+        'laboratorio_id', 'fecha_hora_inicio', 'fecha_hora_fin'
+    )
+    for laboratorio_id, inicio, fin in reservas:
+        ocupados_por_lab[laboratorio_id].append((inicio, fin))
+
+    ventanas = list(_ventanas_operacion(
+        timezone.localtime(desde).date(), fecha_hasta, incluir_fin_de_semana
+    ))
+
+    def _generador(lab):
+        ocupados = fusionar_intervalos(ocupados_por_lab[lab['id']])
+        for inicio, fin in _huecos_laboratorio(ocupados, ventanas, duracion, desde):
+            yield inicio, lab['nombre'], lab['id'], fin, lab
+
+    huecos = []
+    for inicio, _, _, fin, lab in heapq.merge(*(_generador(lab) for lab in laboratorios)):
+        huecos.append({
+            'laboratorio_id': lab['id'],
+            'laboratorio': lab['nombre'],
+            'pcs': lab['num_pcs'],
+            'inicio': inicio,
+            'fin': inicio + duracion,
+            'disponible_hasta': fin,
+        })
+        if len(huecos) >= limite:
+            break
+    return huecos
+
+
+# Mapeo de códigos de DiaSemana a weekday() de Python
+DIAS_MAP = {'L': 0, 'M': 1, 'X': 2, 'J': 3, 'V': 4, 'S': 5, 'D': 6}
+
+
+def _minutos(valor):
+    """Convierte 'HH:MM' o time a minutos desde medianoche."""
+    if isinstance(valor, str):
+        valor = time.fromisoformat(valor)
+    return valor.hour * 60 + valor.minute
+
+
+class ClaseSolicitada:
+    """Una clase semestral a la que hay que asignarle laboratorio."""
+
+    def __init__(self, indice, datos, fecha_inicio, fecha_fin):
+        if not isinstance(datos, dict):
+            raise ValueError(f'Clase #{indice + 1}: debe ser un objeto JSON, no {datos!r}')
+        self.indice = indice
+        self.datos = datos
+        self.nombre = datos.get('nombre') or datos.get('materia')
+        if not self.nombre:
+            raise ValueError(f'Clase #{indice + 1}: falta "nombre"')
+
+        dias = datos.get('dias') or []
+        if isinstance(dias, str):
+            dias = list(dias)
+        try:
+            self.dias = sorted({DIAS_MAP[d.upper()] for d in dias})
+        except (KeyError, AttributeError):
+            raise ValueError(f'Clase "{self.nombre}": días inválidos {dias!r} (use L, M, X, J, V, S, D)')
+        if not self.dias:
+            raise ValueError(f'Clase "{self.nombre}": debe indicar al menos un día')
+        self.codigos_dias = [codigo for codigo, numero in DIAS_MAP.items() if numero in self.dias]
+
+        try:
+            self.hora_inicio = time.fromisoformat(datos['hora_inicio'])
+            self.hora_fin = time.fromisoformat(datos['hora_fin'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Clase "{self.nombre}": hora_inicio y hora_fin deben tener formato HH:MM')
+        self.inicio = _minutos(self.hora_inicio)
+        self.fin = _minutos(self.hora_fin)
+        if self.fin <= self.inicio:
+            raise ValueError(f'Clase "{self.nombre}": hora_fin debe ser posterior a hora_inicio')
+
+        try:
+            self.fecha_inicio = date.fromisoformat(datos['fecha_inicio']) if datos.get('fecha_inicio') else fecha_inicio
+            self.fecha_fin = date.fromisoformat(datos['fecha_fin']) if datos.get('fecha_fin') else fecha_fin
+        except (TypeError, ValueError):
+            raise ValueError(f'Clase "{self.nombre}": fechas inválidas (use YYYY-MM-DD)')
+        if not self.fecha_inicio or not self.fecha_fin or self.fecha_fin < self.fecha_inicio:
+            raise ValueError(f'Clase "{self.nombre}": rango de fechas inválido')
+
+        try:
+            self.numero_alumnos = int(datos.get('numero_alumnos') or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f'Clase "{self.nombre}": numero_alumnos debe ser un entero')
+        self.software = datos.get('software') or []
+        if isinstance(self.software, (str, int)):
+            self.software = [self.software]
+        self.laboratorio_fijo = datos.get('laboratorio')
+
+        # Se llenan en PlanificadorSemestre._candidatos
+        self.candidatos = []
+        self.motivo = ''
+
+    def se_traslapa(self, otra):
+        """Dos clases chocan si comparten día, se enciman en horario y en fechas."""
+        return (
+            self.inicio < otra.fin and otra.inicio < self.fin
+            and self.fecha_inicio <= otra.fecha_fin and otra.fecha_inicio <= self.fecha_fin
+            and not set(self.dias).isdisjoint(otra.dias)
+        )
+
+    def minutos_semanales(self):
+        return (self.fin - self.inicio) * len(self.dias)
+
+
+class PlanificadorSemestre:
+    """
+    Asigna laboratorios a un lote de clases semestrales.
+
+    Cada clase solo puede ir a laboratorios con suficientes PCs y con todo el
+    software requerido. Las reservas ya existentes cuentan como conflictos.
+    Se procesa primero la clase más restringida (menos laboratorios
+    candidatos, más horas semanales) y se elige el laboratorio más chico que
+    alcance (best-fit). Si ningún candidato está libre, se intenta reubicar
+    recursivamente las clases ya asignadas que estorban, con una profundidad
+    y un número de intentos acotados.
+    """
+
+    def __init__(self, clases, fecha_inicio=None, fecha_fin=None, profundidad=2, max_intentos=5000):
+        self.clases = [
+            ClaseSolicitada(i, datos, fecha_inicio, fecha_fin)
+            for i, datos in enumerate(clases)
+        ]
+        self.profundidad = profundidad
+        self.max_intentos = max_intentos
+        self.intentos = 0
+        self.asignacion = {}
+        # Movimientos (asignada, clase, laboratorio_id) para poder deshacer reubicaciones
+        self.bitacora = []
+        # laboratorio_id -> weekday -> [ClaseSolicitada]
+        self.ocupacion = {}
+
+    # ------------------------------------------------------------------
+    # Carga de datos (pocas consultas, todo lo demás en memoria)
+    # ------------------------------------------------------------------
+    def _cargar_laboratorios(self):
+        self.laboratorios = {
+            lab['id']: lab
+            for lab in Laboratorio.objects.annotate(num_pcs=Count('pc')).values('id', 'nombre', 'num_pcs')
+        }
+        self.ocupacion = {lab_id: {d: [] for d in range(7)} for lab_id in self.laboratorios}
+
+        self.software_por_nombre = {}
+        self.labs_por_software = {}
+        for software_id, nombre in Software.objects.values_list('id', 'nombre'):
+            self.software_por_nombre[nombre.lower()] = software_id
+            self.labs_por_software[software_id] = set()
+        for software_id, laboratorio_id in Software.laboratorios.through.objects.values_list('software_id', 'laboratorio_id'):
+            self.labs_por_software[software_id].add(laboratorio_id)
+
+    def _cargar_reservas_existentes(self):
+        """
+        Agrupa las reservas existentes del rango por (laboratorio, día de la
+        semana, horario) con la lista ordenada de fechas en que ocurren.
+        """
+        desde = min(c.fecha_inicio for c in self.clases)
+        hasta = max(c.fecha_fin for c in self.clases)
+        self.existentes = {}
+        reservas = ReservaClase.objects.filter(
+            fecha_hora_inicio__lt=timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min)),
+            fecha_hora_fin__gt=timezone.make_aware(datetime.combine(desde, time.min)),
+        ).values_list('laboratorio_id', 'fecha_hora_inicio', 'fecha_hora_fin')
+        for laboratorio_id, inicio, fin in reservas:
+            inicio = timezone.localtime(inicio)
+            fin = timezone.localtime(fin)
+            minutos_fin = _minutos(fin) if fin.date() == inicio.date() else 24 * 60
+            clave = (inicio.weekday(), _minutos(inicio), minutos_fin)
+            self.existentes.setdefault(laboratorio_id, {}).setdefault(clave, []).append(inicio.date())
+        for patrones in self.existentes.values():
+            for fechas in patrones.values():
+                fechas.sort()
+
+    def _choca_con_existentes(self, clase, laboratorio_id):
+        for (dia, inicio, fin), fechas in self.existentes.get(laboratorio_id, {}).items():
+            if dia in clase.dias and inicio < clase.fin and clase.inicio < fin:
+                i = bisect_left(fechas, clase.fecha_inicio)
+                if i < len(fechas) and fechas[i] <= clase.fecha_fin:
+                    return True
+        return False
+
+    def _candidatos(self, clase):
+        """Laboratorios que cumplen capacidad, software y no chocan con reservas existentes."""
+        candidatos = set(self.laboratorios)
+        if clase.laboratorio_fijo:
+            try:
+                laboratorio_id = int(clase.laboratorio_fijo)
+            except (TypeError, ValueError):
+                laboratorio_id = None
+            if laboratorio_id not in self.laboratorios:
+                clase.motivo = f'Laboratorio "{clase.laboratorio_fijo}" inexistente'
+                return []
+            candidatos = {laboratorio_id}
+
+        for software in clase.software:
+            software_id = software if isinstance(software, int) else self.software_por_nombre.get(str(software).lower())
+            if software_id not in self.labs_por_software:
+                clase.motivo = f'Software "{software}" no existe'
+                return []
+            candidatos &= self.labs_por_software[software_id]
+        if not candidatos:
+            clase.motivo = 'Ningún laboratorio tiene el software requerido'
+            return []
+
+        candidatos = {l for l in candidatos if self.laboratorios[l]['num_pcs'] >= clase.numero_alumnos}
+        if not candidatos:
+            clase.motivo = 'Ningún laboratorio tiene capacidad suficiente'
+            return []
+
+        libres = [l for l in candidatos if not self._choca_con_existentes(clase, l)]
+        if not libres:
+            clase.motivo = 'Todos los laboratorios candidatos están ocupados por reservas existentes'
+            return []
+
+        # Best-fit: primero el laboratorio más chico que alcance
+        return sorted(libres, key=lambda l: (self.laboratorios[l]['num_pcs'], self.laboratorios[l]['nombre']))
+
+    # ------------------------------------------------------------------
+    # Asignación
+    # ------------------------------------------------------------------
+    def _conflictos(self, clase, laboratorio_id):
+        vistos = {}
+        ocupacion = self.ocupacion[laboratorio_id]
+        for dia in clase.dias:
+            for otra in ocupacion[dia]:
+                if otra is not clase and clase.se_traslapa(otra):
+                    vistos[otra.indice] = otra
+        return list(vistos.values())
+
+    def _asignar(self, clase, laboratorio_id):
+        self.asignacion[clase.indice] = laboratorio_id
+        for dia in clase.dias:
+            self.ocupacion[laboratorio_id][dia].append(clase)
+        self.bitacora.append((True, clase, laboratorio_id))
+
+    def _liberar(self, clase):
+        laboratorio_id = self.asignacion.pop(clase.indice)
+        for dia in clase.dias:
+            self.ocupacion[laboratorio_id][dia].remove(clase)
+        self.bitacora.append((False, clase, laboratorio_id))
+
+    def _deshacer(self, marca):
+        """Revierte todos los movimientos registrados después de `marca`."""
+        while len(self.bitacora) > marca:
+            asignada, clase, laboratorio_id = self.bitacora.pop()
+            if asignada:
+                self.asignacion.pop(clase.indice)
+                for dia in clase.dias:
+                    self.ocupacion[laboratorio_id][dia].remove(clase)
+            else:
+                self.asignacion[clase.indice] = laboratorio_id
+                for dia in clase.dias:
+                    self.ocupacion[laboratorio_id][dia].append(clase)
+
+    def _colocar(self, clase, profundidad, bloqueadas):
+        """
+        Intenta colocar `clase`. Primero en un laboratorio libre; si no hay,
+        desplaza las clases que estorban y las recoloca recursivamente.
+        Deshace todos los cambios (incluidas las reubicaciones anidadas) si no lo logra.
+        """
+        for laboratorio_id in clase.candidatos:
+            if not self._conflictos(clase, laboratorio_id):
+                self._asignar(clase, laboratorio_id)
+                return True
+
+        if profundidad <= 0:
+            return False
+
+        bloqueadas = bloqueadas | {clase.indice}
+        for laboratorio_id in clase.candidatos:
+            if self.intentos >= self.max_intentos:
+                return False
+            self.intentos += 1
+
+            estorban = self._conflictos(clase, laboratorio_id)
+            if any(otra.indice in bloqueadas for otra in estorban):
+                continue
+
+            marca = len(self.bitacora)
+            for otra in estorban:
+                self._liberar(otra)
+            self._asignar(clase, laboratorio_id)
+
+            if all(self._colocar(otra, profundidad - 1, bloqueadas) for otra in estorban):
+                return True
+            self._deshacer(marca)
+
+        return False
+
+    def resolver(self):
+        """Calcula la asignación. Retorna (asignadas, sin_asignar)."""
+        self._cargar_laboratorios()
+        self._cargar_reservas_existentes()
+
+        for clase in self.clases:
+            clase.candidatos = self._candidatos(clase)
+
+        # Más restringida primero
+        orden = sorted(
+            self.clases,
+            key=lambda c: (len(c.candidatos), -c.minutos_semanales(), -c.numero_alumnos),
+        )
+        for clase in orden:
+            if clase.candidatos and not self._colocar(clase, self.profundidad, frozenset()):
+                clase.motivo = 'Choca con otras clases del lote en todos los laboratorios candidatos'
+
+        asignadas = [c for c in self.clases if c.indice in self.asignacion]
+        sin_asignar = [c for c in self.clases if c.indice not in self.asignacion]
+        return asignadas, sin_asignar
+
+    # ------------------------------------------------------------------
+    # Creación en bloque
+    # ------------------------------------------------------------------
+    def _fechas_clase(self, clase):
+        fecha = clase.fecha_inicio
+        while fecha <= clase.fecha_fin:
+            if fecha.weekday() in clase.dias:
+                yield fecha
+            fecha += timedelta(days=1)
+
+    def crear(self, asignadas):
+        """
+        Crea las series, sus días y todas las ocurrencias con bulk_create en
+        una sola transacción, y recalcula el estado de las PCs una sola vez
+        por laboratorio afectado. Retorna el número de ocurrencias creadas.
+        """
+        from .cache_respuestas import registrar_cambio
+        from .signals import actualizar_estados_pcs_laboratorio
+
+        dias_por_codigo = dict(DiaSemana.objects.values_list('codigo', 'id'))
+        faltantes = {codigo for clase in asignadas for codigo in clase.codigos_dias} - set(dias_por_codigo)
+        if faltantes:
+            raise ValueError(f'Faltan días de la semana en la base de datos: {", ".join(sorted(faltantes))}')
+
+        with transaction.atomic():
+            series = SerieReserva.objects.bulk_create([
+                SerieReserva(
+                    nombre=clase.nombre,
+                    laboratorio_id=self.asignacion[clase.indice],
+                    profesor=clase.datos.get('profesor') or '',
+                    materia=clase.datos.get('materia') or '',
+                    fecha_inicio=clase.fecha_inicio,
+                    fecha_fin=clase.fecha_fin,
+                    hora_inicio=clase.hora_inicio,
+                    hora_fin=clase.hora_fin,
+                    color=clase.datos.get('color') or '#667eea',
+                    carrera=clase.datos.get('carrera'),
+                    semestre=clase.datos.get('semestre'),
+                    numero_alumnos=clase.numero_alumnos or None,
+                )
+                for clase in asignadas
+            ])
+
+            DiasSerie = SerieReserva.dias_semana.through
+            DiasSerie.objects.bulk_create([
+                DiasSerie(seriereserva_id=serie.id, diasemana_id=dias_por_codigo[codigo])
+                for clase, serie in zip(asignadas, series)
+                for codigo in clase.codigos_dias
+            ])
+
+            ocurrencias = [
+                ReservaClase(
+                    serie_id=serie.id,
+                    laboratorio_id=serie.laboratorio_id,
+                    profesor=serie.profesor,
+                    materia=serie.materia,
+                    fecha_hora_inicio=timezone.make_aware(datetime.combine(fecha, clase.hora_inicio)),
+                    fecha_hora_fin=timezone.make_aware(datetime.combine(fecha, clase.hora_fin)),
+                    color=serie.color,
+                    carrera=serie.carrera,
+                    semestre=serie.semestre,
+                    numero_alumnos=serie.numero_alumnos,
+                )
+                for clase, serie in zip(asignadas, series)
+                for fecha in self._fechas_clase(clase)
+            ]
+            ReservaClase.objects.bulk_create(ocurrencias, batch_size=1000)
+
+        # bulk_create no dispara save() ni señales: actualizar PCs una vez por laboratorio
+        # y la versión de la caché de respuestas
+        if ocurrencias:
+            registrar_cambio('reservaclase', min(o.fecha_hora_inicio for o in ocurrencias))
+        for laboratorio in Laboratorio.objects.filter(id__in={s.laboratorio_id for s in series}):
+            actualizar_estados_pcs_laboratorio(laboratorio)
+
+        return len(ocurrencias)
+
+    def resumen(self, asignadas, sin_asignar):
+        """Resultado serializable a JSON."""
+        return {
+            'asignadas': [
+                {
+                    'nombre': clase.nombre,
+                    'laboratorio_id': self.asignacion[clase.indice],
+                    'laboratorio': self.laboratorios[self.asignacion[clase.indice]]['nombre'],
+                    'dias': ''.join(clase.codigos_dias),
+                    'hora_inicio': clase.hora_inicio.strftime('%H:%M'),
+                    'hora_fin': clase.hora_fin.strftime('%H:%M'),
+                    'numero_alumnos': clase.numero_alumnos,
+                    'pcs': self.laboratorios[self.asignacion[clase.indice]]['num_pcs'],
+                }
+                for clase in asignadas
+            ],
+            'sin_asignar': [
+                {'nombre': clase.nombre, 'motivo': clase.motivo}
+                for clase in sin_asignar
+            ],
+        }
+
+
+def planificar_semestre(datos, crear=True, profundidad=2):
+    """
+    Punto de entrada común para el comando y la API.
+
+    `datos` es un dict {"fecha_inicio", "fecha_fin", "clases": [...]} o
+    directamente la lista de clases (cada una con sus propias fechas).
+    """
+    if isinstance(datos, list):
+        datos = {'clases': datos}
+    if not isinstance(datos, dict):
+        raise ValueError('Debe enviar un objeto {"clases": [...]} o la lista de clases')
+    clases = datos.get('clases')
+    if not isinstance(clases, list) or not clases:
+        raise ValueError('Debe enviar una lista "clases" con al menos una clase')
+    try:
+        fecha_inicio = date.fromisoformat(datos['fecha_inicio']) if datos.get('fecha_inicio') else None
+        fecha_fin = date.fromisoformat(datos['fecha_fin']) if datos.get('fecha_fin') else None
+    except (TypeError, ValueError):
+        raise ValueError('fecha_inicio y fecha_fin deben tener formato YYYY-MM-DD')
+
+    planificador = PlanificadorSemestre(clases, fecha_inicio, fecha_fin, profundidad=profundidad)
+    asignadas, sin_asignar = planificador.resolver()
+    resultado = planificador.resumen(asignadas, sin_asignar)
+    resultado['ocurrencias_creadas'] = planificador.crear(asignadas) if crear and asignadas else 0
+    return resultado
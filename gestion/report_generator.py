@@ -15,8 +15,13 @@ import pandas as pd
 from datetime import datetime
 from django.utils import timezone
 from .models import Visita, Laboratorio, Software, Estudiante
-from django.db.models import Q, Count
+from .filtros import dias, fechas, q_visitas
+from .ocupacion import ocupacion
+from .estadisticas import (
+    mapa_de_calor, resumen_visitas, uso_por_laboratorio, uso_por_software, usuarios_mas_activos, visitas_por_dia_semana,
+)
 from django.conf import settings
+import logging
 import os
 try:
     from svglib.svglib import svg2rlg
@@ -24,6 +29,8 @@ try:
 except ImportError:
     SVG_SUPPORT = False
 
+logger = logging.getLogger(__name__)
+
 
 class ReportGenerator:
     def __init__(self):
@@ -132,6 +139,14 @@ class ReportGenerator:
         story.extend(self._create_charts_analysis(filters))
         story.append(PageBreak())
         
+        # Mapa de calor de ocupación por día y hora
+        story.extend(self._create_heatmap_section(filters))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Ocupación simultánea: picos y tiempo sobre el umbral
+        story.extend(self._create_occupancy_section(filters))
+        story.append(PageBreak())
+        
         # Tablas detalladas
         story.extend(self._create_detailed_tables(filters))
         story.append(PageBreak())
@@ -184,7 +199,7 @@ class ReportGenerator:
                     elements.append(Spacer(1, 0.3*inch))
             except Exception as e:
                 # Si falla, continuar sin logo
-                print(f"No se pudo cargar el logo SVG: {e}")
+                logger.warning('No se pudo cargar el logo SVG: %s', e)
                 elements.append(Spacer(1, 1.5*inch))
         else:
             elements.append(Spacer(1, 1.5*inch))
@@ -409,6 +424,121 @@ class ReportGenerator:
         
         return elements
 
+    def _create_heatmap_section(self, filters):
+        """Crear mapa de calor de ocupación promedio por día de la semana y hora"""
+        elements = []
+        
+        title = Paragraph("OCUPACIÓN POR DÍA Y HORA", self.styles['CustomSubtitle'])
+        elements.append(title)
+        
+        heatmap = self._get_heatmap_data(filters)
+        total = heatmap['total']
+        horas = [h for h in heatmap['horas'] if any(total['visitas'][d][h] or total['ocupacion'][d][h] for d in range(7))]
+        if not horas:
+            elements.append(Paragraph("No hay visitas en el período seleccionado.", self.styles['CustomNormal']))
+            return elements
+        horas = list(range(horas[0], horas[-1] + 1))
+        
+        elements.append(Paragraph(
+            f"Porcentaje promedio de PCs en uso al mismo tiempo ({total['pcs']} PCs), "
+            f"del {heatmap['desde']} al {heatmap['hasta']}. Cada celda es el promedio de los "
+            f"días de la semana correspondientes dentro del período.",
+            self.styles['CustomNormal']
+        ))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        data = [[''] + [f"{h:02d}" for h in horas]]
+        estilos = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#063579')),
+            ('BACKGROUND', (0, 1), (0, -1), colors.HexColor('#063579')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('TEXTCOLOR', (0, 1), (0, -1), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 7),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cbd5e1')),
+            ('LEFTPADDING', (0, 0), (-1, -1), 1),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 1),
+        ]
+        for fila, dia in enumerate(heatmap['dias'], start=1):
+            valores = [total['porcentaje'][fila - 1][h] for h in horas]
+            data.append([dia] + [f"{v:.0f}" for v in valores])
+            for columna, valor in enumerate(valores, start=1):
+                intensidad = min(valor / 100, 1)
+                # De blanco al azul institucional según el porcentaje de ocupación
+                color = colors.Color(1 - intensidad * 0.976, 1 - intensidad * 0.792, 1 - intensidad * 0.525)
+                estilos.append(('BACKGROUND', (columna, fila), (columna, fila), color))
+                if intensidad > 0.5:
+                    estilos.append(('TEXTCOLOR', (columna, fila), (columna, fila), colors.white))
+        
+        ancho_hora = min(0.4*inch, (6.3*inch) / len(horas))
+        heatmap_table = Table(data, colWidths=[0.6*inch] + [ancho_hora] * len(horas))
+        heatmap_table.setStyle(TableStyle(estilos))
+        elements.append(heatmap_table)
+        elements.append(Spacer(1, 0.3*inch))
+        
+        # Hora más concurrida
+        pico = max(
+            ((total['ocupacion'][d][h], d, h) for d in range(7) for h in horas),
+            default=(0, 0, 0)
+        )
+        if pico[0]:
+            elements.append(Paragraph(
+                f"<b>Hora más concurrida:</b> {heatmap['dias'][pico[1]]} {pico[2]:02d}:00, con "
+                f"{pico[0]:.1f} PCs en uso en promedio ({total['porcentaje'][pico[1]][pico[2]]:.0f}%).",
+                self.styles['CustomNormal']
+            ))
+        
+        return elements
+
+    def _create_occupancy_section(self, filters):
+        """Crear tabla de picos de ocupación y tiempo sobre el umbral por laboratorio"""
+        elements = []
+        
+        data_ocupacion = self._get_occupancy_data(filters)
+        labs = [lab for lab in data_ocupacion['laboratorios'] if lab['visitas']]
+        elements.append(Paragraph("Ocupación Simultánea", self.styles['CustomSubtitle']))
+        if not labs:
+            elements.append(Paragraph("No hay visitas en el período seleccionado.", self.styles['CustomNormal']))
+            return elements
+        
+        elements.append(Paragraph(
+            f"PCs en uso al mismo tiempo del {data_ocupacion['desde']} al {data_ocupacion['hasta']}. "
+            f"El umbral es el {data_ocupacion['umbral']}% de las PCs de cada laboratorio.",
+            self.styles['CustomNormal']
+        ))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        tabla = [['Laboratorio', 'PCs', 'Pico', 'Momento del pico', 'Promedio', 'Horas sobre umbral']]
+        for lab in labs + [{'nombre': 'Total', **data_ocupacion['total']}]:
+            pico_en = datetime.fromisoformat(lab['pico_en']).strftime('%Y-%m-%d %H:%M') if lab['pico_en'] else '-'
+            tabla.append([
+                lab['nombre'][:25],
+                f"{lab['pcs']}",
+                f"{lab['pico']}",
+                pico_en,
+                f"{lab['promedio']:.2f}",
+                f"{lab['minutos_sobre_umbral'] / 60:.1f}h",
+            ])
+        
+        ocupacion_table = Table(tabla, colWidths=[1.8*inch, 0.6*inch, 0.6*inch, 1.5*inch, 0.9*inch, 1.1*inch])
+        ocupacion_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#063579')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cbd5e1')),
+        ]))
+        elements.append(ocupacion_table)
+        
+        return elements
+
     def _create_detailed_tables(self, filters):
         """Crear tablas detalladas"""
         elements = []
@@ -551,18 +681,8 @@ class ReportGenerator:
     def _get_all_visits_for_pdf(self, filters):
         """Obtener todas las visitas para el PDF"""
         try:
-            filters_q = Q()
-            if filters.get('date_from'):
-                filters_q &= Q(fecha_hora_inicio__date__gte=filters['date_from'])
-            if filters.get('date_to'):
-                filters_q &= Q(fecha_hora_inicio__date__lte=filters['date_to'])
-            if filters.get('laboratory') and filters['laboratory'] != 'all':
-                filters_q &= Q(pc__laboratorio__id=filters['laboratory'])
-            if filters.get('software') and filters['software'] != 'all':
-                filters_q &= Q(software_utilizado__id=filters['software'])
-            
             # Obtener todas las visitas (sin límite para el PDF)
-            visitas = Visita.objects.filter(filters_q).select_related(
+            visitas = Visita.objects.filter(q_visitas(filters)).select_related(
                 'estudiante', 'pc__laboratorio', 'software_utilizado'
             ).order_by('-fecha_hora_inicio')
             
@@ -804,218 +924,57 @@ class ReportGenerator:
 
     # Métodos auxiliares para obtener datos
     def _get_filtered_stats(self, filters):
-        """Obtener estadísticas filtradas"""
-        from .views import api_reports_filtered_stats
-        from django.test import RequestFactory
-        
-        factory = RequestFactory()
-        request = factory.get('/api/reports/filtered-stats/', filters)
-        
-        # Simular la lógica de la API
-        filters_q = Q()
-        if filters.get('date_from'):
-            filters_q &= Q(fecha_hora_inicio__date__gte=filters['date_from'])
-        if filters.get('date_to'):
-            filters_q &= Q(fecha_hora_inicio__date__lte=filters['date_to'])
-        if filters.get('laboratory') and filters['laboratory'] != 'all':
-            filters_q &= Q(pc__laboratorio__id=filters['laboratory'])
-        if filters.get('software') and filters['software'] != 'all':
-            filters_q &= Q(software_utilizado__id=filters['software'])
-        
-        visitas_filtradas = Visita.objects.filter(filters_q)
-        total_visitas = visitas_filtradas.count()
+        """Obtener estadísticas filtradas (misma lógica que api_reports_filtered_stats)"""
+        resumen = resumen_visitas(q_visitas(filters))
+        total_visitas = resumen['total_visitas']
         
         # Promedio diario
-        if filters.get('date_from') and filters.get('date_to'):
-            from datetime import datetime
-            fecha_inicio = datetime.strptime(filters['date_from'], '%Y-%m-%d').date()
-            fecha_fin = datetime.strptime(filters['date_to'], '%Y-%m-%d').date()
-            dias = (fecha_fin - fecha_inicio).days + 1
-            promedio_diario = round(total_visitas / dias, 1) if dias > 0 else 0
-        else:
-            promedio_diario = 0
-        
-        # Tiempo total
-        visitas_completadas = visitas_filtradas.filter(fecha_hora_fin__isnull=False)
-        tiempo_total_horas = 0
-        for visita in visitas_completadas:
-            if visita.fecha_hora_fin and visita.fecha_hora_inicio:
-                diff = visita.fecha_hora_fin - visita.fecha_hora_inicio
-                tiempo_total_horas += diff.total_seconds() / 3600
-        
-        sesiones_unicas = visitas_filtradas.values('estudiante').distinct().count()
+        num_dias = dias(filters)
+        promedio_diario = round(total_visitas / num_dias, 1) if num_dias and num_dias > 0 else 0
         
         return {
             'total_visitas': total_visitas,
             'promedio_diario': promedio_diario,
-            'tiempo_total_horas': round(tiempo_total_horas, 1),
-            'sesiones_unicas': sesiones_unicas
+            'tiempo_total_horas': round(resumen['horas'], 1),
+            'sesiones_unicas': resumen['sesiones_unicas']
         }
 
     def _get_lab_usage_data(self, filters):
-        """Obtener datos de uso por laboratorio"""
-        from .views import api_reports_lab_usage
-        from django.test import RequestFactory
-        
-        factory = RequestFactory()
-        request = factory.get('/api/reports/lab-usage/', filters)
-        
-        # Simular la lógica de la API
-        filters_q = Q()
-        if filters.get('date_from'):
-            filters_q &= Q(fecha_hora_inicio__date__gte=filters['date_from'])
-        if filters.get('date_to'):
-            filters_q &= Q(fecha_hora_inicio__date__lte=filters['date_to'])
-        
-        if filters.get('laboratory') and filters['laboratory'] != 'all':
-            labs = Laboratorio.objects.filter(id=filters['laboratory'])
-        else:
-            labs = Laboratorio.objects.all()
-        
-        data = []
-        for lab in labs:
-            visitas = Visita.objects.filter(filters_q, pc__laboratorio=lab)
-            total_visitas = visitas.count()
-            
-            horas_totales = 0
-            for visita in visitas.filter(fecha_hora_fin__isnull=False):
-                if visita.fecha_hora_fin and visita.fecha_hora_inicio:
-                    diff = visita.fecha_hora_fin - visita.fecha_hora_inicio
-                    horas_totales += diff.total_seconds() / 3600
-            
-            data.append({
-                'name': lab.nombre,
-                'visitas': total_visitas,
-                'horas': round(horas_totales, 1)
-            })
-        
-        return data
+        """Obtener datos de uso por laboratorio (misma lógica que api_reports_lab_usage)"""
+        return uso_por_laboratorio(
+            q_visitas(filters, laboratorio=False, software=False),
+            filters.get('laboratory') or 'all'
+        )
 
     def _get_software_usage_data(self, filters):
-        """Obtener datos de uso de software"""
-        from .views import api_reports_software_usage
-        from django.test import RequestFactory
-        
-        factory = RequestFactory()
-        request = factory.get('/api/reports/software-usage/', filters)
-        
-        # Simular la lógica de la API
-        filters_q = Q()
-        if filters.get('date_from'):
-            filters_q &= Q(fecha_hora_inicio__date__gte=filters['date_from'])
-        if filters.get('date_to'):
-            filters_q &= Q(fecha_hora_inicio__date__lte=filters['date_to'])
-        
-        if filters.get('software') and filters['software'] != 'all':
-            software_list = Software.objects.filter(id=filters['software'])
-        else:
-            software_list = Software.objects.all()
-        
-        data = []
-        for soft in software_list:
-            usos = Visita.objects.filter(filters_q, software_utilizado=soft).count()
-            if usos > 0:
-                data.append({
-                    'name': soft.nombre,
-                    'value': usos
-                })
-        
-        return data
+        """Obtener datos de uso de software (misma lógica que api_reports_software_usage)"""
+        return uso_por_software(
+            q_visitas(filters, laboratorio=False, software=False),
+            filters.get('software') or 'all'
+        )
 
     def _get_daily_trend_data(self, filters):
-        """Obtener datos de tendencia diaria"""
-        from .views import api_reports_daily_trend
-        from django.test import RequestFactory
-        
-        factory = RequestFactory()
-        request = factory.get('/api/reports/daily-trend/', filters)
-        
-        # Simular la lógica de la API
-        filters_q = Q()
-        if filters.get('date_from'):
-            filters_q &= Q(fecha_hora_inicio__date__gte=filters['date_from'])
-        if filters.get('date_to'):
-            filters_q &= Q(fecha_hora_inicio__date__lte=filters['date_to'])
-        if filters.get('laboratory') and filters['laboratory'] != 'all':
-            filters_q &= Q(pc__laboratorio__id=filters['laboratory'])
-        
-        visitas_por_dia = Visita.objects.filter(filters_q).extra(
-            select={'day_of_week': 'extract(dow from fecha_hora_inicio)'}
-        ).values('day_of_week').annotate(
-            count=Count('id')
-        ).order_by('day_of_week')
-        
-        dias_semana = ['Dom', 'Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb']
-        
-        data = []
-        for item in visitas_por_dia:
-            dia_num = int(item['day_of_week'])
-            data.append({
-                'dia': dias_semana[dia_num],
-                'visitas': item['count']
-            })
-        
-        return data
+        """Obtener datos de tendencia diaria (misma lógica que api_reports_daily_trend)"""
+        return visitas_por_dia_semana(q_visitas(filters, software=False))
+
+    def _get_heatmap_data(self, filters):
+        """Obtener mapa de calor (misma lógica que api_reports_heatmap)"""
+        desde, hasta = fechas(filters)
+        return mapa_de_calor(
+            q_visitas(filters, laboratorio=False), desde, hasta, filters.get('laboratory') or 'all'
+        )
+
+    def _get_occupancy_data(self, filters):
+        """Obtener ocupación simultánea (misma lógica que api_reports_occupancy, sin las series)"""
+        return ocupacion(filters, incluir_series=False)
 
     def _get_top_users_data(self, filters):
-        """Obtener datos de usuarios más activos"""
-        from .views import api_reports_top_users
-        from django.test import RequestFactory
-        
-        factory = RequestFactory()
-        request = factory.get('/api/reports/top-users/', filters)
-        
-        # Simular la lógica de la API
-        filters_q = Q()
-        if filters.get('date_from'):
-            filters_q &= Q(fecha_hora_inicio__date__gte=filters['date_from'])
-        if filters.get('date_to'):
-            filters_q &= Q(fecha_hora_inicio__date__lte=filters['date_to'])
-        if filters.get('laboratory') and filters['laboratory'] != 'all':
-            filters_q &= Q(pc__laboratorio__id=filters['laboratory'])
-        if filters.get('software') and filters['software'] != 'all':
-            filters_q &= Q(software_utilizado__id=filters['software'])
-        
-        usuarios_stats = Visita.objects.filter(filters_q).values(
-            'estudiante__nombre_completo'
-        ).annotate(
-            total_visitas=Count('id')
-        ).order_by('-total_visitas')[:5]
-        
-        data = []
-        for usuario in usuarios_stats:
-            visitas_usuario = Visita.objects.filter(
-                filters_q, 
-                estudiante__nombre_completo=usuario['estudiante__nombre_completo']
-            ).filter(fecha_hora_fin__isnull=False)
-            
-            horas_totales = 0
-            for visita in visitas_usuario:
-                if visita.fecha_hora_fin and visita.fecha_hora_inicio:
-                    diff = visita.fecha_hora_fin - visita.fecha_hora_inicio
-                    horas_totales += diff.total_seconds() / 3600
-            
-            data.append({
-                'nombre': usuario['estudiante__nombre_completo'],
-                'visitas': usuario['total_visitas'],
-                'horas': round(horas_totales, 1)
-            })
-        
-        return data
+        """Obtener datos de usuarios más activos (misma lógica que api_reports_top_users)"""
+        return usuarios_mas_activos(q_visitas(filters))
 
     def _get_detailed_visits_data(self, filters):
         """Obtener datos detallados de visitas"""
-        filters_q = Q()
-        if filters.get('date_from'):
-            filters_q &= Q(fecha_hora_inicio__date__gte=filters['date_from'])
-        if filters.get('date_to'):
-            filters_q &= Q(fecha_hora_inicio__date__lte=filters['date_to'])
-        if filters.get('laboratory') and filters['laboratory'] != 'all':
-            filters_q &= Q(pc__laboratorio__id=filters['laboratory'])
-        if filters.get('software') and filters['software'] != 'all':
-            filters_q &= Q(software_utilizado__id=filters['software'])
-        
-        visitas = Visita.objects.filter(filters_q).select_related(
+        visitas = Visita.objects.filter(q_visitas(filters)).select_related(
             'estudiante', 'pc__laboratorio', 'software_utilizado'
         ).order_by('-fecha_hora_inicio')[:100]  # Limitar a 100 registros
         
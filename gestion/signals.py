@@ -1,6 +1,10 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from .models import ReservaClase, PC
+from .models import Carrera, Estudiante, Laboratorio, Mantenimiento, ReservaClase, PC, Software, Visita
+from .cache_respuestas import registrar_cambio
+from .utilizacion import invalidar_intervalo
+from .tokens import cache_tokens
+from django.conf import settings
 from django.utils import timezone
 
 @receiver(post_save, sender=ReservaClase)
@@ -32,4 +36,108 @@ def actualizar_estados_pcs_laboratorio(laboratorio):
         pcs_laboratorio.filter(estado='Disponible').update(estado='Reservada')
     else:
         # Si no hay reservas activas, marcar PCs reservadas como disponibles
-        pcs_laboratorio.filter(estado='Reservada').update(estado='Disponible')
\ No newline at end of file
+        pcs_laboratorio.filter(estado='Reservada').update(estado='Disponible')
+
+
+def actualizar_estados_pcs(using='default'):
+    """Igual que actualizar_estados_pcs_laboratorio pero para todos los laboratorios con dos UPDATE"""
+    now = timezone.now()
+    laboratorios_reservados = ReservaClase.objects.using(using).filter(
+        fecha_hora_inicio__lte=now,
+        fecha_hora_fin__gte=now
+    ).values('laboratorio_id')
+
+    pcs = PC.objects.using(using)
+    pcs.filter(estado='Disponible', laboratorio_id__in=laboratorios_reservados).update(estado='Reservada')
+    pcs.filter(estado='Reservada').exclude(laboratorio_id__in=laboratorios_reservados).update(estado='Disponible')
+
+def _intervalo(instance):
+    # __dict__ para no disparar una consulta si algún campo viene diferido
+    return instance.__dict__.get('fecha_hora_inicio'), instance.__dict__.get('fecha_hora_fin')
+
+@receiver(post_init, sender=Visita)
+@receiver(post_init, sender=ReservaClase)
+def recordar_intervalo(sender, instance, **kwargs):
+    instance._intervalo_guardado = _intervalo(instance)
+
+@receiver(post_save, sender=Visita)
+@receiver(post_delete, sender=Visita)
+@receiver(post_save, sender=ReservaClase)
+@receiver(post_delete, sender=ReservaClase)
+def invalidar_cubo_utilizacion(sender, instance, **kwargs):
+    """
+    Borra del cubo de utilización los días pasados que toca la visita o
+    reserva, antes y después de guardarla: mover una reserva del lunes
+    pasado al martes cambia los dos días (no hace consultas si es de hoy).
+    """
+    anterior, actual = instance._intervalo_guardado, _intervalo(instance)
+    if anterior[0] is not None and anterior != actual:
+        invalidar_intervalo(*anterior)
+    invalidar_intervalo(instance.fecha_hora_inicio, instance.fecha_hora_fin)
+
+@receiver(post_save, sender=Visita)
+@receiver(post_delete, sender=Visita)
+@receiver(post_save, sender=ReservaClase)
+@receiver(post_delete, sender=ReservaClase)
+def version_visitas_reservas(sender, instance, **kwargs):
+    """
+    Cambia la versión de la caché de respuestas; si solo toca hoy o el
+    futuro, no la de rangos cerrados. Cuenta el inicio anterior: mover una
+    reserva de la semana pasada a mañana cambia los rangos cerrados.
+    """
+    inicios = [inicio for inicio in (instance._intervalo_guardado[0], instance.fecha_hora_inicio) if inicio]
+    registrar_cambio(sender._meta.model_name, min(inicios) if inicios else None)
+
+@receiver(post_save, sender=Visita)
+@receiver(post_save, sender=ReservaClase)
+def actualizar_intervalo_guardado(sender, instance, **kwargs):
+    # Después de los receptores que comparan con el intervalo anterior
+    instance._intervalo_guardado = _intervalo(instance)
+
+@receiver(post_save, sender=Mantenimiento)
+@receiver(post_delete, sender=Mantenimiento)
+def version_mantenimientos(sender, instance, **kwargs):
+    registrar_cambio('mantenimiento', instance.fecha_inicio)
+
+@receiver(post_save, sender=Laboratorio)
+@receiver(post_delete, sender=Laboratorio)
+@receiver(post_save, sender=Software)
+@receiver(post_delete, sender=Software)
+@receiver(post_save, sender=Estudiante)
+@receiver(post_delete, sender=Estudiante)
+@receiver(post_save, sender=Carrera)
+@receiver(post_delete, sender=Carrera)
+def version_catalogos(sender, instance, **kwargs):
+    registrar_cambio(sender._meta.model_name)
+
+def _campos_pc(instance):
+    # __dict__ para no disparar una consulta si algún campo viene diferido
+    return tuple(instance.__dict__.get(campo) for campo in ('laboratorio_id', 'numero_pc', 'estado'))
+
+@receiver(post_init, sender=PC)
+def recordar_campos_pc(sender, instance, **kwargs):
+    instance._campos_guardados = _campos_pc(instance)
+
+@receiver(post_save, sender=PC)
+def version_pcs(sender, instance, created, **kwargs):
+    """
+    'pc' solo con altas y cambios de laboratorio o número: el estado cambia en
+    cada visita y los reportes no lo usan. 'estado_pc' (dashboard) con el estado.
+    """
+    anteriores, actuales = instance._campos_guardados, _campos_pc(instance)
+    if created or anteriores[:2] != actuales[:2]:
+        registrar_cambio('pc')
+    if created or anteriores[2] != actuales[2]:
+        registrar_cambio('estado_pc', timezone.now())
+    instance._campos_guardados = actuales
+
+@receiver(post_delete, sender=PC)
+def version_pcs_eliminadas(sender, instance, **kwargs):
+    registrar_cambio('pc')
+    registrar_cambio('estado_pc', timezone.now())
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidar_tokens_usuario(sender, instance, **kwargs):
+    """Olvida los tokens verificados del usuario (is_staff/is_active pudieron cambiar)"""
+    cache_tokens.invalidar_usuario(instance.pk)
@@ -1,3 +1,1367 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, time, timedelta
+from time import time_ns
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from sistema_labs.middleware import MedicionRendimientoMiddleware
+
+from .benchmark import Medidor, escenarios, escenarios_api
+from .cache_respuestas import MODELOS, versiones
+from .carga_masiva import leer_objetos_json
+from .consultas_lentas import capturar_plan, guardar_pendientes, huella, normalizar as normalizar_sql
+from .datos_sinteticos import generar_datos, limpiar_datos
+from .filtros import normalizar, q_visitas
+from .mantenimientos import abrir_mantenimientos, cerrar_mantenimientos, estadisticas_mantenimiento
+from .metricas import _proceso_vivo_windows, almacen
+from .particiones import archivar_visitas, sumar_meses
+from .planificacion import buscar_huecos, planificar_semestre
+from .models import (
+    ConsultaLenta, DiaSemana, Estudiante, Laboratorio, Mantenimiento, PC, ReservaClase, SerieReserva, Software,
+    UtilizacionHora, Visita,
+)
+from .tokens import _clave_revocado, cache_tokens, crear_token
+from .utilizacion import asegurar_cubo
+
+
+class AdminChangelistQueriesTest(TestCase):
+    """
+    Las páginas de lista del admin deben usar un número acotado de consultas:
+    al duplicar los registros mostrados el número de consultas no debe crecer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        cls.dias = [
+            DiaSemana.objects.create(codigo=codigo, nombre=nombre)
+            for codigo, nombre in [('L', 'Lunes'), ('M', 'Martes'), ('X', 'Miércoles'),
+                                   ('J', 'Jueves'), ('V', 'Viernes')]
+        ]
+        cls.software = [Software.objects.create(nombre=f'Software {i}') for i in range(3)]
+        cls.lotes = 0
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _crear_lote(self):
+        """Crea un laboratorio con PCs, software, serie con ocurrencias, estudiantes y visitas."""
+        n = AdminChangelistQueriesTest.lotes = AdminChangelistQueriesTest.lotes + 1
+        laboratorio = Laboratorio.objects.create(nombre=f'Laboratorio {n}')
+        for software in self.software:
+            software.laboratorios.add(laboratorio)
+        pcs = [PC.objects.create(numero_pc=i, laboratorio=laboratorio) for i in range(1, 4)]
+
+        serie = SerieReserva.objects.create(
+            nombre=f'Serie {n}', laboratorio=laboratorio,
+            fecha_inicio=date(2025, 1, 6), fecha_fin=date(2025, 1, 10),
+            hora_inicio=time(8), hora_fin=time(9),
+        )
+        serie.dias_semana.set(self.dias[::2])
+        for dia in range(3):
+            inicio = timezone.make_aware(timezone.datetime(2025, 1, 6 + dia, 8))
+            ReservaClase.objects.create(
+                serie=serie, laboratorio=laboratorio,
+                fecha_hora_inicio=inicio, fecha_hora_fin=inicio + timedelta(hours=1),
+            )
+
+        for i, pc in enumerate(pcs):
+            estudiante = Estudiante.objects.create(
+                id=f'{n}{i:05d}', nombre_completo=f'Estudiante {n}-{i}', correo=f'e{n}{i}@example.com',
+            )
+            Visita.objects.create(estudiante=estudiante, pc=pc, software_utilizado=self.software[i])
+            Visita.objects.create(
+                estudiante=estudiante, pc=pc, software_utilizado=self.software[0],
+                fecha_hora_fin=timezone.now(),
+            )
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas.captured_queries)
+
+    def assertConsultasAcotadas(self, url):
+        self._crear_lote()
+        antes = self._consultas(url)
+        for _ in range(3):
+            self._crear_lote()
+        self.assertEqual(self._consultas(url), antes)
+
+    def test_estudiante_changelist(self):
+        self.assertConsultasAcotadas('/admin/gestion/estudiante/')
+
+    def test_estudiante_changelist_ordenado_por_estadisticas(self):
+        self.assertConsultasAcotadas('/admin/gestion/estudiante/?o=5.-6.8')
+
+    def test_pc_changelist(self):
+        self.assertConsultasAcotadas('/admin/gestion/pc/')
+
+    def test_pc_changelist_filtrado_por_disponibilidad(self):
+        self.assertConsultasAcotadas('/admin/gestion/pc/?disponible=si')
+
+    def test_seriereserva_changelist(self):
+        self.assertConsultasAcotadas('/admin/gestion/seriereserva/')
+
+    def test_laboratorio_changelist(self):
+        self.assertConsultasAcotadas('/admin/gestion/laboratorio/')
+
+    def test_sesionactiva_changelist(self):
+        self.assertConsultasAcotadas('/admin/gestion/sesionactiva/')
+
+    def test_seriereserva_columnas(self):
+        self._crear_lote()
+        response = self.client.get('/admin/gestion/seriereserva/')
+        self.assertContains(response, 'Lunes, Miércoles, Viernes')
+        self.assertContains(response, '<td class="field-get_ocurrencias_count">3</td>', html=True)
+
+
+class TokenCacheTest(TestCase):
+    """admin_required_api no debe consultar al usuario en cada petición"""
+
+    url = '/api/reports/laboratories-list/'
+
+    def setUp(self):
+        cache.clear()
+        cache_tokens.limpiar()
+        self.usuario = User.objects.create_user('staff', password='x', is_staff=True)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {crear_token(self.usuario)}'}
+
+    def test_token_verificado_no_consulta_usuario(self):
+        self.assertEqual(self.client.get(self.url, **self.auth).status_code, 200)
+        with self.assertNumQueries(1):  # solo la consulta propia de la vista
+            self.assertEqual(self.client.get(self.url, **self.auth).status_code, 200)
+
+    def test_cambio_de_usuario_invalida_cache(self):
+        self.assertEqual(self.client.get(self.url, **self.auth).status_code, 200)
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertEqual(self.client.get(self.url, **self.auth).status_code, 401)
+
+    def test_token_revocado(self):
+        self.assertEqual(self.client.get(self.url, **self.auth).status_code, 200)
+        self.assertEqual(self.client.post('/api/admin/logout/', **self.auth).status_code, 200)
+        self.assertEqual(self.client.get(self.url, **self.auth).status_code, 401)
+
+    def test_token_revocado_en_otro_proceso(self):
+        self.assertEqual(self.client.get(self.url, **self.auth).status_code, 200)
+        # Otro worker atendió el logout: este proceso conserva el token en su LRU
+        cache.set(_clave_revocado(self.auth['HTTP_AUTHORIZATION'].split()[1]), True)
+        self.assertEqual(self.client.get(self.url, **self.auth).status_code, 401)
+
+
+
+class MedicionRendimientoTest(TestCase):
+    """MedicionRendimientoMiddleware: encabezado Server-Timing y registro de peticiones lentas"""
+
+    url = '/api/reports/laboratories-list/'
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {crear_token(self.usuario)}'}
+        Laboratorio.objects.create(nombre='Laboratorio A')
+
+    def _metricas(self, response):
+        return {metrica.split(';')[0]: metrica for metrica in response['Server-Timing'].split(', ')}
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url, **self.auth)
+        metricas = self._metricas(response)
+        self.assertEqual(set(metricas), {'db', 'app', 'total'})
+        self.assertIn(f'desc="{len(consultas.captured_queries)} consultas"', metricas['db'])
+        self.assertIn('desc="vista + JSON"', metricas['app'])
+        self.assertIn(f'desc="{len(response.content)} bytes"', metricas['total'])
+
+        self.client.force_login(self.usuario)
+        self.assertIn('render', self._metricas(self.client.get('/admin/gestion/laboratorio/')))
+
+    @override_settings(RENDIMIENTO_UMBRAL_LENTO_MS=0)
+    def test_registro_de_peticiones_lentas(self):
+        with self.assertLogs('sistema_labs.rendimiento', 'WARNING') as registro:
+            self.client.get(self.url, **self.auth)
+        self.assertIn(f'GET {self.url} -> 200', registro.output[0])
+        self.assertIn('gestion_laboratorio', registro.output[0])
+
+    @override_settings(RENDIMIENTO_SERVER_TIMING=False)
+    def test_server_timing_desactivado(self):
+        self.assertNotIn('Server-Timing', self.client.get(self.url, **self.auth))
+
+
+class ConsultasLentasTest(TestCase):
+    """Muestreo de consultas lentas: huellas, acumulado por forma de consulta, plan y admin"""
+
+    url = '/api/reports/laboratories-list/'
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {crear_token(self.usuario)}'}
+        Laboratorio.objects.create(nombre='Laboratorio A')
+
+    def test_huella_ignora_valores(self):
+        a = normalizar_sql("SELECT * FROM t WHERE id IN (%s, %s) AND nombre = 'x' LIMIT 21")
+        b = normalizar_sql("SELECT *\n FROM t WHERE id IN (%s, %s, %s) AND nombre = 'o''brien' LIMIT 5")
+        self.assertEqual(a, 'SELECT * FROM t WHERE id IN (...) AND nombre = ? LIMIT ?')
+        self.assertEqual(huella(a), huella(b))
+
+    @override_settings(CONSULTAS_LENTAS_UMBRAL_MS=0, CONSULTAS_LENTAS_MUESTREO=1.0)
+    def test_muestras_por_huella_con_plan(self):
+        self.client.get(self.url, **self.auth)
+        consulta = ConsultaLenta.objects.get(sql__contains='FROM "gestion_laboratorio"')
+        self.assertEqual(consulta.muestras, 1)
+        self.assertEqual(consulta.ruta, f'GET {self.url}')
+        self.assertRegex(consulta.plan, 'SCAN|SEARCH')
+
+        self.client.get(self.url, **self.auth)
+        consulta.refresh_from_db()
+        self.assertEqual(consulta.muestras, 2)
+        self.assertGreaterEqual(consulta.tiempo_total_ms, consulta.tiempo_max_ms)
+
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get('/admin/gestion/consultalenta/').status_code, 200)
+        self.assertEqual(self.client.get(f'/admin/gestion/consultalenta/{consulta.pk}/change/').status_code, 200)
+        self.assertEqual(self.client.get('/admin/gestion/consultalenta/add/').status_code, 403)
+
+    def test_desactivado(self):
+        self.client.get(self.url, **self.auth)
+        self.assertFalse(ConsultaLenta.objects.exists())
+
+    @override_settings(CONSULTAS_LENTAS_UMBRAL_MS=0, CONSULTAS_LENTAS_MUESTREO=1.0)
+    def test_se_guarda_despues_de_responder(self):
+        def vista(request):
+            list(Laboratorio.objects.all())
+            return HttpResponse()
+
+        MedicionRendimientoMiddleware(vista)(RequestFactory().get('/lenta/'))
+        self.assertFalse(ConsultaLenta.objects.exists())
+        # request_finished: el servidor ya envió la respuesta
+        guardar_pendientes(sender=None)
+        self.assertEqual(ConsultaLenta.objects.get().ruta, 'GET /lenta/')
+
+    def test_sin_plan_para_select_con_bloqueo(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(capturar_plan('SELECT id FROM gestion_pc WHERE id = %s FOR UPDATE', [1]), '')
+            self.assertEqual(capturar_plan('SELECT id FROM gestion_pc FOR NO KEY UPDATE SKIP LOCKED', []), '')
+            self.assertEqual(capturar_plan('select id from gestion_pc for share', []), '')
+        self.assertEqual(len(consultas), 0)
+
+
+class MetricasTest(TestCase):
+    """/metrics: histogramas sumados entre procesos, gauges y lista de IPs permitidas"""
+
+    def setUp(self):
+        cache.clear()
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(METRICAS_DIRECTORIO=directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        almacen.limpiar()
+        self.addCleanup(almacen.limpiar)
+        self.directorio = directorio
+
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {crear_token(usuario)}'}
+        laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        PC.objects.create(numero_pc=1, laboratorio=laboratorio)
+        PC.objects.create(numero_pc=2, laboratorio=laboratorio, estado='Mantenimiento')
+
+    def test_histogramas_y_gauges(self):
+        self.client.get('/api/reports/laboratories-list/', **self.auth)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = response.content.decode()
+        self.assertIn('# TYPE gestion_reporte_duracion_segundos histogram', texto)
+        self.assertIn('gestion_reporte_duracion_segundos_count{ruta="api_reports_laboratories_list"} 1', texto)
+        self.assertIn('gestion_reporte_duracion_segundos_bucket{ruta="api_reports_laboratories_list",le="+Inf"} 1', texto)
+        self.assertIn('gestion_consultas_por_peticion_count{ruta="api_reports_laboratories_list"} 1', texto)
+        self.assertIn('gestion_pcs{laboratorio="Laboratorio A",estado="Disponible"} 1', texto)
+        self.assertIn('gestion_pcs{laboratorio="Laboratorio A",estado="Mantenimiento"} 1', texto)
+        self.assertIn('gestion_sesiones_activas{laboratorio="Laboratorio A"} 0', texto)
+
+    def test_suma_los_archivos_de_otros_procesos(self):
+        # Histograma escrito por otro worker: 2 exportaciones PDF en el primer bucket
+        serie = [2] + [0] * 13 + [0.004]
+        with open(os.path.join(self.directorio, '99999_1.json'), 'w', encoding='utf-8') as archivo:
+            json.dump([['gestion_exportacion_duracion_segundos', [['formato', 'pdf']], serie]], archivo)
+        almacen.observar('gestion_exportacion_duracion_segundos', 3.0, formato='pdf')
+
+        texto = self.client.get('/metrics').content.decode()
+        self.assertIn('gestion_exportacion_duracion_segundos_bucket{formato="pdf",le="0.005"} 2', texto)
+        self.assertIn('gestion_exportacion_duracion_segundos_bucket{formato="pdf",le="5"} 3', texto)
+        self.assertIn('gestion_exportacion_duracion_segundos_count{formato="pdf"} 3', texto)
+        self.assertIn('gestion_exportacion_duracion_segundos_sum{formato="pdf"} 3.004', texto)
+
+    def test_fusiona_archivos_de_procesos_terminados(self):
+        serie = [1] + [0] * 13 + [0.002]
+        # 11111 terminó; 22222 sigue vivo y su archivo viejo es de un pid reutilizado
+        for archivo in ('11111_1.json', '22222_1.json', '22222_2.json'):
+            with open(os.path.join(self.directorio, archivo), 'w', encoding='utf-8') as salida:
+                json.dump([['gestion_exportacion_duracion_segundos', [['formato', 'pdf']], serie]], salida)
+
+        with mock.patch('gestion.metricas._proceso_vivo', lambda pid: pid != 11111):
+            for _ in range(2):
+                texto = self.client.get('/metrics').content.decode()
+                self.assertIn('gestion_exportacion_duracion_segundos_count{formato="pdf"} 3', texto)
+        restantes = set(os.listdir(self.directorio))
+        self.assertIn('agregado.json', restantes)
+        self.assertIn('22222_2.json', restantes)
+        self.assertFalse({'11111_1.json', '22222_1.json', 'agregado.lock'} & restantes)
+
+        # Un lector que ve el agregado nuevo ignora el archivo ya sumado aunque no se haya borrado
+        with open(os.path.join(self.directorio, 'agregado.json'), encoding='utf-8') as entrada:
+            agregado = json.load(entrada)
+        agregado['fusionados'].append('11111_1.json')
+        with open(os.path.join(self.directorio, 'agregado.json'), 'w', encoding='utf-8') as salida:
+            json.dump(agregado, salida)
+        with open(os.path.join(self.directorio, '11111_1.json'), 'w', encoding='utf-8') as salida:
+            json.dump([['gestion_exportacion_duracion_segundos', [['formato', 'pdf']], serie]], salida)
+        with mock.patch('gestion.metricas._proceso_vivo', lambda pid: pid != 11111):
+            texto = self.client.get('/metrics').content.decode()
+        self.assertIn('gestion_exportacion_duracion_segundos_count{formato="pdf"} 3', texto)
+        self.assertNotIn('11111_1.json', os.listdir(self.directorio))
+
+    def test_proceso_vivo_en_windows(self):
+        def kernel32(manejador, codigo=0):
+            falso = mock.Mock()
+            falso.OpenProcess.return_value = manejador
+
+            def salida(_, referencia):
+                referencia._obj.value = codigo
+                return 1
+
+            falso.GetExitCodeProcess.side_effect = salida
+            return falso
+
+        casos = [
+            (kernel32(None), 87, False),  # ERROR_INVALID_PARAMETER: el pid ya no existe
+            (kernel32(None), 5, True),  # ERROR_ACCESS_DENIED: proceso de otro usuario
+            (kernel32(42, codigo=259), 0, True),  # STILL_ACTIVE
+            (kernel32(42, codigo=1), 0, False),  # ya terminó, el manejador sigue abierto
+        ]
+        for falso, error, vivo in casos:
+            with mock.patch('ctypes.WinDLL', return_value=falso, create=True), \
+                    mock.patch('ctypes.get_last_error', return_value=error, create=True):
+                self.assertIs(_proceso_vivo_windows(12345), vivo)
+            if falso.OpenProcess.return_value:
+                falso.CloseHandle.assert_called_once_with(42)
+
+    def test_solo_ips_permitidas(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 403)
+        with override_settings(METRICAS_IPS_PERMITIDAS=['10.0.0.0/8']):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+
+class TransferDataTest(TestCase):
+    """transfer_data: ida y vuelta con reasignación de llaves y reanudación"""
+
+    def setUp(self):
+        laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        software = Software.objects.create(nombre='Python')
+        software.laboratorios.add(laboratorio)
+        dia = DiaSemana.objects.create(codigo='L', nombre='Lunes')
+        self.pcs = [PC.objects.create(numero_pc=i, laboratorio=laboratorio) for i in range(1, 4)]
+        serie = SerieReserva.objects.create(nombre='Redes', laboratorio=laboratorio)
+        serie.dias_semana.add(dia)
+        inicio = timezone.make_aware(timezone.datetime(2025, 1, 6, 8, 0, 0, 123456))
+        ReservaClase.objects.create(
+            serie=serie, laboratorio=laboratorio,
+            fecha_hora_inicio=inicio, fecha_hora_fin=inicio + timedelta(hours=1),
+        )
+        estudiante = Estudiante.objects.create(id='A001', nombre_completo='Ana', correo='ana@example.com')
+        for pc in self.pcs:
+            Visita.objects.create(estudiante=estudiante, pc=pc, software_utilizado=software)
+        Mantenimiento.objects.create(pc=self.pcs[0], fecha_inicio=inicio)
+        self.visitas_originales = sorted(
+            Visita.objects.values_list('pc__numero_pc', 'fecha_hora_inicio')
+        )
+
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+        call_command('transfer_data', 'export', self.directorio, bloque=2, hilos=1, verbosity=0)
+
+    def _importar(self):
+        call_command('transfer_data', 'import', self.directorio, lote=2, hilos=1, verbosity=0)
+
+    def test_ida_y_vuelta_con_ids_distintos(self):
+        Laboratorio.objects.all().delete()
+        Software.objects.all().delete()
+        Estudiante.objects.all().delete()
+        # El destino ya tiene el software con otro id: debe reutilizarse
+        Software.objects.create(nombre='Otro')
+        software = Software.objects.create(nombre='Python')
+
+        self._importar()
+
+        self.assertEqual(Software.objects.filter(nombre='Python').count(), 1)
+        self.assertEqual(PC.objects.count(), 3)
+        self.assertFalse(PC.objects.filter(id__in=[pc.id for pc in self.pcs]).exists())
+        self.assertEqual(
+            sorted(Visita.objects.values_list('pc__numero_pc', 'fecha_hora_inicio')),
+            self.visitas_originales,
+        )
+        self.assertEqual(Visita.objects.filter(software_utilizado=software).count(), 3)
+        reserva = ReservaClase.objects.select_related('serie', 'laboratorio').get()
+        self.assertEqual(reserva.serie.laboratorio, reserva.laboratorio)
+        self.assertEqual(reserva.fecha_hora_inicio.microsecond, 123456)
+        self.assertEqual(reserva.serie.get_dias_display(), 'Lunes')
+        self.assertEqual(list(software.laboratorios.values_list('nombre', flat=True)), ['Laboratorio A'])
+        self.assertEqual(Mantenimiento.objects.get().pc.numero_pc, 1)
+
+    def test_reanudar_no_duplica(self):
+        Laboratorio.objects.all().delete()
+        self._importar()
+        self._importar()
+        self.assertEqual(PC.objects.count(), 3)
+        self.assertEqual(Visita.objects.count(), 3)
+        self.assertTrue(os.path.exists(os.path.join(self.directorio, 'importacion.json')))
+
+
+class CargarFixtureTest(TestCase):
+    """cargar_fixture debe producir lo mismo que loaddata con pocas consultas"""
+
+    fixture = str(settings.BASE_DIR / 'datos_lab.json')
+
+    def test_lector_incremental(self):
+        elementos = [{'a': ']', 'b': [1, 2]}, 123456, 'x, y', [], {'c': {'d': None}}, True]
+        texto = json.dumps(elementos, indent=2)
+        for tamano in (1, 3, 7, 1 << 16):
+            self.assertEqual(list(leer_objetos_json(io.StringIO(texto), tamano_lectura=tamano)), elementos)
+        self.assertEqual(list(leer_objetos_json(io.StringIO(' [ ] '))), [])
+
+    def test_carga_datos_lab(self):
+        with CaptureQueriesContext(connection) as consultas:
+            call_command('cargar_fixture', self.fixture, verbosity=0)
+        self.assertLess(len(consultas.captured_queries), 50)
+
+        with open(self.fixture, encoding='utf-8-sig') as f:
+            objetos = json.load(f)
+        reservas = [o for o in objetos if o['model'] == 'gestion.reservaclase']
+        self.assertEqual(ReservaClase.objects.count(), len(reservas))
+        self.assertEqual(PC.objects.count(), sum(o['model'] == 'gestion.pc' for o in objetos))
+
+        serie = next(o for o in objetos if o['model'] == 'gestion.seriereserva')
+        cargada = SerieReserva.objects.get(pk=serie['pk'])
+        self.assertEqual(
+            sorted(cargada.dias_semana.values_list('pk', flat=True)), sorted(serie['fields']['dias_semana'])
+        )
+        self.assertEqual(cargada.creada_el, timezone.datetime.fromisoformat(serie['fields']['creada_el']))
+
+        # Volver a cargar actualiza en lugar de duplicar, como loaddata
+        call_command('cargar_fixture', self.fixture, verbosity=0)
+        self.assertEqual(ReservaClase.objects.count(), len(reservas))
+        self.assertEqual(cargada.dias_semana.count(), len(serie['fields']['dias_semana']))
+
+
+class ArchivarVisitasTest(TestCase):
+    """archivar_visitas (sin particiones en SQLite): exporta por mes y borra solo lo anterior al corte"""
+
+    def test_sumar_meses(self):
+        self.assertEqual(sumar_meses(date(2025, 12, 15), 1), timezone.make_aware(timezone.datetime(2026, 1, 1)))
+        self.assertEqual(sumar_meses(date(2025, 1, 31), -1), timezone.make_aware(timezone.datetime(2024, 12, 1)))
+
+    def test_archivar_meses_anteriores(self):
+        laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        pc = PC.objects.create(numero_pc=1, laboratorio=laboratorio)
+        estudiante = Estudiante.objects.create(id='A001', nombre_completo='Ana', correo='ana@example.com')
+        fechas = [(2025, 1, 31, 23, 59), (2025, 2, 1, 0, 0), (2025, 2, 20, 10, 0), (2025, 3, 1, 0, 0)]
+        for fecha in fechas:
+            visita = Visita.objects.create(estudiante=estudiante, pc=pc)
+            Visita.objects.filter(pk=visita.pk).update(
+                fecha_hora_inicio=timezone.make_aware(timezone.datetime(*fecha))
+            )
+
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        archivados = archivar_visitas(date(2025, 3, 10), directorio)
+
+        self.assertEqual([(f'{mes:%Y-%m}', filas) for mes, filas in archivados], [('2025-01', 1), ('2025-02', 2)])
+        self.assertEqual(Visita.objects.count(), 1)
+        with gzip.open(os.path.join(directorio, 'visitas_202502.ndjson.gz'), 'rt', encoding='utf-8') as f:
+            filas = [json.loads(linea) for linea in f]
+        self.assertEqual([fila['pc_id'] for fila in filas], [pc.id, pc.id])
+        self.assertEqual(archivar_visitas(date(2025, 3, 10), directorio), [])
+
+
+class FiltrosReporteTest(TestCase):
+    """gestion/filtros.py: rangos semiabiertos en hora local y normalización de parámetros"""
+
+    def test_rango_incluye_dias_completos_en_hora_local(self):
+        laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        pc = PC.objects.create(numero_pc=1, laboratorio=laboratorio)
+        estudiante = Estudiante.objects.create(id='A001', nombre_completo='Ana', correo='ana@example.com')
+        fechas = [(2025, 3, 9, 23, 59), (2025, 3, 10, 0, 0), (2025, 3, 12, 23, 59), (2025, 3, 13, 0, 0)]
+        for fecha in fechas:
+            visita = Visita.objects.create(estudiante=estudiante, pc=pc)
+            Visita.objects.filter(pk=visita.pk).update(
+                fecha_hora_inicio=timezone.make_aware(timezone.datetime(*fecha))
+            )
+
+        filtros = normalizar({'dateFrom': '2025-03-10', 'dateTo': '2025-03-12', 'laboratory': ''})
+        self.assertEqual(filtros['laboratory'], 'all')
+        visitas = Visita.objects.filter(q_visitas(filtros)).order_by('fecha_hora_inicio')
+        self.assertEqual(
+            [timezone.localtime(v.fecha_hora_inicio).strftime('%d %H:%M') for v in visitas],
+            ['10 00:00', '12 23:59'],
+        )
+
+    def test_periodo_predefinido(self):
+        filtros = normalizar({'period': 'monthly'}, expandir_periodo=True)
+        hoy = timezone.localdate()
+        self.assertEqual(filtros['date_to'], hoy.isoformat())
+        self.assertEqual(filtros['date_from'], (hoy - timedelta(days=30)).isoformat())
+        # Las APIs GET no interpretan period, como antes del compilador de filtros
+        self.assertIsNone(normalizar({'period': 'monthly'})['date_from'])
+
+    def test_semestre_invalido(self):
+        self.assertEqual(normalizar({'semestre': '3'})['semestre'], 3)
+        self.assertEqual(normalizar({'semestre': 'all'})['semestre'], 'all')
+        with self.assertRaisesMessage(ValueError, 'semestre'):
+            normalizar({'semestre': 'tercero'})
+
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        response = self.client.get('/api/reservations/stats/', {'semestre': 'tercero'},
+                                   HTTP_AUTHORIZATION=f'Token {crear_token(usuario)}')
+        self.assertEqual(response.status_code, 400)
+
+
+class MapaDeCalorTest(TestCase):
+    """api_reports_heatmap: visitas por hora de inicio y ocupación promedio al minuto"""
+
+    def test_ocupacion_por_dia_y_hora(self):
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        pc1 = PC.objects.create(numero_pc=1, laboratorio=laboratorio)
+        pc2 = PC.objects.create(numero_pc=2, laboratorio=laboratorio)
+        estudiante = Estudiante.objects.create(id='A001', nombre_completo='Ana', correo='ana@example.com')
+        # Lunes 10 y martes 11 de marzo de 2025; la última visita termina el miércoles
+        horarios = [
+            (pc1, (2025, 3, 10, 10, 30), (2025, 3, 10, 12, 15)),
+            (pc2, (2025, 3, 10, 10, 0), (2025, 3, 10, 10, 30)),
+            (pc1, (2025, 3, 11, 23, 30), (2025, 3, 12, 1, 0)),
+        ]
+        for pc, inicio, fin in horarios:
+            visita = Visita.objects.create(estudiante=estudiante, pc=pc)
+            Visita.objects.filter(pk=visita.pk).update(
+                fecha_hora_inicio=timezone.make_aware(timezone.datetime(*inicio)),
+                fecha_hora_fin=timezone.make_aware(timezone.datetime(*fin)),
+            )
+
+        response = self.client.get(
+            '/api/reports/heatmap/', {'date_from': '2025-03-10', 'date_to': '2025-03-16'},
+            HTTP_AUTHORIZATION=f'Token {crear_token(usuario)}',
+        )
+        data = response.json()['data']
+        lunes, martes, miercoles = 0, 1, 2
+        total = data['total']
+        self.assertEqual(total['pcs'], 2)
+        self.assertEqual(total['visitas'][lunes][10], 2)
+        self.assertEqual(total['ocupacion'][lunes][9:13], [0, 1.0, 1.0, 0.25])
+        self.assertEqual(total['porcentaje'][lunes][10], 50.0)
+        # Se corta a medianoche
+        self.assertEqual(total['ocupacion'][martes][23], 0.5)
+        self.assertEqual(sum(total['ocupacion'][miercoles]), 0)
+        self.assertEqual(data['laboratorios'][0]['visitas'], total['visitas'])
+
+    def test_error_con_la_convencion_de_reportes(self):
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        response = self.client.get('/api/reports/heatmap/', {'date_from': 'ayer'},
+                                   HTTP_AUTHORIZATION=f'Token {crear_token(usuario)}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('error', response.json())
+        self.assertEqual(response.json()['data'], {})
+
+
+class OcupacionTest(TestCase):
+    """api_reports_occupancy: barrido de eventos, picos y tiempo sobre el umbral"""
+
+    def test_series_pico_y_umbral(self):
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        pc1 = PC.objects.create(numero_pc=1, laboratorio=laboratorio)
+        pc2 = PC.objects.create(numero_pc=2, laboratorio=laboratorio)
+        estudiante = Estudiante.objects.create(id='A001', nombre_completo='Ana', correo='ana@example.com')
+        # pc2 se libera a las 10:30 justo cuando empieza pc1; la última visita termina fuera del rango
+        horarios = [
+            (pc1, (2025, 3, 10, 10, 30), (2025, 3, 10, 12, 15)),
+            (pc2, (2025, 3, 10, 10, 0), (2025, 3, 10, 10, 30)),
+            (pc1, (2025, 3, 11, 23, 30), (2025, 3, 12, 1, 0)),
+        ]
+        for pc, inicio, fin in horarios:
+            visita = Visita.objects.create(estudiante=estudiante, pc=pc)
+            Visita.objects.filter(pk=visita.pk).update(
+                fecha_hora_inicio=timezone.make_aware(timezone.datetime(*inicio)),
+                fecha_hora_fin=timezone.make_aware(timezone.datetime(*fin)),
+            )
+        token = f'Token {crear_token(usuario)}'
+
+        response = self.client.get(
+            '/api/reports/occupancy/', {'date_from': '2025-03-10', 'date_to': '2025-03-11', 'umbral': 50},
+            HTTP_AUTHORIZATION=token,
+        )
+        data = response.json()['data']
+        total = data['total']
+        self.assertEqual(len(data['tiempos']), 48)
+        self.assertEqual(data['tiempos'][10], timezone.make_aware(timezone.datetime(2025, 3, 10, 10)).isoformat())
+        self.assertEqual(total['promedio_serie'][9:13], [0, 1.0, 1.0, 0.25])
+        self.assertEqual(total['maximo_serie'][9:13], [0, 1, 1, 1])
+        self.assertEqual(total['promedio_serie'][47], 0.5)
+        # Los fines se cuentan antes que los inicios del mismo instante
+        self.assertEqual(total['pico'], 1)
+        self.assertEqual(total['pico_en'], data['tiempos'][10])
+        self.assertEqual(total['umbral_pcs'], 1)
+        self.assertEqual(total['minutos_sobre_umbral'], 30 + 105 + 30)
+        self.assertEqual(data['laboratorios'][0]['visitas'], 3)
+
+        response = self.client.get('/api/reports/occupancy/', {'resolucion': 7}, HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.status_code, 400)
+
+
+class UtilizacionTest(TestCase):
+    """api_reports_utilization: horas-PC de visitas y reservas, guardadas por día terminado"""
+
+    def test_cubo_por_hora_e_invalidacion(self):
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        pc1 = PC.objects.create(numero_pc=1, laboratorio=laboratorio)
+        pc2 = PC.objects.create(numero_pc=2, laboratorio=laboratorio)
+        estudiante = Estudiante.objects.create(id='A001', nombre_completo='Ana', correo='ana@example.com')
+
+        def local(*partes):
+            return timezone.make_aware(timezone.datetime(2025, 3, 10, *partes))
+
+        # Dos reservas traslapadas bloquean de 10:00 a 11:30
+        for inicio, fin in (((10, 0), (11, 0)), ((10, 30), (11, 30))):
+            ReservaClase.objects.create(laboratorio=laboratorio, fecha_hora_inicio=local(*inicio), fecha_hora_fin=local(*fin))
+        visitas = []
+        for pc, inicio, fin in ((pc1, (10, 30), (12, 15)), (pc2, (10, 0), (10, 30))):
+            visita = Visita.objects.create(estudiante=estudiante, pc=pc)
+            Visita.objects.filter(pk=visita.pk).update(fecha_hora_inicio=local(*inicio), fecha_hora_fin=local(*fin))
+            visitas.append(visita)
+
+        def consultar():
+            response = self.client.get(
+                '/api/reports/utilization/', {'date_from': '2025-03-10', 'date_to': '2025-03-10', 'agrupar': 'hora'},
+                HTTP_AUTHORIZATION=f'Token {crear_token(usuario)}',
+            )
+            return {fila['hora']: fila for fila in response.json()['data']['total']['detalle']}
+
+        horas = consultar()
+        self.assertEqual(UtilizacionHora.objects.count(), 24)
+        self.assertEqual(
+            [(horas[h]['horas_visitas'], horas[h]['horas_reservadas'], horas[h]['horas_libres']) for h in (9, 10, 11, 12)],
+            # En la hora 11 la visita de pc1 está media hora fuera de la reserva
+            [(0, 0, 2), (1.0, 2.0, 0), (1.0, 1.0, 0.5), (0.25, 0, 1.75)],
+        )
+        self.assertEqual(horas[10]['porcentaje_uso'], 100.0)
+
+        # Guardar una visita de un día terminado lo borra del cubo y se recalcula
+        visita = visitas[1]
+        visita.refresh_from_db()
+        visita.fecha_hora_fin = local(10, 15)
+        visita.save()
+        self.assertEqual(UtilizacionHora.objects.count(), 0)
+        self.assertEqual(consultar()[10]['horas_visitas'], 0.75)
+
+    def test_mover_reserva_invalida_ambos_dias(self):
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        PC.objects.create(numero_pc=1, laboratorio=laboratorio)
+        lunes = timezone.make_aware(timezone.datetime(2025, 3, 10, 10))
+        reserva = ReservaClase.objects.create(laboratorio=laboratorio, fecha_hora_inicio=lunes,
+                                              fecha_hora_fin=lunes + timedelta(hours=2))
+
+        def consultar():
+            response = self.client.get(
+                '/api/reports/utilization/', {'date_from': '2025-03-10', 'date_to': '2025-03-11'},
+                HTTP_AUTHORIZATION=f'Token {crear_token(usuario)}',
+            )
+            return {fila['fecha']: fila['horas_reservadas'] for fila in response.json()['data']['total']['detalle']}
+
+        self.assertEqual(consultar(), {'2025-03-10': 2.0, '2025-03-11': 0})
+        self.assertEqual(UtilizacionHora.objects.count(), 48)
+
+        reserva = ReservaClase.objects.get(pk=reserva.pk)
+        reserva.fecha_hora_inicio += timedelta(days=1)
+        reserva.fecha_hora_fin += timedelta(days=1)
+        reserva.save()
+        self.assertEqual(UtilizacionHora.objects.count(), 0)
+        self.assertEqual(consultar(), {'2025-03-10': 0, '2025-03-11': 2.0})
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'respuestas': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas_respuestas'},
+})
+class CacheRespuestasTest(TestCase):
+    """@cache_respuesta: claves por filtros normalizados y versión; los rangos cerrados no dependen de hoy"""
+
+    def setUp(self):
+        caches['respuestas'].clear()
+        almacen.limpiar()
+        self.addCleanup(almacen.limpiar)
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {crear_token(usuario)}'}
+        self.pc = PC.objects.create(numero_pc=1, laboratorio=Laboratorio.objects.create(nombre='Laboratorio A'))
+        self.estudiante = Estudiante.objects.create(id='A001', nombre_completo='Ana', correo='ana@example.com')
+        self.pasada = self._visita()
+        Visita.objects.filter(pk=self.pasada.pk).update(
+            fecha_hora_inicio=timezone.make_aware(timezone.datetime(2025, 3, 10, 10)),
+            fecha_hora_fin=timezone.make_aware(timezone.datetime(2025, 3, 10, 11)),
+        )
+
+    def _visita(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Visita.objects.create(estudiante=self.estudiante, pc=self.pc)
+
+    def _consultar(self, **params):
+        response = self.client.get('/api/reports/lab-usage/', params, **self.auth)
+        return response['X-Cache'], response.json()['data'][0]['visitas']
+
+    def test_versiones_por_alcance(self):
+        cerrado = {'date_from': '2025-03-10', 'date_to': '2025-03-10'}
+        self.assertEqual(self._consultar(**cerrado), ('MISS', 1))
+        # camelCase y snake_case normalizan a la misma clave
+        self.assertEqual(self._consultar(dateFrom='2025-03-10', dateTo='2025-03-10'), ('HIT', 1))
+
+        abierto = {'date_from': (timezone.localdate() - timedelta(days=30)).isoformat()}
+        self.assertEqual(self._consultar(**abierto), ('MISS', 0))
+        self.assertEqual(self._consultar(**abierto), ('HIT', 0))
+
+        # Una visita de hoy cambia los rangos abiertos pero no los cerrados
+        self._visita()
+        self.assertEqual(self._consultar(**abierto), ('MISS', 1))
+        self.assertEqual(self._consultar(**cerrado), ('HIT', 1))
+
+        # Guardar una visita de un día pasado sí invalida los rangos cerrados
+        self.pasada.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pasada.delete()
+        self.assertEqual(self._consultar(**cerrado), ('MISS', 0))
+
+        # Cambiar el estado de una PC no invalida; cambiarla de laboratorio sí
+        self.pc.refresh_from_db()
+        self.pc.estado = 'Mantenimiento'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pc.save()
+        self.assertEqual(self._consultar(**cerrado)[0], 'HIT')
+        self.pc.laboratorio = Laboratorio.objects.create(nombre='Laboratorio B')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pc.save()
+        self.assertEqual(self._consultar(**cerrado)[0], 'MISS')
+
+        conteo = almacen.valores[('gestion_cache_respuestas_total', (('resultado', 'hit'), ('ruta', 'api_reports_lab_usage')))]
+        self.assertEqual(conteo, [4])
+
+    def test_mover_visita_pasada_a_hoy_invalida_rangos_cerrados(self):
+        cerrado = {'date_from': '2025-03-10', 'date_to': '2025-03-10'}
+        self.assertEqual(self._consultar(**cerrado), ('MISS', 1))
+        visita = Visita.objects.get(pk=self.pasada.pk)
+        visita.fecha_hora_inicio = timezone.now()
+        visita.fecha_hora_fin = None
+        with self.captureOnCommitCallbacks(execute=True):
+            visita.save()
+        self.assertEqual(self._consultar(**cerrado), ('MISS', 0))
+
+    def test_usuarios_frecuentes_dependen_de_estudiantes(self):
+        params = {'date_from': '2025-03-10', 'date_to': '2025-03-10'}
+
+        def nombre():
+            response = self.client.get('/api/reports/top-users/', params, **self.auth)
+            return response['X-Cache'], response.json()['data'][0]['nombre']
+
+        self.assertEqual(nombre(), ('MISS', 'Ana'))
+        self.estudiante.nombre_completo = 'Ana María'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.estudiante.save()
+        self.assertEqual(nombre(), ('MISS', 'Ana María'))
+
+
+class DatosSinteticosTest(TestCase):
+    """generar_datos: datos reproducibles y coherentes; el benchmark no modifica los datos"""
+
+    fin = timezone.make_aware(timezone.datetime(2025, 3, 12, 12))
+
+    def _generar(self):
+        return generar_datos(laboratorios=2, pcs_por_laboratorio=5, estudiantes=50, visitas=2000,
+                             dias=30, series_por_laboratorio=3, semilla=7, fin=self.fin)
+
+    def _firma(self):
+        return list(Visita.objects.order_by('fecha_hora_inicio', 'pc__numero_pc', 'pc__laboratorio__nombre')
+                    .values_list('estudiante_id', 'pc__numero_pc', 'fecha_hora_inicio', 'fecha_hora_fin'))
+
+    def test_generacion_reproducible_y_sin_traslapes(self):
+        conteo = self._generar()
+        self.assertEqual(conteo['visitas'], Visita.objects.count())
+        self.assertEqual(conteo['ocurrencias'], ReservaClase.objects.count())
+        self.assertGreater(conteo['visitas'], 1500)
+
+        visitas = Visita.objects.order_by('pc_id', 'fecha_hora_inicio').values_list(
+            'pc_id', 'fecha_hora_inicio', 'fecha_hora_fin'
+        )
+        anterior = None
+        for visita in visitas:
+            if anterior and anterior[0] == visita[0]:
+                self.assertLessEqual(anterior[2], visita[1])
+            anterior = visita
+        activas = set(Visita.objects.filter(fecha_hora_fin__isnull=True).values_list('pc_id', flat=True))
+        self.assertEqual(activas, set(PC.objects.filter(estado='En Uso').values_list('id', flat=True)))
+
+        firma = self._firma()
+        call_command('generar_datos_sinteticos', '--limpiar', '--laboratorios', '2', '--pcs', '5',
+                     '--estudiantes', '50', '--visitas', '2000', '--dias', '30', '--series', '3',
+                     '--semilla', '7', '--fin', '2025-03-12', verbosity=0)
+        self.assertEqual(self._firma(), firma)
+
+    def test_escenarios_que_modifican_se_revierten(self):
+        self._generar()
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        medidor = Medidor(admin)
+        visitas = Visita.objects.count()
+        for escenario in escenarios_api():
+            if escenario.modifica:
+                estado, _, _, _ = medidor.peticion(escenario)
+                self.assertLess(estado, 400, escenario.nombre)
+        self.assertEqual(Visita.objects.count(), visitas)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'respuestas': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas_limpiar'},
+    })
+    def test_limpiar_datos_invalida_respuestas(self):
+        self._generar()
+        # El cubo de utilización apunta a los laboratorios que se borran
+        asegurar_cubo(date(2025, 3, 1), date(2025, 3, 10))
+        self.assertTrue(UtilizacionHora.objects.exists())
+        antes = versiones(MODELOS)
+        with self.captureOnCommitCallbacks(execute=True):
+            limpiar_datos()
+        self.assertFalse(Visita.objects.exists())
+        self.assertFalse(Laboratorio.objects.exists())
+        self.assertTrue(all(a != b for a, b in zip(antes, versiones(MODELOS))))
+
+
+class RegresionEndpointsTest(TestCase):
+    """
+    Todas las vistas de gestion/urls.py, las páginas de lista del admin, el
+    calendario y las exportaciones sobre datos sintéticos: el número de
+    consultas no debe crecer al agregar laboratorios, software, estudiantes y
+    visitas, y cada escenario debe responder dentro de su presupuesto.
+    """
+
+    # Presupuestos holgados (ms) para detectar regresiones graves, no para medir
+    PRESUPUESTO_MS = 1500
+    PRESUPUESTO_EXPORTACION_MS = 10000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        generar_datos(laboratorios=2, pcs_por_laboratorio=4, estudiantes=20, visitas=200, dias=30,
+                      series_por_laboratorio=2, mantenimientos_por_pc=1, semilla=1)
+
+    def setUp(self):
+        cache.clear()
+        self.medidor = Medidor(self.admin)
+
+    def _medir(self, lista):
+        return {escenario.nombre: self.medidor.medir(escenario, repeticiones=1) for escenario in lista}
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        lista = escenarios()
+        antes = self._medir(lista)
+
+        generar_datos(laboratorios=3, pcs_por_laboratorio=6, estudiantes=40, visitas=600, dias=30,
+                      series_por_laboratorio=3, mantenimientos_por_pc=2, semilla=2)
+        nuevos = Software.objects.bulk_create([Software(nombre=f'Software extra {i}') for i in range(3)])
+        for software in nuevos:
+            software.laboratorios.set(Laboratorio.objects.all())
+        despues = self._medir(lista)
+
+        for nombre, resultado in despues.items():
+            with self.subTest(escenario=nombre):
+                self.assertLess(resultado['estado'], 400)
+                self.assertEqual(resultado['consultas'], antes[nombre]['consultas'])
+                presupuesto = (self.PRESUPUESTO_EXPORTACION_MS if nombre.startswith('api_export')
+                               else self.PRESUPUESTO_MS)
+                self.assertLessEqual(resultado['mediana_ms'], presupuesto)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'respuestas': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas_condicional'},
+})
+class GetCondicionalTest(TestCase):
+    """@condicional: 304 sin consultar la base mientras las versiones no cambien"""
+
+    def setUp(self):
+        caches['respuestas'].clear()
+        self.pc = PC.objects.create(numero_pc=1, laboratorio=Laboratorio.objects.create(nombre='Laboratorio A'))
+        self.estudiante = Estudiante.objects.create(id='A001', nombre_completo='Ana', correo='ana@example.com')
+
+    def test_etag_y_304(self):
+        response = self.client.get('/api/dashboard/stats/')
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/dashboard/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        # Cambiar el estado de una PC cambia el ETag del dashboard
+        self.pc.estado = 'Mantenimiento'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pc.save()
+        response = self.client.get('/api/dashboard/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since_y_post(self):
+        self.client.get('/api/carreras/')
+        # Last-Modified se omite si el último cambio es del segundo en curso
+        caches['respuestas'].set_many({
+            'version:carrera:actual': time_ns() - 10**10, 'version:carrera:historico': time_ns() - 10**10,
+        }, None)
+        response = self.client.get('/api/carreras/')
+        ultima = response['Last-Modified']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/carreras/', HTTP_IF_MODIFIED_SINCE=ultima).status_code, 304)
+
+        # Crear una carrera por POST no pasa por condition() y cambia la versión
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/carreras/', json.dumps({'nombre': 'Física'}), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get('/api/carreras/', HTTP_IF_MODIFIED_SINCE=ultima)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['carreras'], ['Física'])
+
+
+class DashboardTest(TestCase):
+    """/api/dashboard/all/ devuelve lo mismo que las cinco APIs del dashboard"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_datos(laboratorios=3, pcs_por_laboratorio=4, estudiantes=30, visitas=400, dias=60,
+                      series_por_laboratorio=1, mantenimientos_por_pc=1, semilla=3)
+
+    def test_secciones_iguales_a_las_apis(self):
+        datos = self.client.get('/api/dashboard/all/').json()
+        rutas = {
+            'stats': '/api/dashboard/stats/',
+            'lab_usage': '/api/dashboard/lab-usage/',
+            'software_usage': '/api/dashboard/software-usage/',
+            'visits_timeline': '/api/dashboard/visits-timeline/',
+            'recent_visits': '/api/dashboard/recent-visits/',
+        }
+        for seccion, ruta in rutas.items():
+            with self.subTest(seccion=seccion):
+                esperado = self.client.get(ruta).json()
+                if seccion == 'lab_usage':
+                    # Los empates en visitas no tienen un orden definido
+                    clave = lambda fila: fila['laboratorio']
+                    self.assertEqual(sorted(datos[seccion]['data'], key=clave), sorted(esperado['data'], key=clave))
+                elif seccion == 'software_usage':
+                    # Con empates en el décimo lugar cualquiera de los empatados puede entrar
+                    obtenido, esperado = datos[seccion]['data'], esperado['data']
+                    self.assertEqual([fila['usos'] for fila in obtenido], [fila['usos'] for fila in esperado])
+                    corte = esperado[-1]['usos']
+                    clave = lambda fila: fila['software']
+                    self.assertEqual(sorted((f for f in obtenido if f['usos'] > corte), key=clave),
+                                     sorted((f for f in esperado if f['usos'] > corte), key=clave))
+                else:
+                    self.assertEqual(datos[seccion], esperado)
+        self.assertEqual(set(datos['duracion_ms']), {'ventana', *rutas, 'total'})
+
+
+class CalendarioIcsTest(TestCase):
+    """Calendarios .ics: RRULE con EXDATE para las series y 304 mientras nada cambie"""
+
+    def setUp(self):
+        self.laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        self.serie = SerieReserva.objects.create(
+            nombre='Redes', laboratorio=self.laboratorio,
+            fecha_inicio=date(2025, 1, 6), fecha_fin=date(2025, 1, 17),
+            hora_inicio=time(8), hora_fin=time(10),
+        )
+        self.serie.dias_semana.set([
+            DiaSemana.objects.create(codigo='L', nombre='Lunes'),
+            DiaSemana.objects.create(codigo='X', nombre='Miércoles'),
+        ])
+        # Lunes 6, miércoles 8 y miércoles 15; el lunes 13 no se creó
+        for dia in (6, 8, 15):
+            self._reserva(dia, serie=self.serie)
+        self.suelta = self._reserva(20, materia='Examen')
+
+    def _reserva(self, dia, **campos):
+        inicio = timezone.make_aware(timezone.datetime(2025, 1, dia, 8))
+        campos.setdefault('materia', 'Redes')
+        return ReservaClase.objects.create(
+            laboratorio=self.laboratorio, profesor='Pérez',
+            fecha_hora_inicio=inicio, fecha_hora_fin=inicio + timedelta(hours=2), **campos
+        )
+
+    def _ics(self, url, **encabezados):
+        response = self.client.get(url, **encabezados)
+        contenido = b''.join(response.streaming_content).decode('utf-8') if response.status_code == 200 else ''
+        return response, contenido.replace('\r\n ', '')
+
+    def test_rrule_y_exdate(self):
+        response, contenido = self._ics(f'/api/calendar/{self.laboratorio.id}.ics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'UID:serie-{self.serie.id}@edificio55', contenido)
+        self.assertIn('DTSTART;TZID=America/Mexico_City:20250106T080000', contenido)
+        self.assertIn('RRULE:FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20250117', contenido)
+        self.assertEqual(contenido.count('EXDATE'), 1)
+        self.assertIn('EXDATE;TZID=America/Mexico_City:20250113T080000', contenido)
+        # La reserva sin serie va como evento individual
+        self.assertIn(f'UID:reserva-{self.suelta.id}@edificio55', contenido)
+        self.assertEqual(contenido.count('BEGIN:VEVENT'), 2)
+
+        # Una ocurrencia editada a mano rompe el patrón: se publica ocurrencia por ocurrencia
+        ocurrencia = ReservaClase.objects.filter(serie=self.serie).last()
+        ocurrencia.materia = 'Redes (reposición)'
+        ocurrencia.save()
+        _, contenido = self._ics(f'/api/calendar/serie/{self.serie.id}.ics')
+        self.assertNotIn('RRULE', contenido)
+        self.assertEqual(contenido.count('BEGIN:VEVENT'), 3)
+
+    def test_304_y_cambios_que_invalidan(self):
+        url = f'/api/calendar/{self.laboratorio.id}.ics'
+        etag = self._ics(url)[0]['ETag']
+        self.assertEqual(self._ics(url, HTTP_IF_NONE_MATCH=etag)[0].status_code, 304)
+
+        # Renombrar el laboratorio cambia LOCATION
+        self.laboratorio.nombre = 'Laboratorio B'
+        self.laboratorio.save()
+        response, contenido = self._ics(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('LOCATION:Laboratorio B', contenido)
+
+        # La acción del admin que usa update() también cambia los ETag
+        url_serie = f'/api/calendar/serie/{self.serie.id}.ics'
+        etag, etag_serie = response['ETag'], self._ics(url_serie)[0]['ETag']
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.client.post('/admin/gestion/seriereserva/', {
+            'action': 'actualizar_colores_reservas', '_selected_action': [self.serie.id],
+        })
+        self.assertEqual(self._ics(url, HTTP_IF_NONE_MATCH=etag)[0].status_code, 200)
+        self.assertEqual(self._ics(url_serie, HTTP_IF_NONE_MATCH=etag_serie)[0].status_code, 200)
+
+
+class BuscarHuecosTest(TestCase):
+    """buscar_huecos: reservas traslapadas, PCs en mantenimiento y validación del rango"""
+
+    def setUp(self):
+        self.lab_a = Laboratorio.objects.create(nombre='Laboratorio A')
+        self.lab_b = Laboratorio.objects.create(nombre='Laboratorio B')
+        for numero in (1, 2):
+            PC.objects.create(numero_pc=numero, laboratorio=self.lab_a)
+        PC.objects.create(numero_pc=1, laboratorio=self.lab_b)
+        PC.objects.create(numero_pc=2, laboratorio=self.lab_b, estado='Mantenimiento')
+        # 8-10 y 9-11 se traslapan: el laboratorio A está ocupado de 8 a 11 y de 13 a 14
+        for inicio, fin in ((8, 10), (9, 11), (13, 14)):
+            ReservaClase.objects.create(laboratorio=self.lab_a, fecha_hora_inicio=self._hora(inicio),
+                                        fecha_hora_fin=self._hora(fin))
+
+    def _hora(self, hora, dia=6):
+        return timezone.make_aware(timezone.datetime(2025, 1, dia, hora))
+
+    def _huecos(self, **opciones):
+        # Lunes 6 de enero de 2025
+        return [
+            (hueco['laboratorio'], timezone.localtime(hueco['inicio']).hour,
+             timezone.localtime(hueco['disponible_hasta']).hour)
+            for hueco in buscar_huecos(timedelta(hours=1), date(2025, 1, 6), date(2025, 1, 6),
+                                       ahora=self._hora(0), **opciones)
+        ]
+
+    def test_reservas_traslapadas(self):
+        self.assertEqual(self._huecos(), [
+            ('Laboratorio A', 7, 8), ('Laboratorio B', 7, 21), ('Laboratorio A', 11, 13), ('Laboratorio A', 14, 21),
+        ])
+        self.assertEqual(self._huecos(limite=2), [('Laboratorio A', 7, 8), ('Laboratorio B', 7, 21)])
+
+    def test_pcs_en_mantenimiento_no_cuentan(self):
+        self.assertEqual({lab for lab, _, _ in self._huecos(min_pcs=2)}, {'Laboratorio A'})
+        self.assertEqual(self._huecos(min_pcs=3), [])
+
+    def test_rango_invalido(self):
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        auth = {'HTTP_AUTHORIZATION': f'Token {crear_token(usuario)}'}
+        for params in (
+            {'duracion': 60, 'date_from': '2025-01-10', 'date_to': '2025-01-06'},
+            {'duracion': 60, 'date_from': '2025-01-01', 'date_to': '2026-06-01'},
+            {'duracion': 60, 'date_from': '06/01/2025'},
+            {'duracion': 0},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get('/api/planificacion/huecos/', params, **auth)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class PlanificadorSemestreTest(TestCase):
+    """PlanificadorSemestre: capacidad, software, conflictos, reubicación y escritura todo o nada"""
+
+    def setUp(self):
+        for codigo, nombre in (('L', 'Lunes'), ('M', 'Martes'), ('X', 'Miércoles')):
+            DiaSemana.objects.create(codigo=codigo, nombre=nombre)
+        self.labs = {}
+        for nombre, pcs in (('Lab 1', 10), ('Lab 2', 10), ('Lab 3', 10), ('Lab 4', 30)):
+            self.labs[nombre] = Laboratorio.objects.create(nombre=nombre)
+            PC.objects.bulk_create([PC(numero_pc=n, laboratorio=self.labs[nombre]) for n in range(pcs)])
+        # Lab 1 tiene X y Y, Lab 2 solo X, Lab 3 solo Y; Lab 4 ninguno
+        Software.objects.create(nombre='X').laboratorios.set([self.labs['Lab 1'], self.labs['Lab 2']])
+        Software.objects.create(nombre='Y').laboratorios.set([self.labs['Lab 1'], self.labs['Lab 3']])
+        Software.objects.create(nombre='Z')
+
+    def _clase(self, nombre, **datos):
+        return {'nombre': nombre, 'dias': 'L', 'hora_inicio': '08:00', 'hora_fin': '09:00', **datos}
+
+    def _planificar(self, clases, crear=False):
+        resultado = planificar_semestre(
+            {'fecha_inicio': '2025-01-06', 'fecha_fin': '2025-01-31', 'clases': clases}, crear=crear,
+        )
+        asignadas = {clase['nombre']: clase['laboratorio'] for clase in resultado['asignadas']}
+        return asignadas, {clase['nombre']: clase['motivo'] for clase in resultado['sin_asignar']}, resultado
+
+    def test_capacidad_y_software(self):
+        asignadas, sin_asignar, _ = self._planificar([
+            self._clase('Grande', numero_alumnos=25),
+            self._clase('Enorme', numero_alumnos=31),
+            self._clase('Con X', software=['x'], dias='M'),
+            self._clase('Con Z', software=['Z']),
+            self._clase('Con W', software=['W']),
+            self._clase('Fija', laboratorio=999, dias='X'),
+        ])
+        self.assertEqual(asignadas, {'Grande': 'Lab 4', 'Con X': 'Lab 1'})
+        self.assertEqual(sin_asignar, {
+            'Enorme': 'Ningún laboratorio tiene capacidad suficiente',
+            'Con Z': 'Ningún laboratorio tiene el software requerido',
+            'Con W': 'Software "W" no existe',
+            'Fija': 'Laboratorio "999" inexistente',
+        })
+
+    def test_conflictos_con_reservas_existentes_y_del_lote(self):
+        inicio = timezone.make_aware(timezone.datetime(2025, 1, 13, 8, 30))
+        ReservaClase.objects.create(laboratorio=self.labs['Lab 4'], fecha_hora_inicio=inicio,
+                                    fecha_hora_fin=inicio + timedelta(hours=1))
+        asignadas, sin_asignar, _ = self._planificar([
+            self._clase('Reservada', numero_alumnos=20),
+            self._clase('Con X 1', software=['X']),
+            self._clase('Con X 2', software=['X']),
+            self._clase('Con X 3', software=['X']),
+        ])
+        self.assertEqual(asignadas, {'Con X 1': 'Lab 1', 'Con X 2': 'Lab 2'})
+        self.assertEqual(sin_asignar, {
+            'Reservada': 'Todos los laboratorios candidatos están ocupados por reservas existentes',
+            'Con X 3': 'Choca con otras clases del lote en todos los laboratorios candidatos',
+        })
+
+    def test_reubicacion(self):
+        # "Larga" (más minutos) va primero al Lab 1; "Y 2" solo cabe si "Larga" se mueve al Lab 2
+        asignadas, sin_asignar, _ = self._planificar([
+            self._clase('Larga', software=['X'], hora_fin='10:00'),
+            self._clase('Y 1', software=['Y']),
+            self._clase('Y 2', software=['Y']),
+        ])
+        self.assertEqual(sin_asignar, {})
+        self.assertEqual(asignadas, {'Larga': 'Lab 2', 'Y 1': 'Lab 3', 'Y 2': 'Lab 1'})
+
+    def test_creacion_todo_o_nada(self):
+        clases = [self._clase('Redes', software=['X'], dias='LX'), self._clase('Grande', numero_alumnos=25)]
+        with mock.patch.object(ReservaClase.objects, 'bulk_create', side_effect=DatabaseError('falla')):
+            with self.assertRaises(DatabaseError):
+                self._planificar(clases, crear=True)
+        self.assertFalse(SerieReserva.objects.exists())
+
+        _, _, resultado = self._planificar(clases, crear=True)
+        # Enero 2025 del 6 al 31: 4 lunes y 4 miércoles para Redes, 4 lunes para Grande
+        self.assertEqual(resultado['ocurrencias_creadas'], 12)
+        redes = SerieReserva.objects.get(nombre='Redes')
+        self.assertEqual(sorted(redes.get_dias_codigos()), ['L', 'X'])
+        self.assertEqual(redes.ocurrencias.count(), 8)
+
+    def test_entrada_que_no_es_objeto(self):
+        for datos in ([1, 2], {'clases': [1]}, 5, [self._clase('Redes', numero_alumnos=[30])]):
+            with self.subTest(datos=datos), self.assertRaises(ValueError):
+                planificar_semestre(datos, crear=False)
+
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        response = self.client.post('/api/planificacion/semestre/', json.dumps({'clases': ['Redes']}),
+                                    content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Token {crear_token(usuario)}')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Clase #1', response.json()['error'])
+
+
+class PanelVespertinoSesionesTest(TestCase):
+    """Panel vespertino: finalizar sesiones libera las PCs; ?since devuelve solo los cambios"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        self.lab_a = Laboratorio.objects.create(nombre='Laboratorio A')
+        self.lab_b = Laboratorio.objects.create(nombre='Laboratorio B')
+        self.pc1, self.pc2 = [PC.objects.create(numero_pc=n, laboratorio=self.lab_a, estado='En Uso') for n in (1, 2)]
+        self.pc3 = PC.objects.create(numero_pc=1, laboratorio=self.lab_b, estado='En Uso')
+        self.estudiante = Estudiante.objects.create(id='A001', nombre_completo='Ana', correo='ana@example.com')
+        # La PC 2 tiene dos sesiones activas
+        self.v1, self.v2, self.v2_bis, self.v3 = [
+            Visita.objects.create(estudiante=self.estudiante, pc=pc) for pc in (self.pc1, self.pc2, self.pc2, self.pc3)
+        ]
+
+    def _post(self, url, datos):
+        return self.client.post(url, json.dumps(datos), content_type='application/json')
+
+    def _estados(self):
+        return dict(PC.objects.values_list('id', 'estado'))
+
+    def test_finalizar_una_sesion(self):
+        response = self._post('/panel-vespertino/api/finalizar-sesion/', {'visita_id': self.v1.id})
+        self.assertTrue(response.json()['success'])
+        self.v1.refresh_from_db()
+        self.assertIsNotNone(self.v1.fecha_hora_fin)
+        self.assertEqual(self._estados()[self.pc1.id], 'Disponible')
+
+        # La PC sigue en uso mientras tenga otra sesión activa
+        self._post('/panel-vespertino/api/finalizar-sesion/', {'visita_id': self.v2.id})
+        self.assertEqual(self._estados()[self.pc2.id], 'En Uso')
+
+        # Finalizar dos veces la misma sesión responde 404
+        response = self._post('/panel-vespertino/api/finalizar-sesion/', {'visita_id': self.v1.id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_finalizar_sesiones_del_laboratorio(self):
+        response = self._post('/panel-vespertino/api/finalizar-sesiones-lab/', {'laboratorio_id': self.lab_a.id})
+        self.assertEqual(response.json()['count'], 3)
+        self.assertFalse(Visita.objects.filter(pc__laboratorio=self.lab_a, fecha_hora_fin__isnull=True).exists())
+        estados = self._estados()
+        self.assertEqual((estados[self.pc1.id], estados[self.pc2.id]), ('Disponible', 'Disponible'))
+        # El otro laboratorio no cambia
+        self.assertEqual(estados[self.pc3.id], 'En Uso')
+        self.assertTrue(Visita.objects.filter(pk=self.v3.pk, fecha_hora_fin__isnull=True).exists())
+
+    def test_since(self):
+        url = '/panel-vespertino/api/sesiones-activas/'
+        datos = self.client.get(url).json()
+        self.assertEqual(datos['total'], 4)
+
+        self._post('/panel-vespertino/api/finalizar-sesion/', {'visita_id': self.v1.id})
+        nueva = Visita.objects.create(estudiante=self.estudiante, pc=self.pc1)
+        cambios = self.client.get(url, {'since': datos['hora_servidor']}).json()
+        self.assertEqual([sesion['id'] for sesion in cambios['sesiones']], [nueva.id])
+        self.assertEqual(cambios['finalizadas'], [self.v1.id])
+        self.assertEqual(cambios['total'], 4)
+
+        self.assertEqual(self.client.get(url, {'since': 'ayer'}).status_code, 400)
+
+
+class MantenimientosMasivosTest(TestCase):
+    """abrir_mantenimientos / cerrar_mantenimientos: PCs con uno activo, estados y conteos"""
+
+    def setUp(self):
+        laboratorio = Laboratorio.objects.create(nombre='Laboratorio A')
+        self.pcs = [PC.objects.create(numero_pc=n, laboratorio=laboratorio) for n in range(1, 5)]
+        self.pcs[1].estado = 'En Uso'
+        self.pcs[1].save()
+        # La PC 1 ya tiene un mantenimiento activo
+        abrir_mantenimientos(PC.objects.filter(id=self.pcs[0].id), descripcion='Previo')
+
+    def _estados(self):
+        return list(PC.objects.order_by('numero_pc').values_list('estado', flat=True))
+
+    def test_abrir_y_cerrar(self):
+        seleccion = PC.objects.filter(id__in=[pc.id for pc in self.pcs[:3]])
+        creados, omitidas = abrir_mantenimientos(seleccion, descripcion='Limpieza')
+        self.assertEqual((len(creados), omitidas), (2, 1))
+        self.assertEqual(Mantenimiento.objects.filter(fecha_fin__isnull=True).count(), 3)
+        self.assertEqual(Mantenimiento.objects.filter(descripcion='Limpieza').count(), 2)
+        self.assertEqual(self._estados(), ['Mantenimiento', 'Mantenimiento', 'Mantenimiento', 'Disponible'])
+
+        # El queryset depende del estado que se actualiza: se materializa antes
+        finalizados = cerrar_mantenimientos(PC.objects.filter(estado='Mantenimiento'))
+        self.assertEqual(finalizados, 3)
+        self.assertFalse(Mantenimiento.objects.filter(fecha_fin__isnull=True).exists())
+        self.assertEqual(self._estados(), ['Disponible'] * 4)
+
+        # Sin mantenimientos activos no hay nada que cerrar ni estados que cambiar
+        self.assertEqual(cerrar_mantenimientos(PC.objects.all()), 0)
+        self.assertEqual(self._estados(), ['Disponible'] * 4)
+
+
+class EstadisticasMantenimientoTest(TestCase):
+    """estadisticas_mantenimiento: MTTR, MTBM y tiempo fuera de servicio con valores conocidos"""
+
+    def setUp(self):
+        lab_a = Laboratorio.objects.create(nombre='Laboratorio A')
+        lab_b = Laboratorio.objects.create(nombre='Laboratorio B')
+        self.pc1, self.pc2, _ = [PC.objects.create(numero_pc=n, laboratorio=lab_a) for n in (1, 2, 3)]
+        self.pc3 = PC.objects.create(numero_pc=1, laboratorio=lab_b)
+
+        def mantenimiento(pc, inicio, horas=None):
+            inicio = timezone.make_aware(inicio)
+            Mantenimiento.objects.create(pc=pc, fecha_inicio=inicio,
+                                         fecha_fin=inicio + timedelta(hours=horas) if horas else None)
+
+        dt = timezone.datetime
+        mantenimiento(self.pc1, dt(2024, 12, 20), 5)      # fuera del rango
+        mantenimiento(self.pc1, dt(2025, 1, 1), 4)
+        mantenimiento(self.pc1, dt(2025, 1, 11), 2)
+        mantenimiento(self.pc1, dt(2025, 1, 16))          # activo: cuenta hasta el fin del rango (16 días)
+        mantenimiento(self.pc2, dt(2025, 1, 5, 10), 1)
+        mantenimiento(self.pc3, dt(2025, 1, 2), 6)
+        mantenimiento(self.pc3, dt(2025, 1, 3), 6)
+
+    def test_indicadores(self):
+        datos = estadisticas_mantenimiento(date(2025, 1, 1), date(2025, 1, 31))
+        self.assertEqual(datos['resumen'], {
+            'mantenimientos': 6, 'activos': 1, 'mttr_horas': 3.8, 'horas_fuera_servicio': 403.0, 'mtbm_dias': 5.33,
+        })
+
+        por_pc = [
+            (pc['pc'], pc['mantenimientos'], pc['activo'], pc['mttr_horas'], pc['horas_fuera_servicio'],
+             pc['mtbm_dias'], pc['ultimo_intervalo_dias'])
+            for pc in datos['por_pc']
+        ]
+        self.assertEqual(por_pc, [
+            ('A1', 3, True, 3.0, 390.0, 7.5, 5.0),
+            ('B1', 2, False, 6.0, 12.0, 1.0, 1.0),
+            ('A2', 1, False, 1.0, 1.0, None, None),
+        ])
+
+        laboratorios = [
+            (lab['laboratorio'], lab['mantenimientos'], lab['mttr_horas'], lab['mtbm_dias'], lab['pcs'],
+             lab['pcs_con_mantenimiento'], lab['mantenimientos_por_pc'])
+            for lab in datos['por_laboratorio']
+        ]
+        self.assertEqual(laboratorios, [
+            ('Laboratorio A', 4, 2.33, 7.5, 3, 2, 1.33),
+            ('Laboratorio B', 2, 6.0, 1.0, 1, 1, 2.0),
+        ])
+
+    def test_limit(self):
+        usuario = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        auth = {'HTTP_AUTHORIZATION': f'Token {crear_token(usuario)}'}
+        url = '/api/reports/maintenance/'
+        params = {'date_from': '2025-01-01', 'date_to': '2025-01-31'}
+        datos = self.client.get(url, {**params, 'limit': 1}, **auth).json()
+        self.assertEqual((datos['total_pcs'], [pc['pc'] for pc in datos['por_pc']]), (3, ['A1']))
+        for limite in (0, -1):
+            self.assertEqual(self.client.get(url, {**params, 'limit': limite}, **auth).status_code, 400)
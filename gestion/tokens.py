@@ -0,0 +1,127 @@
+"""
+Verificación de tokens de administrador con caché en memoria.
+
+Cada llamada a las APIs de reportes valida el token firmado y busca al
+usuario staff. Como el panel de reportes dispara varias llamadas por cada
+cambio de filtro, se guarda el usuario ya verificado en un LRU acotado con
+TTL corto:
+
+- el LRU es por proceso; el TTL acota cuánto tarda otro proceso en ver un
+  cambio de is_staff/is_active (en el proceso que guarda al usuario la
+  invalidación es inmediata vía señal, ver signals.py)
+- la lista de tokens revocados vive en la caché de Django, compartida
+  entre procesos si el backend lo es, y se consulta también en los aciertos
+  del LRU: revocar_token solo limpia el LRU del proceso que atiende el
+  logout y los demás deben dejar de aceptar el token de inmediato
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+
+ADMIN_TOKEN_MAX_AGE = 60 * 60 * 8  # 8 horas
+
+# Segundos que un token verificado se considera válido sin volver a consultar la BD
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_MAX_ENTRADAS = 512
+
+_PREFIJO_REVOCADO = 'token_revocado:'
+
+
+class CacheTokens:
+    """LRU acotado con expiración: token -> (expira_en, usuario)."""
+
+    def __init__(self, max_entradas=TOKEN_CACHE_MAX_ENTRADAS, ttl=TOKEN_CACHE_TTL):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, token):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(token)
+            if entrada is None or entrada[0] <= ahora:
+                if entrada is not None:
+                    del self._entradas[token]
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(token)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, token, usuario, ttl):
+        with self._lock:
+            self._entradas[token] = (time.monotonic() + ttl, usuario)
+            self._entradas.move_to_end(token)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def quitar(self, token):
+        with self._lock:
+            self._entradas.pop(token, None)
+
+    def invalidar_usuario(self, user_id):
+        with self._lock:
+            for token in [t for t, (_, u) in self._entradas.items() if u.pk == user_id]:
+                del self._entradas[token]
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_tokens = CacheTokens()
+
+
+def _clave_revocado(token):
+    return _PREFIJO_REVOCADO + hashlib.sha256(token.encode()).hexdigest()
+
+
+def _segundos_restantes(token):
+    """Segundos de vida que le quedan a un token ya verificado (firma timestamp)."""
+    emitido = signing.b62_decode(token.rsplit(':', 2)[-2])
+    return ADMIN_TOKEN_MAX_AGE - (time.time() - emitido)
+
+
+def crear_token(user):
+    return signing.dumps({'user_id': user.id, 'username': user.username})
+
+
+def revocar_token(token):
+    """Invalida un token antes de su expiración (p. ej. al cerrar sesión)."""
+    cache_tokens.quitar(token)
+    cache.set(_clave_revocado(token), True, ADMIN_TOKEN_MAX_AGE)
+
+
+def usuario_de_token(token):
+    """
+    Retorna el usuario staff activo dueño del token, o None.
+    Lanza BadSignature / SignatureExpired si el token no es válido.
+    """
+    usuario = cache_tokens.obtener(token)
+    if usuario is not None:
+        if cache.get(_clave_revocado(token)):
+            cache_tokens.quitar(token)
+            return None
+        return usuario
+
+    payload = signing.loads(token, max_age=ADMIN_TOKEN_MAX_AGE)
+    if cache.get(_clave_revocado(token)):
+        return None
+
+    usuario = get_user_model().objects.filter(
+        id=payload.get('user_id'), is_staff=True, is_active=True
+    ).first()
+    if usuario is not None:
+        # No guardar más allá de la expiración del propio token
+        ttl = min(cache_tokens.ttl, _segundos_restantes(token))
+        if ttl > 0:
+            cache_tokens.guardar(token, usuario, ttl)
+    return usuario
@@ -4,6 +4,11 @@ from django.contrib.auth import views as auth_views
 from . import views
 from . import views_reservations
 from . import views_panel_vespertino
+from . import views_calendario
+from . import views_planificacion
+from . import views_mantenimientos
+from . import views_metricas
+from . import views_utilizacion
 
 urlpatterns = [
     path('', views.pagina_registro, name='registro'),
@@ -18,6 +23,7 @@ urlpatterns = [
     # APIs de autenticación para reportes
     path('api/admin/login/', views.api_admin_login, name='api_admin_login'),
     path('api/admin/verify/', views.api_admin_verify, name='api_admin_verify'),
+    path('api/admin/logout/', views.api_admin_logout, name='api_admin_logout'),
     
     # APIs para dashboard React
     path('api/dashboard/stats/', views.api_dashboard_stats, name='api_dashboard_stats'),
@@ -25,6 +31,7 @@ urlpatterns = [
     path('api/dashboard/software-usage/', views.api_software_usage, name='api_software_usage'),
     path('api/dashboard/visits-timeline/', views.api_visits_timeline, name='api_visits_timeline'),
     path('api/dashboard/recent-visits/', views.api_recent_visits, name='api_recent_visits'),
+    path('api/dashboard/all/', views.api_dashboard_all, name='api_dashboard_all'),
     
     # APIs para reportes filtrados
     path('api/reports/filtered-stats/', views.api_reports_filtered_stats, name='api_reports_filtered_stats'),
@@ -32,8 +39,12 @@ urlpatterns = [
     path('api/reports/software-usage/', views.api_reports_software_usage, name='api_reports_software_usage'),
     path('api/reports/daily-trend/', views.api_reports_daily_trend, name='api_reports_daily_trend'),
     path('api/reports/top-users/', views.api_reports_top_users, name='api_reports_top_users'),
+    path('api/reports/heatmap/', views.api_reports_heatmap, name='api_reports_heatmap'),
+    path('api/reports/occupancy/', views.api_reports_occupancy, name='api_reports_occupancy'),
+    path('api/reports/utilization/', views_utilizacion.api_reports_utilization, name='api_reports_utilization'),
     path('api/reports/laboratories-list/', views.api_reports_laboratories_list, name='api_reports_laboratories_list'),
     path('api/reports/software-list/', views.api_reports_software_list, name='api_reports_software_list'),
+    path('api/reports/maintenance/', views_mantenimientos.api_reports_maintenance, name='api_reports_maintenance'),
     
     # APIs para exportación
     path('api/export/pdf/', views.api_export_pdf, name='api_export_pdf'),
@@ -49,6 +60,17 @@ urlpatterns = [
     path('api/reservations/list-semestres/', views_reservations.api_reservations_list_semestres, name='api_reservations_list_semestres'),
     path('api/reservations/list-laboratorios/', views_reservations.api_reservations_list_laboratorios, name='api_reservations_list_laboratorios'),
     
+    # Calendarios iCalendar (suscripción)
+    path('api/calendar/<int:laboratorio_id>.ics', views_calendario.api_calendario_laboratorio, name='api_calendario_laboratorio'),
+    path('api/calendar/serie/<int:serie_id>.ics', views_calendario.api_calendario_serie, name='api_calendario_serie'),
+    
+    # Planificación de laboratorios
+    path('api/planificacion/huecos/', views_planificacion.api_buscar_huecos, name='api_buscar_huecos'),
+    path('api/planificacion/semestre/', views_planificacion.api_planificar_semestre, name='api_planificar_semestre'),
+    
+    # Métricas para Prometheus
+    path('metrics', views_metricas.metricas, name='metricas'),
+    
     # Panel Vespertino
     path('panel-vespertino/', views_panel_vespertino.panel_vespertino_home, name='panel_vespertino_home'),
     path('panel-vespertino/login/', auth_views.LoginView.as_view(template_name='panel_vespertino/login.html'), name='panel_vespertino_login'),
@@ -62,4 +84,6 @@ urlpatterns = [
     path('panel-vespertino/api/finalizar-sesiones-lab/', views_panel_vespertino.api_finalizar_sesiones_laboratorio, name='api_finalizar_sesiones_lab'),
     path('panel-vespertino/api/pcs-laboratorio/', views_panel_vespertino.api_obtener_pcs_laboratorio, name='api_pcs_laboratorio'),
     path('panel-vespertino/api/registrar-mantenimiento/', views_panel_vespertino.api_registrar_mantenimiento, name='api_registrar_mantenimiento'),
+    path('panel-vespertino/api/mantenimientos/abrir/', views_panel_vespertino.api_abrir_mantenimientos, name='api_abrir_mantenimientos'),
+    path('panel-vespertino/api/mantenimientos/cerrar/', views_panel_vespertino.api_cerrar_mantenimientos, name='api_cerrar_mantenimientos'),
 ]
\ No newline at end of file
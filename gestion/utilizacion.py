@@ -0,0 +1,228 @@
+"""
+Cubo de utilización de los laboratorios por (laboratorio, fecha, hora local).
+
+Un laboratorio se ocupa de dos formas: visitas individuales (una PC cada
+una) y reservas de clase (el laboratorio completo). Para cada hora se
+calculan horas-PC:
+
+- horas_visitas: tiempo de las visitas dentro de la hora;
+- horas_reservadas: PCs del laboratorio x tiempo cubierto por al menos una
+  reserva (dos reservas traslapadas no bloquean doble);
+- horas_libres: capacidad (PCs x duración de la hora) menos lo reservado y
+  las visitas fuera de reserva, para no descontar dos veces a los alumnos
+  de una clase que además registran visita.
+
+Visitas y reservas se leen una sola vez para todo el rango y se procesan con
+el barrido de gestion/ocupacion.py: las horas de cada hora son la diferencia
+de la integral de la ocupación entre sus bordes.
+
+Los días terminados se guardan en UtilizacionHora la primera vez que se
+piden y después solo se leen; el día en curso y los futuros se calculan en
+cada consulta. Guardar o eliminar una visita o reserva de días pasados con
+save()/delete() borra esos días del cubo (gestion/signals.py). Los cambios
+masivos (update, bulk_create, cargar_fixture, generar_datos_sinteticos) no
+pasan por las señales: después de ellos hay que correr
+`python manage.py calcular_utilizacion --recalcular`.
+"""
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .filtros import inicio_del_dia
+from .models import Laboratorio, ReservaClase, UtilizacionHora
+from .ocupacion import Epoch, area, barrido, cargar_visitas, nivel_en
+
+AGRUPACIONES = ('fecha', 'hora', 'total')
+CAMPOS = ('horas_visitas', 'horas_reservadas', 'horas_libres', 'horas_capacidad')
+
+
+def _dias(desde, hasta):
+    return [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+
+def _bordes(dias):
+    """Inicio de cada hora local de los días (y el fin del último) en segundos desde 1970."""
+    bordes = [
+        int(timezone.make_aware(datetime.combine(dia, time(hora))).timestamp())
+        for dia in dias for hora in range(24)
+    ]
+    bordes.append(int(inicio_del_dia(dias[-1] + timedelta(days=1)).timestamp()))
+    return np.array(bordes, np.int64)
+
+
+def _horas(tiempos, nivel, bordes):
+    return np.diff(area(tiempos, nivel, bordes)) / 3600
+
+
+def cargar_reservas(inicio, fin):
+    """(laboratorios, inicios, fines) int64 de las reservas que se traslapan con [inicio, fin), recortadas."""
+    filas = ReservaClase.objects.filter(
+        fecha_hora_inicio__lt=fin, fecha_hora_fin__gt=inicio,
+    ).values_list('laboratorio_id', Epoch('fecha_hora_inicio'), Epoch('fecha_hora_fin')).order_by()
+    datos = np.array(list(filas), dtype=np.int64).reshape(-1, 3)
+    laboratorios = datos[:, 0]
+    inicios = np.maximum(datos[:, 1], int(inicio.timestamp()))
+    fines = np.minimum(datos[:, 2], int(fin.timestamp()))
+    validas = inicios < fines
+    return laboratorios[validas], inicios[validas], fines[validas]
+
+
+def calcular(desde, hasta, laboratorios=None):
+    """
+    Filas del cubo de desde..hasta (dicts con los campos de UtilizacionHora)
+    para cada laboratorio, 24 por día. `laboratorios` debe venir anotado con
+    pcs; por defecto son todos.
+    """
+    if laboratorios is None:
+        laboratorios = Laboratorio.objects.annotate(pcs=Count('pc'))
+    dias = _dias(desde, hasta)
+    bordes = _bordes(dias)
+    duracion = np.diff(bordes) / 3600
+    inicio, fin = inicio_del_dia(desde), inicio_del_dia(hasta + timedelta(days=1))
+    labs_visitas, inicios_visitas, fines_visitas = cargar_visitas({}, inicio, fin)
+    labs_reservas, inicios_reservas, fines_reservas = cargar_reservas(inicio, fin)
+
+    filas = []
+    for lab in laboratorios:
+        del_lab = labs_visitas == lab.id
+        tiempos_v, nivel_v = barrido(inicios_visitas[del_lab], fines_visitas[del_lab])
+        del_lab = labs_reservas == lab.id
+        tiempos_r, nivel_r = barrido(inicios_reservas[del_lab], fines_reservas[del_lab])
+        bloqueado = np.minimum(nivel_r, 1)
+
+        visitas = _horas(tiempos_v, nivel_v, bordes)
+        reservado = _horas(tiempos_r, bloqueado, bordes)
+        # Visitas fuera de reserva: ocupación x (1 - bloqueado) sobre los eventos de ambas
+        tiempos = np.union1d(tiempos_v, tiempos_r)
+        fuera = _horas(tiempos, nivel_en(tiempos_v, nivel_v, tiempos) * (1 - nivel_en(tiempos_r, bloqueado, tiempos)), bordes)
+        libres = np.maximum(lab.pcs * (duracion - reservado) - fuera, 0)
+
+        for i, (visitas_h, reservado_h, libres_h) in enumerate(zip(visitas.tolist(), reservado.tolist(), libres.tolist())):
+            filas.append({
+                'laboratorio_id': lab.id,
+                'fecha': dias[i // 24],
+                'hora': i % 24,
+                'pcs': lab.pcs,
+                'horas_visitas': round(visitas_h, 4),
+                'horas_reservadas': round(lab.pcs * reservado_h, 4),
+                'horas_libres': round(libres_h, 4),
+            })
+    return filas
+
+
+def asegurar_cubo(desde, hasta):
+    """
+    Calcula y guarda en UtilizacionHora los días terminados de desde..hasta
+    que falten. Devuelve cuántos días se calcularon.
+    """
+    ultimo = min(hasta, timezone.localdate() - timedelta(days=1))
+    if desde > ultimo:
+        return 0
+    guardados = set(
+        UtilizacionHora.objects.filter(fecha__range=(desde, ultimo)).values_list('fecha', flat=True).distinct()
+    )
+    faltantes = [dia for dia in _dias(desde, ultimo) if dia not in guardados]
+    if not faltantes:
+        return 0
+    # Una sola carga desde el primer hasta el último día faltante
+    faltan = set(faltantes)
+    UtilizacionHora.objects.bulk_create(
+        [UtilizacionHora(**fila) for fila in calcular(faltantes[0], faltantes[-1]) if fila['fecha'] in faltan],
+        batch_size=2000, ignore_conflicts=True,
+    )
+    return len(faltantes)
+
+
+def invalidar(desde, hasta):
+    """Borra del cubo los días desde..hasta; se recalculan en la siguiente consulta."""
+    return UtilizacionHora.objects.filter(fecha__range=(desde, hasta)).delete()[0]
+
+
+def invalidar_intervalo(inicio, fin=None):
+    """invalidar() de los días terminados que toca [inicio, fin] (fin None: sigue en curso)."""
+    ayer = timezone.localdate() - timedelta(days=1)
+    desde = timezone.localdate(inicio)
+    if desde > ayer:
+        return 0
+    hasta = min(timezone.localdate(fin), ayer) if fin else ayer
+    return invalidar(desde, hasta)
+
+
+def utilizacion(desde, hasta, laboratorio='all', agrupar='fecha'):
+    """
+    Horas-PC de visitas, reservas y libres de cada laboratorio y del total
+    entre desde y hasta, por fecha, por hora del día o solo el total del
+    rango. horas_capacidad es PCs x horas y porcentaje_uso la parte de la
+    capacidad que no quedó libre.
+    """
+    if agrupar not in AGRUPACIONES:
+        raise ValueError(f'agrupar debe ser uno de {", ".join(AGRUPACIONES)}')
+    if hasta < desde:
+        raise ValueError('date_from debe ser anterior a date_to')
+
+    laboratorios = Laboratorio.objects.annotate(pcs=Count('pc')).order_by('nombre')
+    if laboratorio != 'all':
+        laboratorios = laboratorios.filter(id=laboratorio)
+    laboratorios = list(laboratorios)
+    clave = (lambda fila: None) if agrupar == 'total' else (lambda fila: fila[agrupar])
+    acumulado = {}
+
+    def sumar(lab_id, grupo, valores):
+        total = acumulado.setdefault((lab_id, grupo), [0.0] * len(CAMPOS))
+        for i, valor in enumerate(valores):
+            total[i] += valor or 0
+
+    # Días terminados: del cubo guardado, agregados en la base
+    hoy = timezone.localdate()
+    asegurar_cubo(desde, hasta)
+    if desde < hoy:
+        guardadas = UtilizacionHora.objects.filter(
+            fecha__range=(desde, min(hasta, hoy - timedelta(days=1))),
+            laboratorio__in=laboratorios,
+        ).values('laboratorio_id', *([agrupar] if agrupar != 'total' else [])).annotate(
+            visitas=Sum('horas_visitas'), reservadas=Sum('horas_reservadas'),
+            libres=Sum('horas_libres'), capacidad=Sum('pcs'),
+        ).order_by()
+        for fila in guardadas:
+            sumar(fila['laboratorio_id'], clave(fila),
+                  (fila['visitas'], fila['reservadas'], fila['libres'], fila['capacidad']))
+
+    # Día en curso y futuros: se calculan al momento
+    if hasta >= hoy:
+        for fila in calcular(max(desde, hoy), hasta, laboratorios):
+            sumar(fila['laboratorio_id'], clave(fila),
+                  (fila['horas_visitas'], fila['horas_reservadas'], fila['horas_libres'], fila['pcs']))
+
+    def resultado(valores):
+        datos = dict(zip(CAMPOS, (round(valor, 2) for valor in valores)))
+        capacidad = valores[3]
+        datos['porcentaje_uso'] = round((capacidad - valores[2]) / capacidad * 100, 1) if capacidad else 0
+        return datos
+
+    def agrupado(ids):
+        grupos = {}
+        for (lab_id, grupo), valores in acumulado.items():
+            if lab_id in ids:
+                total = grupos.setdefault(grupo, [0.0] * len(CAMPOS))
+                for i, valor in enumerate(valores):
+                    total[i] += valor
+        total = [sum(valores[i] for valores in grupos.values()) for i in range(len(CAMPOS))]
+        datos = {'pcs': sum(lab.pcs for lab in laboratorios if lab.id in ids), **resultado(total)}
+        if agrupar != 'total':
+            datos['detalle'] = [
+                {agrupar: grupo.isoformat() if agrupar == 'fecha' else grupo, **resultado(valores)}
+                for grupo, valores in sorted(grupos.items())
+            ]
+        return datos
+
+    return {
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'agrupar': agrupar,
+        'laboratorios': [
+            {'id': lab.id, 'nombre': lab.nombre, **agrupado({lab.id})} for lab in laboratorios
+        ],
+        'total': agrupado({lab.id for lab in laboratorios}),
+    }
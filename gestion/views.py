@@ -3,18 +3,30 @@ from django.http import JsonResponse, HttpResponse
 # ASÍ DEBE QUEDAR
 from .models import Laboratorio, Software, PC, Estudiante, Visita, ReservaClase, SerieReserva, Carrera
 from django.utils import timezone
-from django.db.models import Count, Q
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import TruncDate
 from datetime import timedelta
 import json
+import logging
+import time
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import authenticate, get_user_model
-from django.core import signing
 from django.core.signing import BadSignature, SignatureExpired
 from functools import wraps
+from .tokens import crear_token, revocar_token, usuario_de_token
+from .cache_respuestas import DASHBOARD, VISITAS, cache_respuesta, condicional
+from .dashboard import datos_dashboard, visitas_recientes
+from .estadisticas import (
+    DURACION, mapa_de_calor, resumen_visitas, uso_por_laboratorio, uso_por_software, usuarios_mas_activos,
+    visitas_por_dia_semana,
+)
+from .filtros import dias, fechas, normalizar, q_visitas
+from .metricas import observar_exportacion
+from .ocupacion import RESOLUCION_DEFAULT, UMBRAL_DEFAULT, ocupacion
 
 
 User = get_user_model()
-ADMIN_TOKEN_MAX_AGE = 60 * 60 * 8  # 8 horas
+logger = logging.getLogger(__name__)
 
 
 def _get_admin_token(request):
@@ -35,9 +47,8 @@ def admin_required_api(view_func):
             return JsonResponse({'error': 'No autorizado'}, status=401)
 
         try:
-            payload = signing.loads(token, max_age=ADMIN_TOKEN_MAX_AGE)
-            user_id = payload.get('user_id')
-            user = User.objects.filter(id=user_id, is_staff=True).first()
+            # Usa el caché de tokens verificados (ver tokens.py)
+            user = usuario_de_token(token)
             if not user:
                 return JsonResponse({'error': 'No autorizado'}, status=401)
             request.admin_user = user
@@ -70,7 +81,7 @@ def api_admin_login(request):
     if user is None or not user.is_staff:
         return JsonResponse({'error': 'Credenciales inválidas'}, status=401)
 
-    token = signing.dumps({'user_id': user.id, 'username': user.username})
+    token = crear_token(user)
     return JsonResponse({
         'token': token,
         'user': {
@@ -88,8 +99,7 @@ def api_admin_verify(request):
         return JsonResponse({'valid': False}, status=401)
 
     try:
-        payload = signing.loads(token, max_age=ADMIN_TOKEN_MAX_AGE)
-        user = User.objects.filter(id=payload.get('user_id'), is_staff=True).first()
+        user = usuario_de_token(token)
         if not user:
             return JsonResponse({'valid': False}, status=401)
         return JsonResponse({
@@ -103,6 +113,20 @@ def api_admin_verify(request):
         return JsonResponse({'valid': False}, status=401)
 
 
+@csrf_exempt
+def api_admin_logout(request):
+    """Revoca el token de administrador para que no pueda volver a usarse."""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    token = _get_admin_token(request)
+    if not token:
+        return JsonResponse({'error': 'No autorizado'}, status=401)
+
+    revocar_token(token)
+    return JsonResponse({'success': True})
+
+
 def pagina_registro(request):
     # El bloque POST para registrar la visita no cambia
     if request.method == 'POST':
@@ -219,6 +243,7 @@ def opciones_dinamicas(request):
 
 
 @csrf_exempt
+@condicional('carrera')
 def api_carreras(request):
     """API para listar y crear carreras dinámicamente."""
     if request.method == 'GET':
@@ -412,6 +437,7 @@ def finalizar_visita_api(request):
 
 # APIs para dashboard React
 @csrf_exempt
+@condicional(*DASHBOARD, deslizante=True)
 def api_dashboard_stats(request):
     """API para obtener estadísticas generales del dashboard"""
     
@@ -427,25 +453,15 @@ def api_dashboard_stats(request):
         hace_un_mes = timezone.now() - timedelta(days=30)
         visitas_ultimo_mes = Visita.objects.filter(fecha_hora_inicio__gte=hace_un_mes).count()
         
-        # Tiempo promedio de uso (solo visitas completadas)
-        visitas_completadas = Visita.objects.filter(fecha_hora_fin__isnull=False)
+        # Tiempo promedio de uso (solo visitas completadas), calculado en la base de datos
+        promedio = Visita.objects.filter(fecha_hora_fin__isnull=False).aggregate(promedio=Avg(DURACION))['promedio']
         tiempo_promedio_str = "0h 0m"
         
-        if visitas_completadas.exists():
-            # Calcular tiempo promedio manualmente
-            total_seconds = 0
-            count = 0
-            for visita in visitas_completadas:
-                if visita.fecha_hora_fin and visita.fecha_hora_inicio:
-                    diff = visita.fecha_hora_fin - visita.fecha_hora_inicio
-                    total_seconds += diff.total_seconds()
-                    count += 1
-            
-            if count > 0:
-                avg_seconds = total_seconds / count
-                horas = int(avg_seconds // 3600)
-                minutos = int((avg_seconds % 3600) // 60)
-                tiempo_promedio_str = f"{horas}h {minutos}m"
+        if promedio:
+            avg_seconds = promedio.total_seconds()
+            horas = int(avg_seconds // 3600)
+            minutos = int((avg_seconds % 3600) // 60)
+            tiempo_promedio_str = f"{horas}h {minutos}m"
         
         # Porcentaje de ocupación
         porcentaje_ocupacion = (pcs_en_uso / total_pcs * 100) if total_pcs > 0 else 0
@@ -483,7 +499,8 @@ def api_lab_usage(request):
         hace_30_dias = timezone.now() - timedelta(days=30)
         
         lab_usage = Laboratorio.objects.annotate(
-            visitas=Count('pc__visita', filter=Q(pc__visita__fecha_hora_inicio__gte=hace_30_dias))
+            visitas=Count('pc__visita', filter=Q(pc__visita__fecha_hora_inicio__gte=hace_30_dias)),
+            capacidad=Count('pc', distinct=True)
         ).order_by('-visitas')
         
         data = []
@@ -491,7 +508,7 @@ def api_lab_usage(request):
             data.append({
                 'laboratorio': lab.nombre,
                 'visitas': lab.visitas,
-                'capacidad': lab.pc_set.count()
+                'capacidad': lab.capacidad
             })
         
         return JsonResponse({'data': data})
@@ -532,20 +549,19 @@ def api_visits_timeline(request):
         # Visitas por día (últimos 30 días)
         hace_30_dias = timezone.now() - timedelta(days=30)
         
+        # TruncDate agrupa por la fecha en la zona horaria local
         visits_by_day = Visita.objects.filter(
             fecha_hora_inicio__gte=hace_30_dias
-        ).extra(
-            select={'day': 'date(fecha_hora_inicio)'}
-        ).values('day').annotate(
+        ).values(
+            day=TruncDate('fecha_hora_inicio')
+        ).annotate(
             count=Count('id')
         ).order_by('day')
         
         data = []
         for item in visits_by_day:
-            # Convertir la fecha a zona horaria local
-            fecha_local = timezone.localtime(item['day'])
             data.append({
-                'fecha': fecha_local.strftime('%Y-%m-%d'),
+                'fecha': item['day'].strftime('%Y-%m-%d'),
                 'visitas': item['count']
             })
         
@@ -555,101 +571,54 @@ def api_visits_timeline(request):
 
 
 @csrf_exempt
+@condicional(*VISITAS, 'estudiante')
 def api_recent_visits(request):
     """API para obtener visitas recientes"""
     
     try:
         # Visitas recientes (últimas 10)
-        recent_visits = Visita.objects.select_related(
-            'estudiante', 'pc__laboratorio', 'software_utilizado'
-        ).order_by('-fecha_hora_inicio')[:10]
-        
-        data = []
-        for visita in recent_visits:
-            # Convertir a zona horaria local de México
-            fecha_inicio_local = timezone.localtime(visita.fecha_hora_inicio)
-            fecha_fin_local = timezone.localtime(visita.fecha_hora_fin) if visita.fecha_hora_fin else None
-            
-            data.append({
-                'id': visita.id,
-                'estudiante': visita.estudiante.nombre_completo,
-                'laboratorio': visita.pc.laboratorio.nombre,
-                'pc': str(visita.pc),
-                'software': visita.software_utilizado.nombre if visita.software_utilizado else 'N/A',
-                'fecha_inicio': fecha_inicio_local.strftime('%Y-%m-%d %H:%M'),
-                'fecha_fin': fecha_fin_local.strftime('%Y-%m-%d %H:%M') if fecha_fin_local else 'En curso',
-                'estado': 'En uso' if visita.fecha_hora_fin is None else 'Terminado'
-            })
+        data = visitas_recientes()
         
         return JsonResponse({'data': data})
     except Exception as e:
         return JsonResponse({'error': str(e), 'data': []})
 
 
+@csrf_exempt
+@condicional(*DASHBOARD, deslizante=True)
+def api_dashboard_all(request):
+    """API con stats, lab-usage, software-usage, visits-timeline y recent-visits en una sola respuesta"""
+    
+    try:
+        return JsonResponse(datos_dashboard())
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 # APIs para reportes filtrados
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*VISITAS)
 def api_reports_filtered_stats(request):
     """API para obtener estadísticas filtradas para reportes"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        laboratory = request.GET.get('laboratory', 'all')
-        software = request.GET.get('software', 'all')
-        user_type = request.GET.get('user_type', 'all')
-        
-        # Construir filtros base
-        filters = Q()
+        # Filtros de fecha, laboratorio y software
+        filtros = normalizar(request.GET)
         
-        # Filtro por fechas
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
-        
-        # Filtro por laboratorio
-        if laboratory != 'all':
-            filters &= Q(pc__laboratorio__id=laboratory)
-        
-        # Filtro por software
-        if software != 'all':
-            filters &= Q(software_utilizado__id=software)
-        
-        # Aplicar filtros a las consultas
-        visitas_filtradas = Visita.objects.filter(filters)
-        
-        # Calcular estadísticas
-        total_visitas = visitas_filtradas.count()
+        # Total, horas y usuarios distintos en una sola consulta
+        resumen = resumen_visitas(q_visitas(filtros))
+        total_visitas = resumen['total_visitas']
         
         # Promedio diario
-        if date_from and date_to:
-            from datetime import datetime
-            fecha_inicio = datetime.strptime(date_from, '%Y-%m-%d').date()
-            fecha_fin = datetime.strptime(date_to, '%Y-%m-%d').date()
-            dias = (fecha_fin - fecha_inicio).days + 1
-            promedio_diario = round(total_visitas / dias, 1) if dias > 0 else 0
-        else:
-            promedio_diario = 0
-        
-        # Tiempo total (solo visitas completadas)
-        visitas_completadas = visitas_filtradas.filter(fecha_hora_fin__isnull=False)
-        tiempo_total_horas = 0
-        
-        for visita in visitas_completadas:
-            if visita.fecha_hora_fin and visita.fecha_hora_inicio:
-                diff = visita.fecha_hora_fin - visita.fecha_hora_inicio
-                tiempo_total_horas += diff.total_seconds() / 3600
-        
-        # Sesiones únicas (usuarios distintos)
-        sesiones_unicas = visitas_filtradas.values('estudiante').distinct().count()
+        num_dias = dias(filtros)
+        promedio_diario = round(total_visitas / num_dias, 1) if num_dias and num_dias > 0 else 0
         
         return JsonResponse({
             'total_visitas': total_visitas,
             'promedio_diario': promedio_diario,
-            'tiempo_total_horas': round(tiempo_total_horas, 1),
-            'sesiones_unicas': sesiones_unicas
+            'tiempo_total_horas': round(resumen['horas'], 1),
+            'sesiones_unicas': resumen['sesiones_unicas']
         })
         
     except Exception as e:
@@ -658,49 +627,16 @@ def api_reports_filtered_stats(request):
 
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*VISITAS)
 def api_reports_lab_usage(request):
     """API para obtener uso por laboratorio filtrado"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        laboratory = request.GET.get('laboratory', 'all')
-        
-        # Construir filtros base
-        filters = Q()
-        
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
-        
-        # Obtener laboratorios con sus estadísticas
-        if laboratory != 'all':
-            labs = Laboratorio.objects.filter(id=laboratory)
-        else:
-            labs = Laboratorio.objects.all()
-        
-        data = []
-        for lab in labs:
-            # Contar visitas para este laboratorio
-            visitas = Visita.objects.filter(filters, pc__laboratorio=lab)
-            total_visitas = visitas.count()
-            
-            # Calcular horas totales
-            horas_totales = 0
-            for visita in visitas.filter(fecha_hora_fin__isnull=False):
-                if visita.fecha_hora_fin and visita.fecha_hora_inicio:
-                    diff = visita.fecha_hora_fin - visita.fecha_hora_inicio
-                    horas_totales += diff.total_seconds() / 3600
-            
-            data.append({
-                'name': lab.nombre,
-                'visitas': total_visitas,
-                'horas': round(horas_totales, 1)
-            })
+        filtros = normalizar(request.GET)
         
-        return JsonResponse({'data': data})
+        # Visitas y horas de todos los laboratorios agrupadas en una consulta
+        filters = q_visitas(filtros, laboratorio=False, software=False)
+        return JsonResponse({'data': uso_por_laboratorio(filters, filtros['laboratory'])})
         
     except Exception as e:
         return JsonResponse({'error': str(e), 'data': []})
@@ -708,41 +644,16 @@ def api_reports_lab_usage(request):
 
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*VISITAS)
 def api_reports_software_usage(request):
     """API para obtener uso de software filtrado"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        software = request.GET.get('software', 'all')
-        
-        # Construir filtros base
-        filters = Q()
-        
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
-        
-        # Obtener software con sus estadísticas
-        if software != 'all':
-            software_list = Software.objects.filter(id=software)
-        else:
-            software_list = Software.objects.all()
-        
-        data = []
-        for soft in software_list:
-            # Contar usos para este software
-            usos = Visita.objects.filter(filters, software_utilizado=soft).count()
-            
-            if usos > 0:  # Solo incluir software que se haya usado
-                data.append({
-                    'name': soft.nombre,
-                    'value': usos
-                })
+        filtros = normalizar(request.GET)
         
-        return JsonResponse({'data': data})
+        # Solo el software que se haya usado, agrupado en una consulta
+        filters = q_visitas(filtros, laboratorio=False, software=False)
+        return JsonResponse({'data': uso_por_software(filters, filtros['software'])})
         
     except Exception as e:
         return JsonResponse({'error': str(e), 'data': []})
@@ -750,101 +661,76 @@ def api_reports_software_usage(request):
 
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*VISITAS)
 def api_reports_daily_trend(request):
     """API para obtener tendencia diaria filtrada"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        laboratory = request.GET.get('laboratory', 'all')
-        
-        # Construir filtros base
-        filters = Q()
-        
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
-        if laboratory != 'all':
-            filters &= Q(pc__laboratorio__id=laboratory)
-        
-        # Obtener visitas por día de la semana
-        visitas_por_dia = Visita.objects.filter(filters).extra(
-            select={'day_of_week': 'extract(dow from fecha_hora_inicio)'}
-        ).values('day_of_week').annotate(
-            count=Count('id')
-        ).order_by('day_of_week')
+        filtros = normalizar(request.GET)
         
-        # Mapear días de la semana
-        dias_semana = ['Dom', 'Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb']
+        # Visitas por día de la semana
+        return JsonResponse({'data': visitas_por_dia_semana(q_visitas(filtros, software=False))})
         
-        data = []
-        for item in visitas_por_dia:
-            dia_num = int(item['day_of_week'])
-            data.append({
-                'dia': dias_semana[dia_num],
-                'visitas': item['count']
-            })
+    except Exception as e:
+        return JsonResponse({'error': str(e), 'data': []})
+
+
+@csrf_exempt
+@admin_required_api
+@cache_respuesta(*VISITAS)
+def api_reports_heatmap(request):
+    """API para obtener visitas y ocupación promedio por día de la semana, hora y laboratorio"""
+    
+    try:
+        filtros = normalizar(request.GET)
+        desde, hasta = fechas(filtros)
         
+        # Una consulta agrupada; las matrices son de 7 días (lunes a domingo) x 24 horas
+        data = mapa_de_calor(
+            q_visitas(filtros, laboratorio=False), desde, hasta, filtros['laboratory']
+        )
         return JsonResponse({'data': data})
         
     except Exception as e:
-        return JsonResponse({'error': str(e), 'data': []})
+        return JsonResponse({'error': str(e), 'data': {}})
+
+
+@csrf_exempt
+@admin_required_api
+@cache_respuesta(*VISITAS)
+def api_reports_occupancy(request):
+    """
+    API para obtener la ocupación de cada laboratorio en el tiempo.
+
+    Parámetros GET, además de los filtros de reportes (laboratorio y software):
+        date_from / date_to: rango (YYYY-MM-DD, por defecto los últimos 30 días)
+        resolucion: minutos por punto de la serie, divisor de 1440 (por defecto 60)
+        umbral: porcentaje de PCs para contar el tiempo en o sobre él (por defecto 80)
+    """
+    try:
+        filtros = normalizar(request.GET)
+        resolucion = int(request.GET.get('resolucion', RESOLUCION_DEFAULT))
+        umbral = int(request.GET.get('umbral', UMBRAL_DEFAULT))
+        # Barrido de eventos de inicio/fin en NumPy sobre una sola consulta
+        data = ocupacion(filtros, resolucion=resolucion, umbral=umbral)
+    except ValueError as e:
+        return JsonResponse({'error': f'Parámetros inválidos: {e}', 'data': {}}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e), 'data': {}}, status=500)
+    return JsonResponse({'data': data})
 
 
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*VISITAS, 'estudiante')
 def api_reports_top_users(request):
     """API para obtener usuarios más activos filtrados"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        laboratory = request.GET.get('laboratory', 'all')
-        software = request.GET.get('software', 'all')
-        
-        # Construir filtros base
-        filters = Q()
-        
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
-        if laboratory != 'all':
-            filters &= Q(pc__laboratorio__id=laboratory)
-        if software != 'all':
-            filters &= Q(software_utilizado__id=software)
-        
-        # Obtener usuarios con sus estadísticas
-        usuarios_stats = Visita.objects.filter(filters).values(
-            'estudiante__nombre_completo'
-        ).annotate(
-            total_visitas=Count('id')
-        ).order_by('-total_visitas')[:5]
+        filtros = normalizar(request.GET)
         
-        data = []
-        for usuario in usuarios_stats:
-            # Calcular horas totales para este usuario
-            visitas_usuario = Visita.objects.filter(
-                filters, 
-                estudiante__nombre_completo=usuario['estudiante__nombre_completo']
-            ).filter(fecha_hora_fin__isnull=False)
-            
-            horas_totales = 0
-            for visita in visitas_usuario:
-                if visita.fecha_hora_fin and visita.fecha_hora_inicio:
-                    diff = visita.fecha_hora_fin - visita.fecha_hora_inicio
-                    horas_totales += diff.total_seconds() / 3600
-            
-            data.append({
-                'nombre': usuario['estudiante__nombre_completo'],
-                'visitas': usuario['total_visitas'],
-                'horas': round(horas_totales, 1)
-            })
-        
-        return JsonResponse({'data': data})
+        # Visitas y horas por usuario agrupadas en una consulta
+        return JsonResponse({'data': usuarios_mas_activos(q_visitas(filtros))})
         
     except Exception as e:
         return JsonResponse({'error': str(e), 'data': []})
@@ -852,6 +738,8 @@ def api_reports_top_users(request):
 
 @csrf_exempt
 @admin_required_api
+@condicional('laboratorio')
+@cache_respuesta('laboratorio')
 def api_reports_laboratories_list(request):
     """API para obtener lista de laboratorios para filtros"""
     
@@ -865,6 +753,8 @@ def api_reports_laboratories_list(request):
 
 @csrf_exempt
 @admin_required_api
+@condicional('software')
+@cache_respuesta('software')
 def api_reports_software_list(request):
     """API para obtener lista de software para filtros"""
     
@@ -899,33 +789,14 @@ def api_export_pdf(request):
             except:
                 filters = {}
         
-        # Normalizar nombres de filtros (camelCase a snake_case)
-        normalized_filters = {}
-        normalized_filters['date_from'] = filters.get('dateFrom') or filters.get('date_from')
-        normalized_filters['date_to'] = filters.get('dateTo') or filters.get('date_to')
-        normalized_filters['period'] = filters.get('period', 'custom')
-        normalized_filters['laboratory'] = filters.get('laboratory', 'all')
-        normalized_filters['software'] = filters.get('software', 'all')
-        normalized_filters['userType'] = filters.get('userType', 'all')
-        
-        # Si hay un período predefinido, calcular las fechas
-        if normalized_filters['period'] != 'custom' and not normalized_filters['date_from']:
-            from datetime import datetime, timedelta
-            today = datetime.now().date()
-            period_map = {
-                'monthly': timedelta(days=30),
-                'bimonthly': timedelta(days=60),
-                'quarterly': timedelta(days=90),
-                'semiannual': timedelta(days=180),
-                'annual': timedelta(days=365)
-            }
-            if normalized_filters['period'] in period_map:
-                normalized_filters['date_from'] = (today - period_map[normalized_filters['period']]).strftime('%Y-%m-%d')
-                normalized_filters['date_to'] = today.strftime('%Y-%m-%d')
+        # Normalizar nombres de filtros (camelCase a snake_case) y períodos predefinidos
+        normalized_filters = normalizar(filters, expandir_periodo=True)
         
         # Generar PDF con filtros normalizados
         generator = ReportGenerator()
+        inicio = time.perf_counter()
         pdf_content = generator.generate_pdf_report(normalized_filters)
+        observar_exportacion('pdf', time.perf_counter() - inicio, len(pdf_content))
         
         # Crear respuesta HTTP
         response = HttpResponse(pdf_content, content_type='application/pdf')
@@ -935,8 +806,7 @@ def api_export_pdf(request):
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        print(f"Error al generar PDF: {str(e)}")
-        print(f"Traceback: {error_trace}")
+        logger.exception('Error al generar PDF: %s', e)
         return JsonResponse({'error': str(e), 'traceback': error_trace}, status=500)
         
     except Exception as e:
@@ -965,33 +835,14 @@ def api_export_excel(request):
             except:
                 filters = {}
         
-        # Normalizar nombres de filtros (camelCase a snake_case)
-        normalized_filters = {}
-        normalized_filters['date_from'] = filters.get('dateFrom') or filters.get('date_from')
-        normalized_filters['date_to'] = filters.get('dateTo') or filters.get('date_to')
-        normalized_filters['period'] = filters.get('period', 'custom')
-        normalized_filters['laboratory'] = filters.get('laboratory', 'all')
-        normalized_filters['software'] = filters.get('software', 'all')
-        normalized_filters['userType'] = filters.get('userType', 'all')
-        
-        # Si hay un período predefinido, calcular las fechas
-        if normalized_filters['period'] != 'custom' and not normalized_filters['date_from']:
-            from datetime import datetime, timedelta
-            today = datetime.now().date()
-            period_map = {
-                'monthly': timedelta(days=30),
-                'bimonthly': timedelta(days=60),
-                'quarterly': timedelta(days=90),
-                'semiannual': timedelta(days=180),
-                'annual': timedelta(days=365)
-            }
-            if normalized_filters['period'] in period_map:
-                normalized_filters['date_from'] = (today - period_map[normalized_filters['period']]).strftime('%Y-%m-%d')
-                normalized_filters['date_to'] = today.strftime('%Y-%m-%d')
+        # Normalizar nombres de filtros (camelCase a snake_case) y períodos predefinidos
+        normalized_filters = normalizar(filters, expandir_periodo=True)
         
         # Generar Excel con filtros normalizados
         generator = ReportGenerator()
+        inicio = time.perf_counter()
         excel_content = generator.generate_excel_report(normalized_filters)
+        observar_exportacion('excel', time.perf_counter() - inicio, len(excel_content))
         
         # Crear respuesta HTTP
         response = HttpResponse(
@@ -1004,8 +855,7 @@ def api_export_excel(request):
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        print(f"Error al generar Excel: {str(e)}")
-        print(f"Traceback: {error_trace}")
+        logger.exception('Error al generar Excel: %s', e)
         return JsonResponse({'error': str(e), 'traceback': error_trace}, status=500)
         
     except Exception as e:
@@ -0,0 +1,343 @@
+"""
+Calendarios iCalendar (.ics) para suscripción desde clientes de calendario
+y pantallas de señalización.
+
+- /api/calendar/<laboratorio_id>.ics  -> todas las reservas de un laboratorio
+- /api/calendar/serie/<serie_id>.ics  -> las ocurrencias de una serie
+
+Las series cuyas ocurrencias siguen exactamente su patrón semanal se publican
+como un solo evento con RRULE (y EXDATE para las ocurrencias que no se crearon
+por conflicto); el resto se publica ocurrencia por ocurrencia. La respuesta se
+genera en streaming y soporta GET condicional (ETag / If-None-Match).
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse, Http404
+from django.utils import timezone
+from django.views.decorators.http import condition, require_GET
+
+from .models import Laboratorio, ReservaClase, SerieReserva
+
+
+PRODID = '-//Edificio 55//Sistema de Laboratorios//ES'
+UID_DOMINIO = 'edificio55'
+
+# Códigos de DiaSemana -> días de RRULE y weekday() de Python
+DIAS_RRULE = {'L': 'MO', 'M': 'TU', 'X': 'WE', 'J': 'TH', 'V': 'FR', 'S': 'SA', 'D': 'SU'}
+DIAS_WEEKDAY = {'L': 0, 'M': 1, 'X': 2, 'J': 3, 'V': 4, 'S': 5, 'D': 6}
+
+CAMPOS_RESERVA = (
+    'id', 'serie_id', 'profesor', 'materia', 'fecha_hora_inicio', 'fecha_hora_fin',
+    'carrera', 'semestre', 'numero_alumnos', 'nota', 'actualizada_el',
+)
+
+
+# ============ Formato iCalendar ============
+
+def _escapar(texto):
+    """Escapa un valor de texto según RFC 5545."""
+    return (
+        str(texto)
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def _plegar(linea):
+    """Pliega una línea a 75 octetos como exige RFC 5545 y agrega CRLF."""
+    datos = linea.encode('utf-8')
+    if len(datos) <= 75:
+        return linea + '\r\n'
+    partes = []
+    limite = 75
+    while datos:
+        corte = min(limite, len(datos))
+        # No cortar a la mitad de un carácter UTF-8
+        while corte < len(datos) and (datos[corte] & 0xC0) == 0x80:
+            corte -= 1
+        partes.append(datos[:corte].decode('utf-8'))
+        datos = datos[corte:]
+        limite = 74  # las líneas de continuación empiezan con un espacio
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def _utc(valor):
+    return valor.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local(valor):
+    return timezone.localtime(valor).strftime('%Y%m%dT%H%M%S')
+
+
+def _vtimezone():
+    """VTIMEZONE de la zona del proyecto con su desplazamiento actual."""
+    nombre = timezone.get_current_timezone_name()
+    offset = timezone.localtime(timezone.now()).utcoffset() or timedelta(0)
+    minutos = int(offset.total_seconds() // 60)
+    signo = '+' if minutos >= 0 else '-'
+    texto_offset = f'{signo}{abs(minutos) // 60:02d}{abs(minutos) % 60:02d}'
+    abreviatura = timezone.localtime(timezone.now()).tzname() or texto_offset
+    return [
+        'BEGIN:VTIMEZONE',
+        f'TZID:{nombre}',
+        'BEGIN:STANDARD',
+        'DTSTART:19700101T000000',
+        f'TZOFFSETFROM:{texto_offset}',
+        f'TZOFFSETTO:{texto_offset}',
+        f'TZNAME:{abreviatura}',
+        'END:STANDARD',
+        'END:VTIMEZONE',
+    ]
+
+
+def _descripcion(datos):
+    lineas = []
+    if datos.get('profesor'):
+        lineas.append(f"Profesor: {datos['profesor']}")
+    if datos.get('carrera'):
+        lineas.append(f"Carrera: {datos['carrera']}")
+    if datos.get('semestre'):
+        lineas.append(f"Semestre: {datos['semestre']}")
+    if datos.get('numero_alumnos'):
+        lineas.append(f"Alumnos: {datos['numero_alumnos']}")
+    if datos.get('nota'):
+        lineas.append(f"Nota: {datos['nota']}")
+    return '\n'.join(lineas)
+
+
+def _evento_reserva(reserva, laboratorio_nombre):
+    """VEVENT para una ocurrencia individual."""
+    lineas = [
+        'BEGIN:VEVENT',
+        f"UID:reserva-{reserva['id']}@{UID_DOMINIO}",
+        f"DTSTAMP:{_utc(reserva['actualizada_el'] or reserva['fecha_hora_inicio'])}",
+        f"DTSTART:{_utc(reserva['fecha_hora_inicio'])}",
+        f"DTEND:{_utc(reserva['fecha_hora_fin'])}",
+        f"SUMMARY:{_escapar(reserva['materia'] or 'Reserva de laboratorio')}",
+        f'LOCATION:{_escapar(laboratorio_nombre)}',
+    ]
+    descripcion = _descripcion(reserva)
+    if descripcion:
+        lineas.append(f'DESCRIPTION:{_escapar(descripcion)}')
+    lineas.append('END:VEVENT')
+    return lineas
+
+
+def _evento_serie(serie, ocurrencias, inicio, exdates, laboratorio_nombre):
+    """VEVENT con RRULE semanal que representa toda una serie."""
+    tzid = timezone.get_current_timezone_name()
+    primera = ocurrencias[0]
+    fin = inicio + (primera['fecha_hora_fin'] - primera['fecha_hora_inicio'])
+    hasta = timezone.make_aware(datetime.combine(serie.fecha_fin, serie.hora_fin))
+    dias = ','.join(sorted(
+        {DIAS_RRULE[c] for c in serie.get_dias_codigos()},
+        key=lambda d: list(DIAS_RRULE.values()).index(d),
+    ))
+    ultima_modificacion = max(
+        [serie.actualizada_el or serie.creada_el]
+        + [o['actualizada_el'] for o in ocurrencias if o['actualizada_el']]
+    )
+    lineas = [
+        'BEGIN:VEVENT',
+        f'UID:serie-{serie.id}@{UID_DOMINIO}',
+        f'DTSTAMP:{_utc(ultima_modificacion)}',
+        f'DTSTART;TZID={tzid}:{_local(inicio)}',
+        f'DTEND;TZID={tzid}:{_local(fin)}',
+        f'RRULE:FREQ=WEEKLY;BYDAY={dias};UNTIL={_utc(hasta)}',
+    ]
+    for exdate in exdates:
+        lineas.append(f'EXDATE;TZID={tzid}:{_local(exdate)}')
+    lineas += [
+        f"SUMMARY:{_escapar(primera['materia'] or serie.nombre)}",
+        f'LOCATION:{_escapar(laboratorio_nombre)}',
+    ]
+    descripcion = _descripcion(primera)
+    if descripcion:
+        lineas.append(f'DESCRIPTION:{_escapar(descripcion)}')
+    lineas.append('END:VEVENT')
+    return lineas
+
+
+def _regla_serie(serie, ocurrencias):
+    """
+    Si las ocurrencias siguen el patrón semanal de la serie retorna
+    (inicio_de_la_regla, exdates); si alguna fue editada a mano retorna None.
+    """
+    if not ocurrencias or serie is None:
+        return None
+    codigos = serie.get_dias_codigos()
+    if not codigos:
+        return None
+    dias = {DIAS_WEEKDAY[c] for c in codigos}
+    duracion = (
+        datetime.combine(serie.fecha_inicio, serie.hora_fin)
+        - datetime.combine(serie.fecha_inicio, serie.hora_inicio)
+    )
+    primera = ocurrencias[0]
+    fechas = set()
+    for o in ocurrencias:
+        inicio_local = timezone.localtime(o['fecha_hora_inicio'])
+        fecha = inicio_local.date()
+        if (
+            fecha in fechas
+            or not (serie.fecha_inicio <= fecha <= serie.fecha_fin)
+            or fecha.weekday() not in dias
+            or inicio_local.time() != serie.hora_inicio
+            or o['fecha_hora_fin'] - o['fecha_hora_inicio'] != duracion
+            or o['profesor'] != primera['profesor']
+            or o['materia'] != primera['materia']
+        ):
+            return None
+        fechas.add(fecha)
+
+    esperadas = []
+    fecha = serie.fecha_inicio
+    while fecha <= serie.fecha_fin:
+        if fecha.weekday() in dias:
+            esperadas.append(fecha)
+        fecha += timedelta(days=1)
+
+    def _aware(f):
+        return timezone.make_aware(datetime.combine(f, serie.hora_inicio))
+
+    exdates = [_aware(f) for f in esperadas if f not in fechas]
+    return _aware(esperadas[0]), exdates
+
+
+def _eventos_grupo(serie, ocurrencias, laboratorio_nombre):
+    """Eventos de un grupo de ocurrencias de la misma serie."""
+    regla = _regla_serie(serie, ocurrencias)
+    if regla is not None:
+        inicio, exdates = regla
+        return _evento_serie(serie, ocurrencias, inicio, exdates, laboratorio_nombre)
+    lineas = []
+    for ocurrencia in ocurrencias:
+        lineas += _evento_reserva(ocurrencia, laboratorio_nombre)
+    return lineas
+
+
+def _generar_calendario(nombre, reservas, series, laboratorio_nombre):
+    """
+    Genera el calendario línea por línea. `reservas` debe venir ordenado por
+    serie para que las ocurrencias de cada serie lleguen juntas; solo se
+    mantiene en memoria una serie a la vez.
+    """
+    cabecera = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escapar(nombre)}',
+        f'X-WR-TIMEZONE:{timezone.get_current_timezone_name()}',
+    ] + _vtimezone()
+    yield ''.join(_plegar(linea) for linea in cabecera)
+
+    serie_actual = None
+    grupo = []
+    for reserva in reservas:
+        if reserva['serie_id'] is None:
+            yield ''.join(_plegar(l) for l in _evento_reserva(reserva, laboratorio_nombre))
+            continue
+        if reserva['serie_id'] != serie_actual and grupo:
+            eventos = _eventos_grupo(series.get(serie_actual), grupo, laboratorio_nombre)
+            yield ''.join(_plegar(l) for l in eventos)
+            grupo = []
+        serie_actual = reserva['serie_id']
+        grupo.append(reserva)
+    if grupo:
+        eventos = _eventos_grupo(series.get(serie_actual), grupo, laboratorio_nombre)
+        yield ''.join(_plegar(l) for l in eventos)
+
+    yield _plegar('END:VCALENDAR')
+
+
+def _respuesta_ics(contenido, nombre_archivo):
+    response = StreamingHttpResponse(contenido, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="{nombre_archivo}"'
+    # Los clientes deben revalidar siempre; con el ETag reciben 304 si no hubo cambios
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+# ============ Validadores para GET condicional ============
+
+def _etag(*partes):
+    return hashlib.md5(repr(partes).encode('utf-8')).hexdigest()
+
+
+def _etag_laboratorio(request, laboratorio_id):
+    """
+    ETag a partir de agregados baratos de reservas y series del laboratorio y
+    del nombre del laboratorio (aparece en el calendario). Los update()
+    masivos sobre reservas deben fijar actualizada_el para cambiarlo.
+    """
+    laboratorio = Laboratorio.objects.filter(id=laboratorio_id).values_list('nombre', flat=True).first()
+    reservas = ReservaClase.objects.filter(laboratorio_id=laboratorio_id).aggregate(
+        total=Count('id'), ultimo_id=Max('id'), ultima=Max('actualizada_el')
+    )
+    series = SerieReserva.objects.filter(laboratorio_id=laboratorio_id).aggregate(
+        total=Count('id'), ultima=Max('actualizada_el')
+    )
+    return _etag('lab', laboratorio_id, laboratorio, reservas, series, timezone.get_current_timezone_name())
+
+
+def _etag_serie(request, serie_id):
+    """ETag a partir de la serie, sus días, el nombre de su laboratorio y los agregados de sus ocurrencias."""
+    reservas = ReservaClase.objects.filter(serie_id=serie_id).aggregate(
+        total=Count('id'), ultimo_id=Max('id'), ultima=Max('actualizada_el')
+    )
+    serie = SerieReserva.objects.filter(id=serie_id).values_list('actualizada_el', 'laboratorio__nombre').first()
+    dias = sorted(SerieReserva.dias_semana.through.objects.filter(
+        seriereserva_id=serie_id
+    ).values_list('diasemana_id', flat=True))
+    return _etag('serie', serie_id, reservas, serie, dias, timezone.get_current_timezone_name())
+
+
+# ============ Vistas ============
+
+@require_GET
+@condition(etag_func=_etag_laboratorio)
+def api_calendario_laboratorio(request, laboratorio_id):
+    """Calendario iCalendar con todas las reservas de un laboratorio"""
+    laboratorio = Laboratorio.objects.filter(id=laboratorio_id).first()
+    if laboratorio is None:
+        raise Http404('Laboratorio no encontrado')
+
+    series = {
+        serie.id: serie
+        for serie in SerieReserva.objects.filter(laboratorio=laboratorio).prefetch_related('dias_semana')
+    }
+    reservas = ReservaClase.objects.filter(
+        laboratorio=laboratorio
+    ).order_by('serie_id', 'fecha_hora_inicio').values(*CAMPOS_RESERVA).iterator(chunk_size=2000)
+
+    contenido = _generar_calendario(
+        f'Reservas {laboratorio.nombre}', reservas, series, laboratorio.nombre
+    )
+    return _respuesta_ics(contenido, f'laboratorio-{laboratorio.id}.ics')
+
+
+@require_GET
+@condition(etag_func=_etag_serie)
+def api_calendario_serie(request, serie_id):
+    """Calendario iCalendar con las ocurrencias de una serie de reservas"""
+    serie = SerieReserva.objects.select_related('laboratorio').prefetch_related(
+        'dias_semana'
+    ).filter(id=serie_id).first()
+    if serie is None:
+        raise Http404('Serie no encontrada')
+
+    reservas = ReservaClase.objects.filter(
+        serie=serie
+    ).order_by('fecha_hora_inicio').values(*CAMPOS_RESERVA).iterator(chunk_size=2000)
+
+    contenido = _generar_calendario(
+        serie.nombre, reservas, {serie.id: serie}, serie.laboratorio.nombre
+    )
+    return _respuesta_ics(contenido, f'serie-{serie.id}.ics')
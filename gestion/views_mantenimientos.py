@@ -0,0 +1,45 @@
+"""
+API endpoints para indicadores de mantenimiento
+"""
+from datetime import date
+
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .cache_respuestas import cache_respuesta
+from .mantenimientos import estadisticas_mantenimiento
+from .views import admin_required_api
+
+
+@csrf_exempt
+@admin_required_api
+@cache_respuesta('mantenimiento', 'pc', 'laboratorio')
+def api_reports_maintenance(request):
+    """
+    API para obtener MTTR, frecuencia y tiempo fuera de servicio de los
+    mantenimientos por PC y por laboratorio.
+
+    Parámetros GET: date_from, date_to (YYYY-MM-DD), laboratory ('all' o id)
+    y limit (máximo de PCs a devolver, por defecto 50).
+    """
+    try:
+        date_from = request.GET.get('date_from')
+        date_to = request.GET.get('date_to')
+        laboratory = request.GET.get('laboratory', 'all')
+        fecha_desde = date.fromisoformat(date_from) if date_from else None
+        fecha_hasta = date.fromisoformat(date_to) if date_to else None
+        laboratorio_id = int(laboratory) if laboratory != 'all' else None
+        limite = int(request.GET.get('limit', 50))
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos: fechas YYYY-MM-DD, laboratory y limit enteros'}, status=400)
+    if limite < 1:
+        return JsonResponse({'error': 'limit debe ser al menos 1'}, status=400)
+
+    try:
+        estadisticas = estadisticas_mantenimiento(fecha_desde, fecha_hasta, laboratorio_id)
+        estadisticas['total_pcs'] = len(estadisticas['por_pc'])
+        estadisticas['por_pc'] = estadisticas['por_pc'][:limite]
+        return JsonResponse(estadisticas)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,36 @@
+"""
+Endpoint /metrics para el recolector local de Prometheus.
+
+Solo responde a las direcciones de METRICAS_IPS_PERMITIDAS (IPs o redes
+CIDR, por defecto localhost); se compara REMOTE_ADDR, así que detrás de un
+proxy inverso hay que permitir la dirección del proxy.
+"""
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metricas import exposicion
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _ip_permitida(direccion):
+    try:
+        ip = ipaddress.ip_address(direccion)
+    except ValueError:
+        return False
+    for red in getattr(settings, 'METRICAS_IPS_PERMITIDAS', ['127.0.0.1', '::1']):
+        try:
+            if ip in ipaddress.ip_network(red, strict=False):
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+def metricas(request):
+    """Métricas de gestion en formato de texto de Prometheus."""
+    if not _ip_permitida(request.META.get('REMOTE_ADDR', '')):
+        return HttpResponseForbidden('No autorizado')
+    return HttpResponse(exposicion(), content_type=CONTENT_TYPE)
@@ -9,9 +9,13 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.db import transaction
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F, Q, Value
 from datetime import datetime
 from .models import Visita, PC, Mantenimiento, Laboratorio
+from .cache_respuestas import registrar_cambio
+from .mantenimientos import abrir_mantenimientos, cerrar_mantenimientos
 import json
 
 
@@ -39,7 +43,7 @@ def panel_mantenimientos(request):
     # Obtener mantenimientos recientes (últimos 10)
     mantenimientos_recientes = Mantenimiento.objects.select_related(
         'pc', 'pc__laboratorio'
-    ).order_by('-fecha_hora')[:10]
+    ).order_by('-fecha_inicio')[:10]
     
     context = {
         'laboratorios': laboratorios,
@@ -62,47 +66,77 @@ def panel_sesiones_activas(request):
 
 # ============ APIs ============
 
+def _formatear_sesion(sesion):
+    """Convierte una fila de values() de sesión activa al formato del panel"""
+    segundos = int(sesion['transcurrido'].total_seconds())
+    return {
+        'id': sesion['id'],
+        'estudiante': sesion['estudiante__nombre_completo'],
+        'id_estudiante': sesion['estudiante_id'],
+        'pc': sesion['pc__numero_pc'],
+        'pc_id': sesion['pc_id'],
+        'laboratorio': sesion['pc__laboratorio__nombre'],
+        'laboratorio_id': sesion['pc__laboratorio_id'],
+        'hora_entrada': timezone.localtime(sesion['fecha_hora_inicio']).strftime('%H:%M'),
+        'tiempo_transcurrido': f'{segundos // 3600}h {(segundos % 3600) // 60}m',
+        'tiempo_minutos': segundos // 60,
+    }
+
+
 @csrf_exempt
 @login_required
 @user_passes_test(es_turno_vespertino, login_url='/panel-vespertino/login/')
 def api_obtener_sesiones_activas(request):
-    """API para obtener sesiones activas"""
+    """
+    API para obtener sesiones activas.
+
+    Con ?since=<ISO 8601> solo devuelve las sesiones iniciadas desde ese
+    momento y los ids de las finalizadas desde entonces; el cliente debe
+    enviar como siguiente `since` el valor de `hora_servidor`.
+    """
     try:
         laboratorio_id = request.GET.get('laboratorio', 'all')
+        since = request.GET.get('since')
+        ahora = timezone.now()
         
-        # Filtrar sesiones activas (sin hora de salida)
-        sesiones = Visita.objects.filter(
-            hora_salida__isnull=True
-        ).select_related('estudiante', 'pc', 'pc__laboratorio').order_by('-hora_entrada')
+        if since:
+            since = parse_datetime(since.replace(' ', '+'))
+            if since is None:
+                return JsonResponse({'success': False, 'error': 'Parámetro since inválido (use ISO 8601)'}, status=400)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
         
-        # Filtrar por laboratorio si se especifica
+        visitas = Visita.objects.all()
         if laboratorio_id != 'all':
-            sesiones = sesiones.filter(pc__laboratorio__id=laboratorio_id)
-        
-        # Preparar datos
-        sesiones_data = []
-        for sesion in sesiones:
-            tiempo_transcurrido = timezone.now() - sesion.hora_entrada
-            horas = int(tiempo_transcurrido.total_seconds() // 3600)
-            minutos = int((tiempo_transcurrido.total_seconds() % 3600) // 60)
-            
-            sesiones_data.append({
-                'id': sesion.id,
-                'estudiante': sesion.estudiante.nombre_completo,
-                'id_estudiante': sesion.estudiante.id_estudiante,
-                'pc': sesion.pc.numero_pc,
-                'laboratorio': sesion.pc.laboratorio.nombre,
-                'laboratorio_id': sesion.pc.laboratorio.id,
-                'hora_entrada': sesion.hora_entrada.strftime('%H:%M'),
-                'tiempo_transcurrido': f'{horas}h {minutos}m',
-                'tiempo_minutos': int(tiempo_transcurrido.total_seconds() // 60),
-            })
+            visitas = visitas.filter(pc__laboratorio__id=laboratorio_id)
         
-        return JsonResponse({
-            'success': True,
-            'sesiones': sesiones_data,
-            'total': len(sesiones_data)
-        })
+        # Filtrar sesiones activas (sin fecha_hora_fin); el tiempo transcurrido se calcula en SQL
+        sesiones = visitas.filter(fecha_hora_fin__isnull=True).annotate(
+            transcurrido=ExpressionWrapper(
+                Value(ahora, output_field=DateTimeField()) - F('fecha_hora_inicio'),
+                output_field=DurationField()
+            )
+        ).order_by('-fecha_hora_inicio')
+        
+        respuesta = {'success': True, 'hora_servidor': ahora.isoformat()}
+        
+        if since:
+            respuesta['finalizadas'] = list(
+                visitas.filter(fecha_hora_fin__gte=since).values_list('id', flat=True)
+            )
+            respuesta['total'] = sesiones.count()
+            sesiones = sesiones.filter(fecha_hora_inicio__gte=since)
+        
+        respuesta['sesiones'] = [
+            _formatear_sesion(sesion)
+            for sesion in sesiones.values(
+                'id', 'estudiante_id', 'estudiante__nombre_completo', 'pc_id', 'pc__numero_pc',
+                'pc__laboratorio_id', 'pc__laboratorio__nombre', 'fecha_hora_inicio', 'transcurrido'
+            )
+        ]
+        respuesta.setdefault('total', len(respuesta['sesiones']))
+        
+        return JsonResponse(respuesta)
         
     except Exception as e:
         return JsonResponse({
@@ -126,17 +160,21 @@ def api_finalizar_sesion(request):
         if not visita_id:
             return JsonResponse({'success': False, 'error': 'ID de visita requerido'}, status=400)
         
-        # Obtener la visita
-        visita = Visita.objects.get(id=visita_id, hora_salida__isnull=True)
+        visita = Visita.objects.select_related('estudiante').get(id=visita_id, fecha_hora_fin__isnull=True)
         
-        # Finalizar la sesión
-        visita.hora_salida = timezone.now()
-        visita.save()
-        
-        # Liberar la PC
-        if visita.pc:
-            visita.pc.en_uso = False
-            visita.pc.save()
+        with transaction.atomic():
+            # Finalizar la sesión (el filtro evita finalizarla dos veces en peticiones simultáneas)
+            finalizadas = Visita.objects.filter(
+                id=visita.id, fecha_hora_fin__isnull=True
+            ).update(fecha_hora_fin=timezone.now())
+            if not finalizadas:
+                raise Visita.DoesNotExist
+            registrar_cambio('visita', visita.fecha_hora_inicio)
+            
+            # Liberar la PC si ya no tiene otra sesión activa
+            PC.objects.filter(id=visita.pc_id, estado='En Uso').exclude(
+                visita__fecha_hora_fin__isnull=True
+            ).update(estado='Disponible')
         
         return JsonResponse({
             'success': True,
@@ -159,7 +197,7 @@ def api_finalizar_sesion(request):
 @login_required
 @user_passes_test(es_turno_vespertino, login_url='/panel-vespertino/login/')
 def api_finalizar_sesiones_laboratorio(request):
-    """API para finalizar todas las sesiones de un laboratorio"""
+    """API para finalizar todas las sesiones de un laboratorio (dos UPDATE en una transacción)"""
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
     
@@ -170,24 +208,19 @@ def api_finalizar_sesiones_laboratorio(request):
         if not laboratorio_id:
             return JsonResponse({'success': False, 'error': 'ID de laboratorio requerido'}, status=400)
         
-        # Obtener sesiones activas del laboratorio
         sesiones = Visita.objects.filter(
             pc__laboratorio__id=laboratorio_id,
-            hora_salida__isnull=True
+            fecha_hora_fin__isnull=True
         )
         
-        count = sesiones.count()
-        
-        # Finalizar todas las sesiones
-        hora_actual = timezone.now()
-        for sesion in sesiones:
-            sesion.hora_salida = hora_actual
-            sesion.save()
-            
-            # Liberar PC
-            if sesion.pc:
-                sesion.pc.en_uso = False
-                sesion.pc.save()
+        with transaction.atomic():
+            # Primero liberar las PCs de las sesiones activas, luego cerrar las sesiones
+            PC.objects.filter(
+                id__in=sesiones.values('pc_id'), estado='En Uso'
+            ).update(estado='Disponible')
+            count = sesiones.update(fecha_hora_fin=timezone.now())
+            # update() no dispara señales; las sesiones pudieron empezar en días pasados
+            registrar_cambio('visita')
         
         return JsonResponse({
             'success': True,
@@ -215,12 +248,13 @@ def api_obtener_pcs_laboratorio(request):
         
         pcs = PC.objects.filter(
             laboratorio__id=laboratorio_id
-        ).order_by('numero_pc')
+        ).order_by('numero_pc').values('id', 'numero_pc', 'estado')
         
         pcs_data = [{
-            'id': pc.id,
-            'numero_pc': pc.numero_pc,
-            'en_uso': pc.en_uso,
+            'id': pc['id'],
+            'numero_pc': pc['numero_pc'],
+            'estado': pc['estado'],
+            'en_uso': pc['estado'] == 'En Uso',
         } for pc in pcs]
         
         return JsonResponse({
@@ -256,20 +290,23 @@ def api_registrar_mantenimiento(request):
             }, status=400)
         
         # Obtener la PC
-        pc = PC.objects.get(id=pc_id)
-        
-        # Crear el mantenimiento
-        mantenimiento = Mantenimiento.objects.create(
-            pc=pc,
-            tipo_mantenimiento=tipo,
-            descripcion=descripcion,
-            fecha_hora=timezone.now()
+        pc = PC.objects.select_related('laboratorio').get(id=pc_id)
+        
+        # El modelo no tiene campo de tipo: se guarda al inicio de la descripción
+        creados, _ = abrir_mantenimientos(
+            PC.objects.filter(id=pc.id),
+            descripcion=f'{tipo}: {descripcion}' if descripcion else tipo
         )
+        if not creados:
+            return JsonResponse({
+                'success': False,
+                'error': f'La PC {pc} ya tiene un mantenimiento activo'
+            }, status=400)
         
         return JsonResponse({
             'success': True,
-            'mensaje': f'Mantenimiento registrado para {pc.numero_pc}',
-            'mantenimiento_id': mantenimiento.id
+            'mensaje': f'Mantenimiento registrado para {pc}',
+            'mantenimiento_id': creados[0].id
         })
         
     except PC.DoesNotExist:
@@ -282,3 +319,79 @@ def api_registrar_mantenimiento(request):
             'success': False,
             'error': str(e)
         }, status=500)
+
+
+def _pcs_de_solicitud(data):
+    """PCs indicadas en la petición: lista 'pc_ids' o todo un 'laboratorio_id'"""
+    pc_ids = data.get('pc_ids')
+    laboratorio_id = data.get('laboratorio_id')
+    if pc_ids:
+        return PC.objects.filter(id__in=[int(pc_id) for pc_id in pc_ids])
+    if laboratorio_id:
+        return PC.objects.filter(laboratorio_id=int(laboratorio_id))
+    return None
+
+
+@csrf_exempt
+@login_required
+@user_passes_test(es_turno_vespertino, login_url='/panel-vespertino/login/')
+def api_abrir_mantenimientos(request):
+    """API para poner en mantenimiento varias PCs o un laboratorio completo"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        pcs = _pcs_de_solicitud(data)
+        if pcs is None:
+            return JsonResponse({'success': False, 'error': 'pc_ids o laboratorio_id requerido'}, status=400)
+        
+        creados, omitidas = abrir_mantenimientos(pcs, descripcion=data.get('descripcion', ''))
+        
+        return JsonResponse({
+            'success': True,
+            'mensaje': f'{len(creados)} mantenimientos registrados' + (
+                f' ({omitidas} PCs ya tenían uno activo)' if omitidas else ''
+            ),
+            'creados': len(creados),
+            'omitidas': omitidas
+        })
+        
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'success': False, 'error': f'Datos inválidos: {e}'}, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@csrf_exempt
+@login_required
+@user_passes_test(es_turno_vespertino, login_url='/panel-vespertino/login/')
+def api_cerrar_mantenimientos(request):
+    """API para finalizar los mantenimientos activos de varias PCs o de un laboratorio"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+        pcs = _pcs_de_solicitud(data)
+        if pcs is None:
+            return JsonResponse({'success': False, 'error': 'pc_ids o laboratorio_id requerido'}, status=400)
+        
+        finalizados = cerrar_mantenimientos(pcs)
+        
+        return JsonResponse({
+            'success': True,
+            'mensaje': f'{finalizados} mantenimientos finalizados',
+            'finalizados': finalizados
+        })
+        
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'success': False, 'error': f'Datos inválidos: {e}'}, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
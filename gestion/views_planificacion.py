@@ -0,0 +1,109 @@
+"""
+API endpoints para planificación de laboratorios
+"""
+import json
+from datetime import date, timedelta
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+
+from .planificacion import buscar_huecos, planificar_semestre
+from .views import admin_required_api
+
+
+# Límites para evitar búsquedas desproporcionadas
+MAX_DIAS_BUSQUEDA = 366
+MAX_LIMITE_HUECOS = 200
+
+
+@csrf_exempt
+@admin_required_api
+def api_buscar_huecos(request):
+    """
+    API para encontrar los primeros huecos libres en todos los laboratorios.
+
+    Parámetros GET:
+        duracion: minutos requeridos (obligatorio)
+        date_from / date_to: ventana de búsqueda (YYYY-MM-DD, por defecto hoy y +30 días)
+        min_pcs: mínimo de PCs fuera de mantenimiento (por defecto 0)
+        software: id del software requerido ('all' para no filtrar)
+        limite: número máximo de huecos a devolver (por defecto 10)
+        fines_de_semana: '1' para incluir sábados y domingos
+    """
+    try:
+        duracion = int(request.GET.get('duracion', ''))
+        min_pcs = int(request.GET.get('min_pcs', 0))
+        limite = int(request.GET.get('limite', 10))
+        software = request.GET.get('software', 'all')
+        software_id = int(software) if software not in ('', 'all') else None
+
+        hoy = timezone.localdate()
+        date_from = request.GET.get('date_from')
+        date_to = request.GET.get('date_to')
+        fecha_desde = date.fromisoformat(date_from) if date_from else hoy
+        fecha_hasta = date.fromisoformat(date_to) if date_to else fecha_desde + timedelta(days=30)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos: duracion, min_pcs, limite y software deben ser enteros y las fechas YYYY-MM-DD'}, status=400)
+
+    if duracion <= 0 or min_pcs < 0 or not 0 < limite <= MAX_LIMITE_HUECOS:
+        return JsonResponse({'error': f'duracion debe ser positiva, min_pcs no negativo y limite entre 1 y {MAX_LIMITE_HUECOS}'}, status=400)
+    if fecha_hasta < fecha_desde or (fecha_hasta - fecha_desde).days > MAX_DIAS_BUSQUEDA:
+        return JsonResponse({'error': f'El rango de fechas debe ser válido y no mayor a {MAX_DIAS_BUSQUEDA} días'}, status=400)
+
+    try:
+        huecos = buscar_huecos(
+            duracion=timedelta(minutes=duracion),
+            fecha_desde=fecha_desde,
+            fecha_hasta=fecha_hasta,
+            min_pcs=min_pcs,
+            software_id=software_id,
+            limite=limite,
+            incluir_fin_de_semana=request.GET.get('fines_de_semana') == '1',
+        )
+
+        return JsonResponse({
+            'huecos': [
+                {
+                    'laboratorio_id': hueco['laboratorio_id'],
+                    'laboratorio': hueco['laboratorio'],
+                    'pcs': hueco['pcs'],
+                    'inicio': timezone.localtime(hueco['inicio']).isoformat(),
+                    'fin': timezone.localtime(hueco['fin']).isoformat(),
+                    'disponible_hasta': timezone.localtime(hueco['disponible_hasta']).isoformat(),
+                }
+                for hueco in huecos
+            ],
+            'total': len(huecos),
+        })
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@admin_required_api
+def api_planificar_semestre(request):
+    """
+    API para asignar laboratorios a un lote de clases semestrales.
+
+    Recibe por POST el mismo JSON que el comando planificar_semestre; con
+    "dry_run": true solo devuelve la asignación propuesta sin crear nada.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    try:
+        datos = json.loads(request.body or '{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+
+    dry_run = isinstance(datos, dict) and bool(datos.get('dry_run'))
+    try:
+        resultado = planificar_semestre(datos, crear=not dry_run)
+        resultado['dry_run'] = dry_run
+        return JsonResponse(resultado)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
@@ -3,46 +3,25 @@ API endpoints para estadísticas de reservas
 """
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Count, Q, Sum, Avg
+from django.db.models import Count, Sum, Avg
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from datetime import timedelta
+from .filtros import normalizar, q_reservas
+from .cache_respuestas import RESERVAS, cache_respuesta, condicional
 from .models import ReservaClase, SerieReserva, Laboratorio
 from .views import admin_required_api
 
 
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*RESERVAS)
 def api_reservations_stats(request):
     """API para obtener estadísticas generales de reservas"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        laboratory = request.GET.get('laboratory', 'all')
-        carrera = request.GET.get('carrera', 'all')
-        semestre = request.GET.get('semestre', 'all')
-        
-        # Construir filtros base
-        filters = Q()
-        
-        # Filtro por fechas
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
-        
-        # Filtro por laboratorio
-        if laboratory != 'all':
-            filters &= Q(laboratorio__id=laboratory)
-        
-        # Filtro por carrera
-        if carrera != 'all':
-            filters &= Q(carrera=carrera)
-        
-        # Filtro por semestre
-        if semestre != 'all':
-            filters &= Q(semestre=int(semestre))
+        # Filtros de fecha, laboratorio, carrera y semestre
+        filters = q_reservas(normalizar(request.GET))
         
         # Aplicar filtros
         reservas_filtradas = ReservaClase.objects.filter(filters)
@@ -79,30 +58,21 @@ def api_reservations_stats(request):
             'labs_mas_usados': list(labs_mas_usados)
         })
         
+    except ValueError as e:
+        return JsonResponse({'error': f'Parámetros inválidos: {e}'}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*RESERVAS)
 def api_reservations_by_carrera(request):
     """API para obtener reservas agrupadas por carrera"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        laboratory = request.GET.get('laboratory', 'all')
-        
-        # Construir filtros base
-        filters = Q()
-        
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
-        if laboratory != 'all':
-            filters &= Q(laboratorio__id=laboratory)
+        # Filtros de fecha y laboratorio
+        filters = q_reservas(normalizar(request.GET), carrera=False, semestre=False)
         
         # Obtener datos agrupados por carrera
         carreras_stats = ReservaClase.objects.filter(filters).exclude(
@@ -130,24 +100,13 @@ def api_reservations_by_carrera(request):
 
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*RESERVAS)
 def api_reservations_by_semester(request):
     """API para obtener reservas agrupadas por semestre"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        carrera = request.GET.get('carrera', 'all')
-        
-        # Construir filtros base
-        filters = Q()
-        
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
-        if carrera != 'all':
-            filters &= Q(carrera=carrera)
+        # Filtros de fecha y carrera
+        filters = q_reservas(normalizar(request.GET), laboratorio=False, semestre=False)
         
         # Obtener datos agrupados por semestre
         semestres_stats = ReservaClase.objects.filter(filters).exclude(
@@ -173,21 +132,13 @@ def api_reservations_by_semester(request):
 
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*RESERVAS)
 def api_reservations_lab_usage(request):
     """API para obtener uso de laboratorios por carrera"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        
-        # Construir filtros base
-        filters = Q()
-        
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
+        # Filtro por fechas
+        filters = q_reservas(normalizar(request.GET), laboratorio=False, carrera=False, semestre=False)
         
         # Obtener datos agrupados por laboratorio y carrera
         lab_carrera_stats = ReservaClase.objects.filter(filters).exclude(
@@ -220,29 +171,19 @@ def api_reservations_lab_usage(request):
 
 @csrf_exempt
 @admin_required_api
+@cache_respuesta(*RESERVAS)
 def api_reservations_timeline(request):
     """API para obtener línea de tiempo de reservas"""
     
     try:
-        # Obtener parámetros de filtro
-        date_from = request.GET.get('date_from')
-        date_to = request.GET.get('date_to')
-        laboratory = request.GET.get('laboratory', 'all')
-        
-        # Construir filtros base
-        filters = Q()
-        
-        if date_from:
-            filters &= Q(fecha_hora_inicio__date__gte=date_from)
-        if date_to:
-            filters &= Q(fecha_hora_inicio__date__lte=date_to)
-        if laboratory != 'all':
-            filters &= Q(laboratorio__id=laboratory)
+        # Filtros de fecha y laboratorio
+        filters = q_reservas(normalizar(request.GET), carrera=False, semestre=False)
         
         # Obtener reservas por día
-        reservas_por_dia = ReservaClase.objects.filter(filters).extra(
-            select={'day': 'date(fecha_hora_inicio)'}
-        ).values('day').annotate(
+        # TruncDate agrupa por la fecha en la zona horaria local
+        reservas_por_dia = ReservaClase.objects.filter(filters).values(
+            day=TruncDate('fecha_hora_inicio')
+        ).annotate(
             count=Count('id'),
             total_alumnos=Sum('numero_alumnos')
         ).order_by('day')
@@ -263,6 +204,8 @@ def api_reservations_timeline(request):
 
 @csrf_exempt
 @admin_required_api
+@condicional(*RESERVAS)
+@cache_respuesta(*RESERVAS)
 def api_reservations_list_carreras(request):
     """API para obtener lista de carreras únicas"""
     
@@ -281,6 +224,8 @@ def api_reservations_list_carreras(request):
 
 @csrf_exempt
 @admin_required_api
+@condicional(*RESERVAS)
+@cache_respuesta(*RESERVAS)
 def api_reservations_list_semestres(request):
     """API para obtener lista de semestres únicos"""
     
@@ -297,6 +242,8 @@ def api_reservations_list_semestres(request):
 
 @csrf_exempt
 @admin_required_api
+@condicional('laboratorio')
+@cache_respuesta('laboratorio')
 def api_reservations_list_laboratorios(request):
     """API para obtener lista de todos los laboratorios"""
     
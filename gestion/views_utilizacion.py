@@ -0,0 +1,41 @@
+"""
+API endpoints para el cubo de utilización (visitas + reservas de clase)
+"""
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .cache_respuestas import cache_respuesta
+from .filtros import normalizar
+from .ocupacion import rango_por_defecto
+from .utilizacion import utilizacion
+from .views import admin_required_api
+
+MAX_DIAS = 366
+
+
+@csrf_exempt
+@admin_required_api
+@cache_respuesta('visita', 'reservaclase', 'pc', 'laboratorio')
+def api_reports_utilization(request):
+    """
+    API para obtener horas-PC usadas por visitas, bloqueadas por reservas y
+    libres de cada laboratorio.
+
+    Parámetros GET: date_from, date_to (YYYY-MM-DD, por defecto los últimos
+    30 días), laboratory ('all' o id) y agrupar ('fecha', 'hora' del día o
+    'total'; por defecto 'fecha').
+    """
+    try:
+        filtros = normalizar(request.GET)
+        desde, hasta = rango_por_defecto(filtros)
+        laboratorio = filtros['laboratory'] if filtros['laboratory'] == 'all' else int(filtros['laboratory'])
+        if (hasta - desde).days >= MAX_DIAS:
+            raise ValueError(f'el rango no puede pasar de {MAX_DIAS} días')
+        agrupar = request.GET.get('agrupar', 'fecha')
+        # Los días terminados salen del cubo guardado; solo hoy se calcula al momento
+        data = utilizacion(desde, hasta, laboratorio, agrupar)
+    except ValueError as e:
+        return JsonResponse({'error': f'Parámetros inválidos: {e}', 'data': {}}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e), 'data': {}}, status=500)
+    return JsonResponse({'data': data})
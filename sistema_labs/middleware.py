@@ -0,0 +1,158 @@
+"""
+Medición de rendimiento por petición.
+
+MedicionRendimientoMiddleware registra, para cada petición, el número y el
+tiempo de las consultas SQL (con connection.execute_wrapper), el tiempo de
+la vista, el de render de plantillas y el tamaño de la respuesta. Los envía
+en el encabezado Server-Timing (visible en las herramientas de desarrollo
+del navegador y, gracias a CORS_EXPOSE_HEADERS, desde el dashboard de React;
+por eso RENDIMIENTO_SERVER_TIMING vale DEBUG si no se configura) y escribe en el log 'sistema_labs.rendimiento' las peticiones que tardan más
+de RENDIMIENTO_UMBRAL_LENTO_MS junto con sus consultas más lentas. Además
+alimenta los histogramas de /metrics (gestion/metricas.py) y toma muestras
+de las consultas lentas para el admin (gestion/consultas_lentas.py), que se
+guardan con su plan después de enviar la respuesta.
+
+Métricas de Server-Timing:
+    db      tiempo en la base de datos (desc: número de consultas)
+    app     tiempo de la vista sin contar la base de datos (desc: "vista + JSON").
+            JsonResponse serializa en su constructor, dentro de la vista, así
+            que el middleware no puede separar ese tiempo: la serialización
+            va aquí y no tiene métrica propia
+    render  render de plantillas (TemplateResponse, p. ej. el admin)
+    total   tiempo de toda la petición (desc: tamaño de la respuesta)
+"""
+import heapq
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from gestion import consultas_lentas
+from gestion.metricas import observar_peticion
+
+logger = logging.getLogger('sistema_labs.rendimiento')
+
+CONSULTAS_EN_LOG = 5
+LONGITUD_SQL_EN_LOG = 500
+
+
+class Medicion:
+    """Tiempos acumulados de una petición; guarda solo las consultas más lentas."""
+
+    def __init__(self, umbral_muestra_ms=None, muestreo=1.0):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.lentas = []  # heap de (duración, orden, sql) con las CONSULTAS_EN_LOG más lentas
+        self.inicio_vista = None
+        self.fin_vista = None
+        self.tiempo_render = 0.0
+        self.umbral_muestra = umbral_muestra_ms / 1000 if umbral_muestra_ms is not None else None
+        self.muestreo = muestreo
+        self.muestras = []  # (sql, params, duración, alias) para ConsultaLenta
+
+    def registrar_consulta(self, execute, sql, params, many, context):
+        """execute_wrapper: mide cada consulta de cualquier conexión."""
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.tiempo_db += duracion
+            entrada = (duracion, self.consultas, sql)
+            if len(self.lentas) < CONSULTAS_EN_LOG:
+                heapq.heappush(self.lentas, entrada)
+            elif duracion > self.lentas[0][0]:
+                heapq.heapreplace(self.lentas, entrada)
+            if (self.umbral_muestra is not None and duracion >= self.umbral_muestra
+                    and not many and random.random() < self.muestreo):
+                self.muestras.append((sql, params, duracion, context['connection'].alias))
+
+    def consultas_mas_lentas(self):
+        return [(duracion, sql) for duracion, _, sql in sorted(self.lentas, reverse=True)]
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 1)
+
+
+def _tamano(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class MedicionRendimientoMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicion = request.medicion = Medicion(
+            getattr(settings, 'CONSULTAS_LENTAS_UMBRAL_MS', None),
+            getattr(settings, 'CONSULTAS_LENTAS_MUESTREO', 1.0),
+        )
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(medicion.registrar_consulta))
+            response = self.get_response(request)
+        total = time.perf_counter() - medicion.inicio
+        observar_peticion(request, total, medicion.consultas)
+        if medicion.muestras:
+            consultas_lentas.programar(medicion.muestras, f'{request.method} {request.path}')
+
+        tamano = _tamano(response)
+        if getattr(settings, 'RENDIMIENTO_SERVER_TIMING', settings.DEBUG):
+            response['Server-Timing'] = self._server_timing(medicion, total, tamano)
+
+        umbral = getattr(settings, 'RENDIMIENTO_UMBRAL_LENTO_MS', None)
+        if umbral is not None and total * 1000 >= umbral:
+            self._registrar_lenta(request, response, medicion, total, tamano)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.medicion.inicio_vista = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # El render ocurre después de la vista; se mide con un callback
+        medicion = request.medicion
+        medicion.fin_vista = inicio_render = time.perf_counter()
+
+        def fin_render(respuesta):
+            medicion.tiempo_render += time.perf_counter() - inicio_render
+
+        response.add_post_render_callback(fin_render)
+        return response
+
+    def _tiempo_vista(self, medicion, total):
+        if medicion.inicio_vista is None:
+            return 0.0
+        fin = medicion.fin_vista or (medicion.inicio + total)
+        return fin - medicion.inicio_vista
+
+    def _server_timing(self, medicion, total, tamano):
+        app = max(self._tiempo_vista(medicion, total) - medicion.tiempo_db, 0.0)
+        metricas = [
+            f'db;dur={_ms(medicion.tiempo_db)};desc="{medicion.consultas} consultas"',
+            f'app;dur={_ms(app)};desc="vista + JSON"',
+        ]
+        if medicion.tiempo_render:
+            metricas.append(f'render;dur={_ms(medicion.tiempo_render)}')
+        descripcion = f';desc="{tamano} bytes"' if tamano is not None else ''
+        metricas.append(f'total;dur={_ms(total)}{descripcion}')
+        return ', '.join(metricas)
+
+    def _registrar_lenta(self, request, response, medicion, total, tamano):
+        lineas = [
+            f'Petición lenta: {request.method} {request.get_full_path()} -> {response.status_code} '
+            f'en {_ms(total)} ms; {medicion.consultas} consultas en {_ms(medicion.tiempo_db)} ms; '
+            f'vista {_ms(self._tiempo_vista(medicion, total))} ms; render {_ms(medicion.tiempo_render)} ms; '
+            f'{tamano if tamano is not None else "?"} bytes'
+        ]
+        for duracion, sql in medicion.consultas_mas_lentas():
+            lineas.append(f'  {_ms(duracion):>8} ms  {sql[:LONGITUD_SQL_EN_LOG]}')
+        logger.warning('\n'.join(lineas))
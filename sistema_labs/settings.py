@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'sistema_labs.middleware.MedicionRendimientoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -246,4 +247,73 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
-]
\ No newline at end of file
+]
+
+# El dashboard de React puede leer los tiempos de cada petición
+CORS_EXPOSE_HEADERS = ['Server-Timing']
+
+# Medición de rendimiento por petición (sistema_labs/middleware.py). Server-Timing
+# revela tiempos y número de consultas a cualquier origen permitido por CORS:
+# solo en desarrollo salvo que se active explícitamente
+RENDIMIENTO_SERVER_TIMING = config('RENDIMIENTO_SERVER_TIMING', default=DEBUG, cast=bool)
+# Las peticiones más lentas que esto (ms) se registran con sus consultas más lentas
+RENDIMIENTO_UMBRAL_LENTO_MS = config('RENDIMIENTO_UMBRAL_LENTO_MS', default=1000, cast=int)
+# Consultas SQL más lentas que esto (ms) se muestrean en el admin (Consultas Lentas)
+CONSULTAS_LENTAS_UMBRAL_MS = config('CONSULTAS_LENTAS_UMBRAL_MS', default=200, cast=int)
+# Fracción de las consultas lentas que se registran (0 a 1)
+CONSULTAS_LENTAS_MUESTREO = config('CONSULTAS_LENTAS_MUESTREO', default=0.2, cast=float)
+
+# Métricas de Prometheus en /metrics (gestion/metricas.py)
+# Direcciones (IPs o redes CIDR) que pueden consultar /metrics
+METRICAS_IPS_PERMITIDAS = config('METRICAS_IPS_PERMITIDAS', default='127.0.0.1,::1', cast=Csv())
+# Directorio compartido donde cada worker escribe sus histogramas
+METRICAS_DIRECTORIO = config('METRICAS_DIRECTORIO', default=str(BASE_DIR / 'metricas'))
+# Cada cuántos segundos escribe un worker sus histogramas
+METRICAS_INTERVALO_S = config('METRICAS_INTERVALO_S', default=5, cast=int)
+
+# Cachés: 'default' (tokens revocados) y 'respuestas' para las APIs de reportes
+# (gestion/cache_respuestas.py). 'respuestas' guarda también los contadores de
+# versión de los datos, así que debe ser compartida entre workers: por defecto
+# en archivos; puede cambiarse a Redis/Memcached con CACHE_RESPUESTAS_BACKEND.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'respuestas': {
+        'BACKEND': config('CACHE_RESPUESTAS_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_RESPUESTAS_LOCATION', default=str(BASE_DIR / 'cache_respuestas')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_RESPUESTAS_MAX_ENTRADAS', default=5000, cast=int)},
+    },
+}
+# Segundos que se conserva una respuesta cuyo rango llega a hoy (las visitas en curso cambian con la hora)
+CACHE_RESPUESTAS_TTL_ABIERTO = config('CACHE_RESPUESTAS_TTL_ABIERTO', default=60, cast=int)
+# Segundos para rangos ya cerrados: solo se recalculan si cambian datos de días pasados
+CACHE_RESPUESTAS_TTL_CERRADO = config('CACHE_RESPUESTAS_TTL_CERRADO', default=60 * 60 * 24 * 30, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{asctime} {levelname} {name}: {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'sistema_labs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'gestion': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
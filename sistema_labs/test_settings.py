@@ -0,0 +1,38 @@
+"""
+Configuración para ejecutar las pruebas sin PostgreSQL.
+
+Uso: python manage.py test --settings=sistema_labs.test_settings
+"""
+import os
+import tempfile
+
+# settings.py exige DB_PASSWORD aunque aquí no se use PostgreSQL
+os.environ.setdefault('DB_PASSWORD', '')
+
+from .settings import *  # noqa: E402,F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_test.sqlite3',
+    }
+}
+
+# Hasher rápido: las pruebas crean usuarios en cada caso
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Sin registro de peticiones lentas (las exportaciones de las pruebas pueden tardar)
+RENDIMIENTO_UMBRAL_LENTO_MS = None
+# Sin muestreo de consultas lentas: sus escrituras alterarían los conteos de consultas
+CONSULTAS_LENTAS_UMBRAL_MS = None
+
+# Los histogramas de /metrics de las pruebas no van al directorio del proyecto
+METRICAS_DIRECTORIO = os.path.join(tempfile.gettempdir(), f'sistema_labs_metricas_pruebas_{os.getpid()}')
+
+# Sin caché de respuestas: las versiones se incrementan al confirmar la
+# transacción y TestCase nunca confirma, así que una prueba podría recibir la
+# respuesta guardada por otra. Las pruebas de la caché la activan con override_settings.
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'respuestas': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}